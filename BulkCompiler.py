@@ -0,0 +1,263 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import posixpath
+import signal
+import sys
+import tarfile
+import time
+import typing
+import zipfile
+from ClassIndex import ClassIndex
+from JackCompiler import compile_file
+from PassManager import PassManager, optimization_levels
+
+JACK_SUFFIX = ".jack"
+VM_SUFFIX = ".vm"
+ERRORS_FILE = "errors.txt"
+## programs handed to a worker at a time
+CHUNK_SIZE = 4
+DEFAULT_TIMEOUT = 60
+
+
+class CompileTimeout(Exception):
+    """Raised in a worker when a program takes longer than the timeout."""
+
+
+def raise_timeout(signal_number, frame) -> None:
+    raise CompileTimeout()
+
+
+def archive_members(path: str) -> typing.Iterator[typing.Tuple[str, bytes]]:
+    """
+    Args:
+        path (str): a zip or tar archive, compressed or not.
+
+    Returns:
+        typing.Iterator[typing.Tuple[str, bytes]]: the name and contents of
+        every Jack file in it, read straight out of the archive.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.endswith(JACK_SUFFIX):
+                    yield info.filename, archive.read(info)
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path, "r:*") as archive:
+            for member in archive:
+                if member.isfile() and member.name.endswith(JACK_SUFFIX):
+                    yield member.name, archive.extractfile(member).read()
+    else:
+        raise ValueError("not a zip or tar archive: " + path)
+
+
+def read_programs(paths: typing.Iterable[str], level: int,
+                  timeout: float) -> typing.Iterator[tuple]:
+    """Groups the Jack files of the archives into programs: the files of a
+    single directory of a single archive.
+
+    Returns:
+        typing.Iterator[tuple]: (archive, directory, sources, level,
+        timeout) for every program, where sources are (file name, text)
+        pairs.
+    """
+    for path in paths:
+        programs = {}
+        for name, contents in archive_members(path):
+            directory, file_name = posixpath.split(name)
+            programs.setdefault(directory, []).append(
+                (file_name, contents.decode("utf-8", errors="replace")))
+        for directory, sources in programs.items():
+            yield os.path.basename(path), directory, sources, level, timeout
+
+
+def compile_program(job: tuple) -> dict:
+    """Compiles a program in memory. Runs in a worker process.
+
+    Args:
+        job (tuple): as read_programs yields.
+
+    Returns:
+        dict: the archive and directory of the program, the VM code of
+        every class by file name, the messages the compiler printed and the
+        seconds compiling took.
+    """
+    archive, directory, sources, level, timeout = job
+    start = time.perf_counter()
+    class_index = ClassIndex()
+    messages = io.StringIO()
+    outputs = {}
+    use_alarm = bool(timeout) and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    # A broken submission must not stop the rest of the batch.
+    try:
+        with contextlib.redirect_stdout(messages):
+            for file_name, text in sources:
+                try:
+                    class_index.add_source(file_name, text)
+                except CompileTimeout:
+                    raise
+                except Exception as error:
+                    print(file_name + ": cannot index: " + repr(error))
+            pass_manager = PassManager(level)
+            for file_name, text in sources:
+                output_file = io.StringIO()
+                try:
+                    compile_file(io.StringIO(text), output_file, class_index,
+                                 pass_manager)
+                except CompileTimeout:
+                    raise
+                except Exception as error:
+                    print(file_name + ": cannot compile: " + repr(error))
+                outputs[posixpath.splitext(file_name)[0] + VM_SUFFIX] = \
+                    output_file.getvalue()
+    except CompileTimeout:
+        messages.write("timed out after " + str(timeout) + " seconds\n")
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return {"archive": archive, "directory": directory, "outputs": outputs,
+            "messages": messages.getvalue().splitlines(),
+            "seconds": time.perf_counter() - start}
+
+
+class ArchiveOutput:
+    """Writes the VM files of every program into a single zip or tar
+    archive, under "<archive>/<directory>/".
+    """
+
+    def __init__(self, path: str) -> None:
+        self.zip_file = None
+        self.tar_file = None
+        if path.endswith(".zip"):
+            self.zip_file = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        elif path.endswith((".tar.gz", ".tgz")):
+            self.tar_file = tarfile.open(path, "w:gz")
+        elif path.endswith(".tar"):
+            self.tar_file = tarfile.open(path, "w")
+        else:
+            raise ValueError("the output archive must end with .zip, .tar, "
+                             ".tar.gz or .tgz: " + path)
+
+    def add(self, name: str, text: str) -> None:
+        data = text.encode("utf-8")
+        if self.zip_file is not None:
+            self.zip_file.writestr(name, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self.tar_file.addfile(info, io.BytesIO(data))
+
+    def write_result(self, result: dict) -> None:
+        prefix = posixpath.join(result["archive"], result["directory"])
+        for file_name, text in sorted(result["outputs"].items()):
+            self.add(posixpath.join(prefix, file_name), text)
+        if result["messages"]:
+            self.add(posixpath.join(prefix, ERRORS_FILE),
+                     "\n".join(result["messages"]) + "\n")
+
+    def close(self) -> None:
+        (self.zip_file or self.tar_file).close()
+
+
+class JsonLinesOutput:
+    """Writes every program as a line of JSON, as compile_program returns
+    it.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.stream = sys.stdout if path == "-" else open(path, "w")
+
+    def write_result(self, result: dict) -> None:
+        self.stream.write(json.dumps(result, sort_keys=True) + "\n")
+
+    def close(self) -> None:
+        if self.stream is sys.stdout:
+            self.stream.flush()
+        else:
+            self.stream.close()
+
+
+def compile_archives(paths: typing.List[str], output, level: int = 0,
+                     workers: int = None,
+                     timeout: float = DEFAULT_TIMEOUT) -> typing.Tuple[int, int, int]:
+    """Compiles every program of the archives and writes the results, in
+    the order of the archives.
+
+    Args:
+        paths (typing.List[str]): the archives to compile.
+        output: an ArchiveOutput or JsonLinesOutput.
+        level (int): the optimization level.
+        workers (int): the number of worker processes, all the CPUs if None.
+        With 1, everything runs in this process.
+        timeout (float): the seconds a program may take to compile, where
+        the platform can interrupt it. 0 for no limit.
+
+    Returns:
+        typing.Tuple[int, int, int]: the numbers of programs, of classes and
+        of programs with compiler messages.
+    """
+    jobs = read_programs(paths, level, timeout)
+    programs = classes = failed = 0
+    with contextlib.ExitStack() as stack:
+        if workers == 1:
+            results = map(compile_program, jobs)
+        else:
+            pool = stack.enter_context(multiprocessing.Pool(workers))
+            results = pool.imap(compile_program, jobs, CHUNK_SIZE)
+        for result in results:
+            output.write_result(result)
+            programs += 1
+            classes += len(result["outputs"])
+            failed += 1 if result["messages"] else 0
+    return programs, classes, failed
+
+
+if "__main__" == __name__:
+    # Compiles the Jack programs inside zip and tar archives, without
+    # extracting them, into a single archive or a JSON lines stream.
+    parser = argparse.ArgumentParser(
+        prog="BulkCompiler",
+        usage="BulkCompiler [-O{0,1,2}] [--workers N] [--timeout SECONDS] "
+              "(--output OUT.zip|OUT.tar|OUT.tar.gz | --jsonl OUT.jsonl|-) "
+              "<archive> ...")
+    parser.add_argument("archives", nargs="+")
+    parser.add_argument("-O", dest="level", type=int, default=0,
+                        choices=optimization_levels)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    destination = parser.add_mutually_exclusive_group(required=True)
+    destination.add_argument("--output")
+    destination.add_argument("--jsonl")
+    arguments = parser.parse_args()
+    try:
+        output = ArchiveOutput(arguments.output) if arguments.output \
+            else JsonLinesOutput(arguments.jsonl)
+    except ValueError as error:
+        sys.exit(str(error))
+    start = time.perf_counter()
+    try:
+        programs, classes, failed = compile_archives(
+            arguments.archives, output, arguments.level, arguments.workers,
+            arguments.timeout)
+    except (ValueError, OSError) as error:
+        sys.exit(str(error))
+    finally:
+        output.close()
+    print("compiled %d programs (%d classes) from %d archives in %.2fs, "
+          "%d with errors" % (programs, classes, len(arguments.archives),
+                              time.perf_counter() - start, failed),
+          file=sys.stderr)
@@ -0,0 +1,300 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import hashlib
+import io
+import json
+import os
+import typing
+from JackTokenizer import JackTokenizer
+
+CACHE_FILE_NAME = ".jack_index"
+CACHE_VERSION = 1
+
+STATIC = "static"
+FIELD = "field"
+CONSTRUCTOR = "constructor"
+FUNCTION = "function"
+METHOD = "method"
+
+class_var_dec_openers = [STATIC, FIELD]
+subroutine_openers = [CONSTRUCTOR, FUNCTION, METHOD]
+
+
+class Variable(typing.NamedTuple):
+    """A static or field variable of a class."""
+    kind: str
+    type: str
+    name: str
+
+
+class Signature(typing.NamedTuple):
+    """What a call needs to know about a subroutine."""
+    kind: str
+    return_type: str
+    name: str
+    n_params: int
+
+
+class ClassEntry(typing.NamedTuple):
+    """The declarations of a class, as scanned and as cached. The digest is
+    the hash of the source they were scanned from, None if not known.
+    """
+    digest: str
+    class_name: str
+    variables: typing.List[Variable]
+    subroutines: typing.List[Signature]
+
+    def to_lists(self) -> list:
+        """
+        Returns:
+            list: the entry as plain lists, the way cache files hold it.
+        """
+        return [self.digest, self.class_name,
+                [list(variable) for variable in self.variables],
+                [list(subroutine) for subroutine in self.subroutines]]
+
+    @staticmethod
+    def from_lists(entry: list) -> "ClassEntry":
+        """
+        Args:
+            entry (list): a class entry as to_lists makes it.
+
+        Returns:
+            ClassEntry: the entry with its variables and signatures named.
+        """
+        digest, class_name, variables, subroutines = entry
+        return ClassEntry(digest, class_name,
+                          [Variable(*variable) for variable in variables],
+                          [Signature(*subroutine) for subroutine in subroutines])
+
+
+def source_hash(text: str) -> str:
+    """
+    Args:
+        text (str): the contents of a Jack file.
+
+    Returns:
+        str: the key the index is cached under for this content.
+    """
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def scan_class(tokens: typing.Iterable[typing.Tuple[str, str]],
+               digest: str = None) -> ClassEntry:
+    """Reads the declarations of a single class out of its token stream. Only
+    the class level is looked at: subroutine bodies are skipped by counting
+    braces, so this is much cheaper than a full compilation. A truncated class
+    yields whatever was declared before the input ended.
+
+    Args:
+        tokens (typing.Iterable): (token type, token) pairs of the class.
+        digest (str): the hash of the source the tokens come from.
+
+    Returns:
+        ClassEntry: the class name, variables and subroutine signatures.
+    """
+    variables = []
+    subroutines = []
+    class_name = None
+    tokens = iter(tokens)
+    try:
+        for token_type, token in tokens:
+            if token == "class":
+                class_name = next(tokens)[1]
+                next(tokens)
+                break
+        scan_declarations(tokens, variables, subroutines)
+    except StopIteration:
+        pass
+    return ClassEntry(digest, class_name, variables, subroutines)
+
+
+def scan_declarations(tokens: typing.Iterator, variables: typing.List[Variable],
+                      subroutines: typing.List[Signature]) -> None:
+    for token_type, token in tokens:
+        if token in class_var_dec_openers:
+            var_type = next(tokens)[1]
+            for _, name in tokens:
+                if name == ";":
+                    break
+                if name != ",":
+                    variables.append(Variable(token, var_type, name))
+        elif token in subroutine_openers:
+            return_type = next(tokens)[1]
+            name = next(tokens)[1]
+            next(tokens)
+            n_params = 0
+            for _, param in tokens:
+                if param == ")":
+                    break
+                if n_params == 0 or param == ",":
+                    n_params += 1
+            depth = 0
+            for _, body_token in tokens:
+                if body_token == "{":
+                    depth += 1
+                elif body_token == "}":
+                    depth -= 1
+                    if depth == 0:
+                        break
+            subroutines.append(Signature(token, return_type, name, n_params))
+        elif token == "}":
+            break
+
+
+class ClassIndex:
+    """A project-wide index of Jack classes: their class variables and the
+    kind, return type and parameter count of each of their subroutines. The
+    index is kept in a compact on-disk cache keyed by the hash of each file,
+    so only files that changed since the last compilation are scanned again.
+    """
+
+    def __init__(self, cache_path: str = None) -> None:
+        """Creates an empty index, loading the cache file if there is one.
+
+        Args:
+            cache_path (str): where the index is cached, None for no cache.
+        """
+        self.cache_path = cache_path
+        self.file_entries = {}
+        self.classes = {}
+        self.subroutines = {}
+        self.dirty = False
+        if cache_path is not None and os.path.isfile(cache_path):
+            self.load()
+
+    @staticmethod
+    def for_directory(path: str) -> "ClassIndex":
+        """
+        Args:
+            path (str): a directory of Jack files.
+
+        Returns:
+            ClassIndex: an index cached inside the given directory.
+        """
+        return ClassIndex(os.path.join(path, CACHE_FILE_NAME))
+
+    def load(self) -> None:
+        """Reads the cache file. A cache written by another version of the
+        index is ignored.
+        """
+        try:
+            with open(self.cache_path, "r") as cache_file:
+                cache = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+        if cache.get("version") != CACHE_VERSION:
+            return
+        self.file_entries = {key: ClassEntry.from_lists(entry)
+                             for key, entry in cache["files"].items()}
+        for entry in self.file_entries.values():
+            self.register(entry)
+
+    def save(self) -> None:
+        """Writes the cache file, if anything changed since it was read."""
+        if self.cache_path is None or not self.dirty:
+            return
+        cache = {"version": CACHE_VERSION,
+                 "files": {key: entry.to_lists()
+                           for key, entry in self.file_entries.items()}}
+        with open(self.cache_path, "w") as cache_file:
+            json.dump(cache, cache_file, separators=(",", ":"))
+        self.dirty = False
+
+    def register(self, entry: ClassEntry) -> None:
+        self.classes[entry.class_name] = entry
+        for subroutine in entry.subroutines:
+            self.subroutines[entry.class_name + "." + subroutine.name] = subroutine
+
+    def unregister(self, entry: ClassEntry) -> None:
+        if self.classes.get(entry.class_name) is entry:
+            del self.classes[entry.class_name]
+        for subroutine in entry.subroutines:
+            self.subroutines.pop(entry.class_name + "." + subroutine.name, None)
+
+    def add_source(self, key: str, text: str) -> None:
+        """Indexes the class in the given source, unless the cached entry for
+        the key was made from the same content.
+
+        Args:
+            key (str): identifies the source, usually its path.
+            text (str): the Jack source of a single class.
+        """
+        digest = source_hash(text)
+        old_entry = self.file_entries.get(key)
+        if old_entry is not None:
+            if old_entry.digest == digest:
+                return
+            self.unregister(old_entry)
+        entry = scan_class(JackTokenizer(io.StringIO(text)).tokens(), digest)
+        self.file_entries[key] = entry
+        self.register(entry)
+        self.dirty = True
+
+    def set_entry(self, key: str, entry: ClassEntry) -> None:
+        """Replaces the entry of a source with declarations scanned elsewhere,
+        such as by an editor that keeps the class up to date as it changes.
+
+        Args:
+            key (str): identifies the source, usually its path.
+            entry (ClassEntry): the declarations of the class. The digest
+            may be None if it is not known.
+        """
+        old_entry = self.file_entries.get(key)
+        if old_entry is not None:
+            self.unregister(old_entry)
+        self.file_entries[key] = entry
+        self.register(entry)
+        self.dirty = True
+
+    def add_file(self, path: str) -> None:
+        """
+        Args:
+            path (str): a Jack file to index.
+        """
+        with open(path, "r") as input_file:
+            self.add_source(os.path.abspath(path), input_file.read())
+
+    def update(self, paths: typing.Iterable[str]) -> None:
+        """Indexes the given files, then forgets any cached file that is not
+        one of them and saves the cache.
+
+        Args:
+            paths (typing.Iterable[str]): all the Jack files of the project.
+        """
+        keys = set()
+        for path in paths:
+            self.add_file(path)
+            keys.add(os.path.abspath(path))
+        for key in list(self.file_entries.keys()):
+            if key not in keys:
+                self.unregister(self.file_entries.pop(key))
+                self.dirty = True
+        self.save()
+
+    def has_class(self, class_name: str) -> bool:
+        """
+        Args:
+            class_name (str): name of a class.
+
+        Returns:
+            bool: True if the class is part of the indexed project.
+        """
+        return class_name in self.classes
+
+    def lookup(self, class_name: str, subroutine_name: str) -> Signature:
+        """
+        Args:
+            class_name (str): the class the subroutine belongs to.
+            subroutine_name (str): name of the subroutine.
+
+        Returns:
+            Signature: the signature of the subroutine, or None if it is
+            unknown.
+        """
+        return self.subroutines.get(class_name + "." + subroutine_name)
@@ -0,0 +1,167 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import collections
+import glob
+import io
+import json
+import math
+import os
+import sys
+import typing
+from ClassIndex import ClassIndex
+from ControlFlowGraph import split_functions, command_of
+from JackCompiler import compile_file
+from PassManager import PassManager, O0, O2
+
+SAMPLES = ["Pong", "Square", "ComplexArrays", "ConvertToBin", "Average", "Seven"]
+LEVELS = [O0, O2]
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "code_quality_baseline.json")
+DEFAULT_TOLERANCE = 0.02
+
+## the metrics of a function that may not grow
+COMMANDS = "commands"
+BYTES = "bytes"
+HISTOGRAM = "histogram"
+
+
+def compile_program(directory: str, level: int,
+                    pass_manager: PassManager = None) -> typing.List[str]:
+    """
+    Args:
+        directory (str): the program.
+        level (int): the optimization level.
+        pass_manager (PassManager): runs the passes instead of the level's.
+
+    Returns:
+        typing.List[str]: the VM commands of every class of the program,
+        compiled in memory.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, "*.jack")))
+    class_index = ClassIndex()
+    class_index.update(paths)
+    if pass_manager is None:
+        pass_manager = PassManager(level)
+    lines = []
+    for path in paths:
+        output_file = io.StringIO()
+        with open(path, "r") as input_file:
+            compile_file(input_file, output_file, class_index, pass_manager)
+        lines.extend(output_file.getvalue().splitlines())
+    return lines
+
+
+def measure(lines: typing.List[str]) -> typing.Dict[str, dict]:
+    """
+    Returns:
+        typing.Dict[str, dict]: for every function, its number of commands,
+        its size in bytes, and the number of commands of each kind.
+    """
+    _, functions = split_functions(lines)
+    metrics = {}
+    for function in functions:
+        histogram = collections.Counter(command_of(line) for line in function)
+        metrics[function[0].split(" ")[1]] = {
+            COMMANDS: len(function),
+            BYTES: sum(len(line) + 1 for line in function),
+            HISTOGRAM: dict(sorted(histogram.items())),
+        }
+    return metrics
+
+
+def measure_samples(root: str) -> dict:
+    """
+    Returns:
+        dict: the metrics of every sample program at every level, by
+        program, then level name, then function.
+    """
+    results = {}
+    for sample in SAMPLES:
+        results[sample] = {
+            "O" + str(level): measure(compile_program(os.path.join(root, sample), level))
+            for level in LEVELS}
+    return results
+
+
+def allowed(value: int, tolerance: float) -> int:
+    return math.floor(value * (1 + tolerance))
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> \
+        typing.Tuple[typing.List[str], typing.List[str]]:
+    """
+    Returns:
+        typing.Tuple[typing.List[str], typing.List[str]]: the metrics that
+        grew beyond the tolerance, and those that shrank.
+    """
+    regressions = []
+    improvements = []
+
+    def check(name: str, old: int, new: int) -> None:
+        if new > allowed(old, tolerance):
+            regressions.append("%s: %d -> %d" % (name, old, new))
+        elif new < old:
+            improvements.append("%s: %d -> %d" % (name, old, new))
+
+    for program, levels in sorted(current.items()):
+        for level, functions in sorted(levels.items()):
+            old_functions = baseline.get(program, {}).get(level)
+            if old_functions is None:
+                continue
+            for metric in [COMMANDS, BYTES]:
+                check(" ".join([program, level, "total", metric]),
+                      sum(old[metric] for old in old_functions.values()),
+                      sum(new[metric] for new in functions.values()))
+            for function, metrics in sorted(functions.items()):
+                old = old_functions.get(function)
+                if old is None:
+                    continue
+                prefix = " ".join([program, level, function]) + " "
+                check(prefix + COMMANDS, old[COMMANDS], metrics[COMMANDS])
+                check(prefix + BYTES, old[BYTES], metrics[BYTES])
+                for command in sorted(set(old[HISTOGRAM]) | set(metrics[HISTOGRAM])):
+                    check(prefix + command, old[HISTOGRAM].get(command, 0),
+                          metrics[HISTOGRAM].get(command, 0))
+    return regressions, improvements
+
+
+if "__main__" == __name__:
+    # Compiles the sample programs and compares their code with the
+    # checked-in baseline. Exits with 1 if any metric grew beyond the
+    # tolerance; --update records the current code as the new baseline.
+    parser = argparse.ArgumentParser(
+        prog="CodeQuality",
+        usage="CodeQuality [--update] [--tolerance FRACTION] [--baseline PATH]")
+    parser.add_argument("--update", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=None)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    arguments = parser.parse_args()
+    current = measure_samples(os.path.dirname(os.path.abspath(__file__)))
+    baseline = {"tolerance": DEFAULT_TOLERANCE, "programs": {}}
+    if os.path.exists(arguments.baseline):
+        with open(arguments.baseline, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+    tolerance = arguments.tolerance
+    if tolerance is None:
+        tolerance = baseline.get("tolerance", DEFAULT_TOLERANCE)
+    if arguments.update:
+        with open(arguments.baseline, "w") as baseline_file:
+            json.dump({"tolerance": tolerance, "programs": current},
+                      baseline_file, indent=1, sort_keys=True)
+            baseline_file.write("\n")
+        print("baseline updated: " + arguments.baseline)
+        sys.exit(0)
+    regressions, improvements = compare(baseline["programs"], current, tolerance)
+    for improvement in improvements:
+        print("improved  " + improvement)
+    for regression in regressions:
+        print("REGRESSED " + regression)
+    print("%d regressions, %d improvements (tolerance %g)" % (
+        len(regressions), len(improvements), tolerance))
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,154 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from ControlFlowGraph import ControlFlowGraph, split_functions, join_functions
+from VMExpressions import parse_operations, expression_start, \
+    expression_reads, written_locations, frame_size, with_frame_size
+
+## a pure OS call runs a loop of its own, so it costs about this many
+## commands instead of one
+CALL_COST = 50
+## keeping a value for reuse adds a "pop local" and a "push local"
+SAVE_COST = 2
+
+expensive_calls = ["Math.multiply", "Math.divide"]
+
+
+def evaluation_cost(expression: typing.Sequence[str]) -> int:
+    """
+    Returns:
+        int: about how many commands running the expression takes.
+    """
+    cost = 0
+    for line in expression:
+        cost += CALL_COST if line.startswith("call ") else 1
+    return cost
+
+
+def expression_trees(commands: typing.List[str]) -> \
+        typing.Dict[tuple, typing.List[typing.Tuple[int, int, set]]]:
+    """
+    Args:
+        commands (typing.List[str]): the commands of a basic block.
+
+    Returns:
+        typing.Dict[tuple, typing.List[typing.Tuple[int, int, set]]]: for
+        the lines of every pure expression of more than one operation, the
+        first and after-last line of each of its occurrences, and the
+        locations it reads.
+    """
+    operations = parse_operations(commands)
+    trees = {}
+    for root in range(len(operations)):
+        start = expression_start(operations, root)
+        if start is None or start == root:
+            continue
+        first, last = operations[start].start, operations[root].end
+        trees.setdefault(tuple(commands[first:last]), []).append(
+            (first, last, expression_reads(operations, start, root)))
+    return trees
+
+
+def best_group(commands: typing.List[str]) -> \
+        typing.Tuple[typing.List[typing.Tuple[int, int]], int]:
+    """Finds the repeated expression whose reuse saves the most.
+
+    Returns:
+        typing.Tuple[typing.List[typing.Tuple[int, int]], int]: the
+        occurrences that compute the same value as the first of them, and
+        the commands saved by computing it once. The list is empty if no
+        reuse saves anything.
+    """
+    best, best_saving = [], 0
+    for expression, occurrences in expression_trees(commands).items():
+        if len(occurrences) < 2:
+            continue
+        cost = evaluation_cost(expression)
+        for position, (first, last, reads) in enumerate(occurrences):
+            group = [(first, last)]
+            for other_first, other_last, _ in occurrences[position + 1:]:
+                if other_first < group[-1][1]:
+                    continue
+                if written_locations(commands[last:other_first]) & reads:
+                    break
+                group.append((other_first, other_last))
+            saving = (len(group) - 1) * cost - SAVE_COST
+            if saving > best_saving:
+                best, best_saving = group, saving
+    return best, best_saving
+
+
+def eliminate_in_block(commands: typing.List[str], next_slot: int,
+                       counts: dict) -> typing.Tuple[typing.List[str], int]:
+    """Computes every repeated expression of a basic block once.
+
+    Args:
+        commands (typing.List[str]): the commands of the block.
+        next_slot (int): the first unused local slot.
+        counts (dict): the number of "evaluations" and "calls" eliminated is
+        added here.
+
+    Returns:
+        typing.Tuple[typing.List[str], int]: the new commands, and the first
+        local slot they leave unused.
+    """
+    while True:
+        group, saving = best_group(commands)
+        if not group:
+            return commands, next_slot
+        first, last = group[0]
+        expression = commands[first:last]
+        slot = str(next_slot)
+        next_slot += 1
+        for other_first, other_last in reversed(group[1:]):
+            commands = commands[:other_first] + ["push local " + slot] + \
+                commands[other_last:]
+        commands = commands[:last] + ["pop local " + slot, "push local " + slot] + \
+            commands[last:]
+        counts["evaluations"] += len(group) - 1
+        counts["calls"] += (len(group) - 1) * sum(
+            1 for line in expression
+            if line.startswith("call ") and line.split(" ")[1] in expensive_calls)
+
+
+def eliminate_in_function(function: typing.List[str],
+                          notes: list) -> typing.List[str]:
+    n_locals = frame_size(function)
+    graph = ControlFlowGraph(function)
+    counts = {"evaluations": 0, "calls": 0}
+    next_slot = n_locals
+    for block in graph.blocks:
+        block.commands, next_slot = eliminate_in_block(
+            block.commands, next_slot, counts)
+    if next_slot == n_locals:
+        return function
+    notes.append(function[0].split(" ")[1] + ": eliminated " +
+                 str(counts["evaluations"]) + " evaluations, " +
+                 str(counts["calls"]) + " of them " +
+                 "/".join(expensive_calls) + " calls")
+    return with_frame_size(graph.lines(), next_slot)
+
+
+def eliminate_common_subexpressions(lines: typing.List[str], notes: list,
+                                    options: dict) -> typing.List[str]:
+    """Computes a pure expression that a basic block repeats only once,
+    keeping its value in a new local for the repetitions. An occurrence is
+    only reused while nothing it reads has been written, and reads of
+    fields, statics and arrays end at any memory write or impure call.
+
+    Args:
+        lines (typing.List[str]): the VM commands of a class.
+        notes (list): a line is added here for every function that changed.
+        options (dict): unused.
+
+    Returns:
+        typing.List[str]: the optimized commands.
+    """
+    prefix, functions = split_functions(lines)
+    return join_functions(
+        prefix, [eliminate_in_function(function, notes) for function in functions])
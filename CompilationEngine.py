@@ -5,10 +5,15 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import io
 import typing
+from xml.sax.saxutils import escape
+from ClassIndex import ClassIndex, Signature, scan_class
 from JackTokenizer import JackTokenizer
+from PassManager import PassManager
+from SourceMap import SourceMap
 from SymbolTable import SymbolTable
-from VMWriter import VMWriter
+from VMWriter import VMWriter, NullVMWriter
 
 #
 
@@ -94,116 +99,317 @@ parenthesis_openers = ["[","("]
 parenthesis_closers = ["]",")"]
 unary_op = ["~","-"]
 
-symbol_dict = {"<":"&lt;", ">":"&gt;", "\"":"&quot;", "&":"&amp;"}
+## escaped in the XML along with "&", "<" and ">", which escape() always
+## replaces
+quote_entities = {"\"": "&quot;"}
 names_to_segments ={VAR: LOCAL, ARG: ARGUMENT_SEG, STATIC: STATIC, FIELD: THIS}
 
 
+## operators the VM has no command for, implemented by the OS
+os_operators = {"*": "Math.multiply", "/": "Math.divide"}
+TOKENS_FLAG = "tokens"
+
+
 class CompilationEngine:
     """Gets input from a JackTokenizer and emits its parsed structure into an
     output stream.
     """
 
-    def __init__(self, input_stream: JackTokenizer, output_stream: typing.TextIO) -> None:
+    def __init__(self, input_stream: JackTokenizer, output_stream: typing.TextIO,
+                 class_index: ClassIndex = None,
+                 pass_manager: PassManager = None,
+                 xml_stream: typing.TextIO = None,
+                 tokens_stream: typing.TextIO = None,
+                 source_map: SourceMap = None,
+                 error_stream: typing.TextIO = None) -> None:
         """
         Creates a new compilation engine with the given input and output. The
         next routine called must be compileClass()
         :param input_stream: The input stream.
-        :param output_stream: The output stream.
+        :param output_stream: The output stream, None if no VM code is wanted.
+        :param class_index: signatures of the project's classes, used to check
+        subroutine calls. None skips the checks.
+        :param pass_manager: the optimizations to run on the VM output.
+        :param xml_stream: receives the parse tree XML, if not None.
+        :param tokens_stream: receives the tokens XML, if not None.
+        :param source_map: maps the VM commands to the Jack lines, if not
+        None.
+        :param error_stream: receives the error messages, the standard output
+        if None.
         """
         self.tokenizer = input_stream
         self.output_stream  = output_stream
+        self.xml_stream = xml_stream
+        self.tokens_stream = tokens_stream
         self.num_of_tabs =0
+        self.error_stream = error_stream
         self.symbol_table = SymbolTable()
         self.class_name = None
-        self.vmWriter =  VMWriter(output_stream)
+        self.subroutine_kind = None
+        self.subroutine_name = None
+        self.label_count = 0
+        if output_stream is not None:
+            self.vmWriter =  VMWriter(output_stream, pass_manager, source_map)
+        else:
+            self.vmWriter = NullVMWriter()
+        self.class_index = class_index
+        self.own_subroutines = None
 
     def token_flag(self, token_type):
         return "<"+token_type+">"
 
     def basic_line(self, token, token_type):
-        token_text= token
-        if token in symbol_dict.keys():
-            token_text = symbol_dict[token]
-
+        token_text = escape(token, quote_entities)
         to_write = self.token_flag(token_type)+" "+token_text+" "+self.token_flag("/"+token_type)
         return to_write
 
     def write_XML(self, to_write):
+        if self.xml_stream is not None:
+            self.xml_stream.write(to_write+"\n")
 
-        print(to_write+"\n")
-        #self.output_stream.write(to_write+"\n")
+    def write_token(self, token, token_type):
+        """Writes a token to the tokens and parse tree outputs. Nothing is
+        built when neither of them is wanted.
+        """
+        if self.xml_stream is None and self.tokens_stream is None:
+            return
+        to_write = self.basic_line(token, token_type)
+        if self.tokens_stream is not None:
+            self.tokens_stream.write(to_write+"\n")
+        self.write_XML(to_write)
 
     def process(self, expected_token ):
         if self.tokenizer.current_token != expected_token:
-            print("synthax error: line " +str( self.tokenizer.current_line_number) + "\n"
+            print("synthax error: line " +str( self.tokenizer.line_number()) + "\n"
                                                                                 "expected:" + expected_token + "\n"
-                                                                                                               "actual: " + self.tokenizer.token_type())
+                                                                                                               "actual: " + self.tokenizer.token_type(),
+                  file=self.error_stream)
         else :
-            self.write_XML(self.basic_line(expected_token, self.tokenizer.token_type()))
+            self.write_token(expected_token, self.tokenizer.token_type())
         if self.tokenizer.has_more_tokens():
             self.tokenizer.advance()
 
     def process_basic_token(self, expected_token_type):
         if expected_token_type != self.tokenizer.token_type():
-            print("synthax error: line " + str(self.tokenizer.current_line_number) +"\n"
+            print("synthax error: line " + str(self.tokenizer.line_number()) +"\n"
                                                                             "expected:" + expected_token_type +"\n"
-                                                                                                             "actual: " + self.tokenizer.token_type())
+                                                                                                             "actual: " + self.tokenizer.token_type(),
+                  file=self.error_stream)
 
-        self.write_XML(self.basic_line(self.tokenizer.current_token, self.tokenizer.token_type()))
+        self.write_token(self.tokenizer.current_token, self.tokenizer.token_type())
         self.tokenizer.advance()
 
     def process_optional_tokens(self, expected_list_of_tokens: list):
         if self.tokenizer.token_type() not in expected_list_of_tokens and self.tokenizer.current_token not in expected_list_of_tokens :
-            print("synthax error: line " +str( self.tokenizer.current_line_number) + "\n"
-                                                                                "expected:" )
-            print(expected_list_of_tokens)
-            print ("\n actual: " + self.tokenizer.token_type())
+            print("synthax error: line " +str( self.tokenizer.line_number()) + "\n"
+                                                                                "expected:",
+                  file=self.error_stream)
+            print(expected_list_of_tokens, file=self.error_stream)
+            print ("\n actual: " + self.tokenizer.token_type(), file=self.error_stream)
 
-        self.write_XML(self.basic_line(self.tokenizer.current_token, self.tokenizer.token_type()))
+        self.write_token(self.tokenizer.current_token, self.tokenizer.token_type())
         self.tokenizer.advance()
 
     def open_seq (self, seq):
-        title = self.token_flag(seq)
-        #print(title)
-        self.write_XML(title)
+        if self.xml_stream is not None:
+            self.write_XML(self.token_flag(seq))
 
     def close_seq (self, seq):
-        self.open_seq("/"+seq)
+        if self.xml_stream is not None:
+            self.write_XML(self.token_flag("/"+seq))
 
     """project 10 additions:"""
 
     def write_to_ST(self, names, type, kind):
         for name in  names:
-            self.symbol_table.define(name,type,kind)
+            self.define_variable(name, type, kind)
+
+    def define_variable(self, name, type, kind):
+        """Defines a variable in the symbol table, unless its scope already
+        has one of that name, which is reported.
+        """
+        if self.symbol_table.is_defined(name, kind):
+            self.semantic_error("variable declared twice: " + name)
+            return
+        self.symbol_table.define(name,type,kind)
 
-    def find_variable_in_st(self, variable_name):
+    def find_variable_in_st(self, variable_name, line: int = None):
         """
 
         Args:
             variable_name: the name of the variable called
+            line: the line the name is on, for the error message, if the
+            tokenizer has moved past it
 
-        Returns: the segment and index such as "argument", "1"
+        Returns: the segment and index such as "argument", "1", or None, None
+        if the variable is not declared, which is reported.
 
         """
-        type = self.symbol_table.type_of(variable_name)
+        kind = self.symbol_table.kind_of(variable_name)
+        if kind is None:
+            self.semantic_error("undeclared variable: " + variable_name, line)
+            return None, None
         index = self.symbol_table.index_of(variable_name)
-        return names_to_segments[type], index
+        return names_to_segments[kind], index
+
+    def push_variable(self, variable_name):
+        segment, index = self.find_variable_in_st(variable_name)
+        if segment is not None:
+            self.vmWriter.write_push(segment, index)
+
+    def semantic_error(self, error: str, line: int = None) -> None:
+        """Reports an error.
+
+        Args:
+            error (str): what is wrong.
+            line (int): the line of the error, the current line if None.
+        """
+        if line is None:
+            line = self.tokenizer.line_number()
+        print("semantic error: line " + str(line) + "\n" + error,
+              file=self.error_stream)
+
+    def input_ended(self, token_index: int) -> bool:
+        """Loops over repeated parts check this, since the tokenizer stays on
+        the last token at the end of the input.
+
+        Returns:
+            bool: True if no token was read since the given token index.
+        """
+        return self.tokenizer.token_index == token_index
+
+    def source_line(self) -> int:
+        """
+        Returns:
+            int: the Jack line of the current token, counted from 1.
+        """
+        return self.tokenizer.line_number() + 1
+
+    def new_label_index(self):
+        """
+        Returns: a suffix for the labels of a statement, unique within the
+        current subroutine (labels are scoped by function in the VM)
+        """
+        self.label_count += 1
+        return str(self.label_count - 1)
+
+    def check_call(self, names: list, n_args: int) -> None:
+        """Reports calls that don't match the signature found in the class
+        index. Calls to classes outside the project (e.g. the OS) are not
+        checked.
+
+        Args:
+            names: the called name, split on the "." ("draw" or "Math", "abs")
+            n_args: the number of arguments in the call, excluding "this"
+        """
+        if self.class_index is None:
+            return
+        if len(names) == 1:
+            class_name, is_object = self.class_name, True
+        elif self.symbol_table.kind_of(names[0]) is not None:
+            class_name, is_object = self.symbol_table.type_of(names[0]), True
+        else:
+            class_name, is_object = names[0], False
+        if not self.class_index.has_class(class_name):
+            return
+        signature = self.class_index.lookup(class_name, names[-1])
+        error = None
+        if signature is None:
+            error = "unknown subroutine: " + class_name + "." + names[-1]
+        elif signature.n_params != n_args:
+            error = "expected " + str(signature.n_params) + " arguments, actual: " + str(n_args)
+        elif not is_object and signature.kind == METHOD:
+            error = "method called as a function: " + class_name + "." + names[-1]
+        if error is not None:
+            self.semantic_error(error)
+
+    def own_subroutine(self, name: str) -> Signature:
+        """Finds a subroutine of the class being compiled. Without a class
+        index the class is scanned for its own subroutines, once, since a
+        call may come before the subroutine it calls.
+
+        Args:
+            name: the name of the subroutine.
+
+        Returns:
+            Signature: the signature of the subroutine, None if the class
+            declares none of that name.
+        """
+        if self.class_index is not None:
+            return self.class_index.lookup(self.class_name, name)
+        if self.own_subroutines is None:
+            entry = scan_class(JackTokenizer(io.StringIO(
+                "\n".join(self.tokenizer.input_lines))).tokens())
+            self.own_subroutines = {subroutine.name: subroutine
+                                    for subroutine in entry.subroutines}
+        return self.own_subroutines.get(name)
+
+    def compile_call(self, names: list) -> None:
+        """Compiles the argument list of a subroutine call, starting at "(",
+        and the call itself. A method gets the object it is called on as its
+        first argument.
+
+        Args:
+            names: the called name, split on the "." ("draw" or "Math", "abs")
+        """
+        n_args = 0
+        if len(names) == 1:
+            signature = self.own_subroutine(names[0])
+            if signature is None or signature.kind == METHOD:
+                self.vmWriter.write_push(POINTER, 0)
+                n_args = 1
+            called_class = self.class_name
+        elif self.symbol_table.kind_of(names[0]) is not None:
+            self.push_variable(names[0])
+            n_args = 1
+            called_class = self.symbol_table.type_of(names[0])
+        else:
+            called_class = names[0]
+        self.process("(")
+        n_expressions = self.compile_expression_list()
+        self.process(")")
+        self.check_call(names, n_expressions)
+        self.vmWriter.write_call(called_class + "." + names[-1], n_args + n_expressions)
 
     def compile_class(self) -> None:
         """Compiles a complete class."""
-
+        if self.tokens_stream is not None:
+            self.tokens_stream.write(self.token_flag(TOKENS_FLAG)+"\n")
         self.open_seq(CLASS_DEC)
         self.process("class")
         self.class_name = self.tokenizer.current_token
         self.process_basic_token(IDENTIFIER)
         self.process("{")
+        self.compile_class_body()
+        token_index = self.tokenizer.token_index
+        self.process("}")
+        if not self.input_ended(token_index):
+            # A file holds one class, anything after it would be lost.
+            print("synthax error: line " + str(self.tokenizer.line_number()) + "\n"
+                  "expected:end of file\n"
+                  "actual: " + self.tokenizer.token_type(),
+                  file=self.error_stream)
+        self.close_seq(CLASS_DEC)
+        if self.tokens_stream is not None:
+            self.tokens_stream.write(self.token_flag("/"+TOKENS_FLAG)+"\n")
+        self.vmWriter.close()
+
+    def compile_class_body(self) -> None:
+        """Compiles the variable declarations and then the subroutines of a
+        class, stopping at the first token that starts neither. The class
+        name must already be set.
+        """
         ## note -make sure it can be complied several times
         while self.tokenizer.current_token in class_var_dec_openers:
+            token_index = self.tokenizer.token_index
             self.compile_class_var_dec()
+            if self.input_ended(token_index):
+                break
         while self.tokenizer.current_token in subroutine_openers:
+            token_index = self.tokenizer.token_index
             self.compile_subroutine()
-        self.process("}")
-        self.close_seq(CLASS_DEC)
+            if self.input_ended(token_index):
+                break
 
 
     def compile_class_var_dec(self) -> None:
@@ -220,9 +426,12 @@ class CompilationEngine:
         identifiers_list.append(self.tokenizer.current_token)
         self.process_basic_token(IDENTIFIER)
         while self.tokenizer.current_token == COMMA:
+            token_index = self.tokenizer.token_index
             self.process_basic_token(SYMBOL)
             identifiers_list.append(self.tokenizer.current_token)
             self.process_basic_token(IDENTIFIER)
+            if self.input_ended(token_index):
+                break
         self.process(";")
         self.write_to_ST(identifiers_list,type,kind)
         self.close_seq(CLASS_VAR_DEC)
@@ -237,9 +446,18 @@ class CompilationEngine:
         self.open_seq(SUBROUTINE_DEC)
         ##restarting the subtoutine symbol-table
         self.symbol_table.start_subroutine()
+        self.label_count = 0
+        declaration_line = self.source_line()
+        self.subroutine_kind = self.tokenizer.current_token
         self.process_basic_token(KEYWORD)
         self.process_optional_tokens(keyword_extended)
+        self.subroutine_name = self.tokenizer.current_token
         self.process_basic_token(IDENTIFIER)
+        self.vmWriter.set_position(
+            declaration_line, self.class_name + "." + self.subroutine_name)
+        ## the object a method is called on is its argument 0
+        if self.subroutine_kind == METHOD:
+            self.symbol_table.define(THIS, self.class_name, ARG)
         self.process("(")
         self.compile_parameter_list()
         self.process(")")
@@ -256,7 +474,19 @@ class CompilationEngine:
         self.open_seq(SUBROUTINE_BODY)
         self.process("{")
         while self.tokenizer.current_token ==VAR:
+            token_index = self.tokenizer.token_index
             self.compile_var_dec()
+            if self.input_ended(token_index):
+                break
+        self.vmWriter.write_function(self.class_name + "." + self.subroutine_name,
+                                     self.symbol_table.var_count(VAR))
+        if self.subroutine_kind == CONSTRUCTOR:
+            self.vmWriter.write_push(CONSTANT, self.symbol_table.var_count(FIELD))
+            self.vmWriter.write_call("Memory.alloc", 1)
+            self.vmWriter.write_pop(POINTER, 0)
+        elif self.subroutine_kind == METHOD:
+            self.vmWriter.write_push(ARGUMENT_SEG, 0)
+            self.vmWriter.write_pop(POINTER, 0)
         self.compile_statements()
         self.process("}")
         self.close_seq(SUBROUTINE_BODY)
@@ -270,14 +500,17 @@ class CompilationEngine:
         parameters =[]
         types =[]
         while self.tokenizer.current_token != ")":
+            token_index = self.tokenizer.token_index
             types.append(self.tokenizer.identifier())
-            self.process_basic_token(KEYWORD)
+            self.process_optional_tokens(keyword_extended)
             parameters.append(self.tokenizer.keyword())
             self.process_basic_token(IDENTIFIER)
             if self.tokenizer.current_token == COMMA:
                 self.process(COMMA)
+            if self.input_ended(token_index):
+                break
         for param in range(len(parameters)):
-            self.symbol_table.define(parameters[param],types[param],ARG)
+            self.define_variable(parameters[param],types[param],ARG)
         self.close_seq(PARAMETER_LIST_FLAG)
 
 
@@ -292,9 +525,12 @@ class CompilationEngine:
         names.append(self.tokenizer.identifier())
         self.process_basic_token(IDENTIFIER)
         while self.tokenizer.current_token == COMMA:
+            token_index = self.tokenizer.token_index
             self.process(COMMA)
             names.append(self.tokenizer.identifier())
             self.process_basic_token(IDENTIFIER)
+            if self.input_ended(token_index):
+                break
         self.process(";")
         self.write_to_ST(names,type,VAR)
         self.close_seq(VAR_DEC)
@@ -305,8 +541,13 @@ class CompilationEngine:
         "{}".
         """
         self.open_seq(STATEMENTS_FLAG)
+        ## the commands after a block, such as a while's jump back, belong
+        ## to the statement that owns the block
+        enclosing_line = self.vmWriter.line
         while self.tokenizer.current_token in statements:
             token =self.tokenizer.current_token
+            token_index = self.tokenizer.token_index
+            self.vmWriter.set_position(self.source_line())
             if token == LET:
                 self.compile_let()
             elif token == WHILE:
@@ -318,6 +559,9 @@ class CompilationEngine:
             elif token == RETURN:
                 self.compile_return()
                 break
+            if self.input_ended(token_index):
+                break
+        self.vmWriter.set_position(enclosing_line)
         self.close_seq(STATEMENTS_FLAG)
 
 
@@ -327,6 +571,8 @@ class CompilationEngine:
 
         self.process(DO)
         self.compile_subroutine_call()
+        ## the returned value is not used
+        self.vmWriter.write_pop(TEMP, 0)
         self.process(";")
         self.close_seq(DO_STAT)
 
@@ -335,27 +581,48 @@ class CompilationEngine:
         """Compiles a let statement."""
         self.open_seq(LET_STAT)
         self.process(LET)
+        name = self.tokenizer.current_token
+        name_line = self.tokenizer.line_number()
         self.process_basic_token(IDENTIFIER)
-        while self.tokenizer.current_token == "[":
+        is_array = self.tokenizer.current_token == "["
+        if is_array:
+            self.push_variable(name)
             self.process("[")
             self.compile_expression()
             self.process("]")
+            self.vmWriter.write_arithmetic("+")
         self.process("=")
         self.compile_expression()
         self.process(";")
+        if is_array:
+            ## the value is put aside while "that" is aligned to the target
+            self.vmWriter.write_pop(TEMP, 0)
+            self.vmWriter.write_pop(POINTER, 1)
+            self.vmWriter.write_push(TEMP, 0)
+            self.vmWriter.write_pop(THAT, 0)
+        else:
+            segment, index = self.find_variable_in_st(name, name_line)
+            if segment is not None:
+                self.vmWriter.write_pop(segment, index)
         self.close_seq(LET_STAT)
 
 
     def compile_while(self) -> None:
         """Compiles a while statement."""
         self.open_seq( WHILE_STAT )
+        label_index = self.new_label_index()
+        self.vmWriter.write_label("WHILE_EXP" + label_index)
         self.process("while")
         self.process("(")
         self.compile_expression()
         self.process(")")
+        self.vmWriter.write_arithmetic("~")
+        self.vmWriter.write_if("WHILE_END" + label_index)
         self.process("{")
         self.compile_statements()
         self.process("}")
+        self.vmWriter.write_goto("WHILE_EXP" + label_index)
+        self.vmWriter.write_label("WHILE_END" + label_index)
         self.close_seq(WHILE_STAT)
 
 
@@ -366,26 +633,36 @@ class CompilationEngine:
         self.process(RETURN)
         if self.tokenizer.current_token!=";":
             self.compile_expression()
+        else:
+            ## void subroutines return 0
+            self.vmWriter.write_push(CONSTANT, 0)
         self.process(DOT_COMMA)
+        self.vmWriter.write_return()
         self.close_seq(RETURN_STAT)
 
 
     def compile_if(self) -> None:
         """Compiles a if statement, possibly with a trailing else clause."""
         self.open_seq(IF_STAT)
+        label_index = self.new_label_index()
 
         self.process(IF)
         self.process("(")
         self.compile_expression()
         self.process( ")" )
+        self.vmWriter.write_arithmetic("~")
+        self.vmWriter.write_if("IF_FALSE" + label_index)
         self.process("{")
         self.compile_statements()
         self.process("}")
-        while self.tokenizer.current_token ==ELSE:
+        self.vmWriter.write_goto("IF_END" + label_index)
+        self.vmWriter.write_label("IF_FALSE" + label_index)
+        if self.tokenizer.current_token ==ELSE:
             self.process(ELSE)
             self.process("{")
             self.compile_statements()
             self.process("}")
+        self.vmWriter.write_label("IF_END" + label_index)
         self.close_seq(IF_STAT)
 
 
@@ -395,8 +672,16 @@ class CompilationEngine:
         if self.tokenizer.current_token not in parenthesis_closers:
             self.compile_term()
         while self.tokenizer.current_token in op_list:
+            operator = self.tokenizer.current_token
+            token_index = self.tokenizer.token_index
             self.process_optional_tokens(op_list)
             self.compile_term()
+            if operator in os_operators:
+                self.vmWriter.write_call(os_operators[operator], 2)
+            else:
+                self.vmWriter.write_arithmetic(operator)
+            if self.input_ended(token_index):
+                break
         self.close_seq(EXPRESSION)
 
 
@@ -419,70 +704,74 @@ class CompilationEngine:
             self.close_seq(TERM)
             return
         if self.tokenizer.current_token in unary_op:
+            operator = self.tokenizer.current_token
             self.process_optional_tokens(unary_op)
             self.compile_term()
+            self.vmWriter.write_arithmetic("NEG" if operator == "-" else "~")
             self.close_seq(TERM)
             return
-        if self.tokenizer.current_token not in parenthesis_openers:
-            self.process_optional_tokens(term_openers)
-            if self.tokenizer.current_token == ".":
-                self.process(".")
-                self.process_basic_token(IDENTIFIER)
-        ## turn into subroutine call
-        while self.tokenizer.current_token in parenthesis_openers:
-            type =  self.tokenizer.current_token
-            self.process_optional_tokens(parenthesis_openers)
-            if type == "(":
-                self.compile_expression_list()
-            elif type == "[":
-                self.compile_expression()
-            self.process_optional_tokens(parenthesis_closers)
+        token = self.tokenizer.current_token
+        token_type = self.tokenizer.token_type()
+        names = [token]
+        self.process_optional_tokens(term_openers)
+        if self.tokenizer.current_token == ".":
+            self.process(".")
+            names.append(self.tokenizer.current_token)
+            self.process_basic_token(IDENTIFIER)
+        if self.tokenizer.current_token == "(":
+            self.compile_call(names)
+        elif self.tokenizer.current_token == "[":
+            self.push_variable(token)
+            self.process("[")
+            self.compile_expression()
+            self.process("]")
+            self.vmWriter.write_arithmetic("+")
+            self.vmWriter.write_pop(POINTER, 1)
+            self.vmWriter.write_push(THAT, 0)
+        elif token_type == INTCONST:
+            self.vmWriter.write_push(CONSTANT, int(token))
+        elif token_type == STRINGCONST:
+            self.vmWriter.write_push(CONSTANT, len(token))
+            self.vmWriter.write_call("String.new", 1)
+            for character in token:
+                self.vmWriter.write_push(CONSTANT, ord(character))
+                self.vmWriter.write_call("String.appendChar", 2)
+        elif token == "this":
+            self.vmWriter.write_push(POINTER, 0)
+        elif token_type == KEYWORD:
+            ## true is -1, false and null are 0
+            self.vmWriter.write_push(CONSTANT, 0)
+            if token == "true":
+                self.vmWriter.write_arithmetic("~")
+        else:
+            self.push_variable(token)
         self.close_seq(TERM)
 
 
-    def compile_expression_list(self) -> None:
-        """Compiles a (possibly empty) comma-separated list of expressions."""
+    def compile_expression_list(self) -> int:
+        """Compiles a (possibly empty) comma-separated list of expressions.
+
+        Returns:
+            int: the number of expressions in the list.
+        """
         self.open_seq(EXPRESSION_LIST)
+        n_expressions = 0
         while self.tokenizer.current_token != ")":
             self.compile_expression()
+            n_expressions += 1
             if self.tokenizer.current_token == COMMA:
                 self.process(COMMA)
             else:
                 break
         self.close_seq(EXPRESSION_LIST)
+        return n_expressions
 
 
     def compile_subroutine_call(self)->None:
+        names = [self.tokenizer.current_token]
         self.process_basic_token(IDENTIFIER)
         if self.tokenizer.current_token == ".":
             self.process(".")
+            names.append(self.tokenizer.current_token)
             self.process_basic_token(IDENTIFIER)
-        self.process("(")
-        self.compile_expression_list()
-        self.process(")")
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+        self.compile_call(names)
@@ -0,0 +1,254 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+FUNCTION = "function"
+LABEL = "label"
+GOTO = "goto"
+IF_GOTO = "if-goto"
+RETURN = "return"
+
+jump_commands = [GOTO, IF_GOTO]
+block_enders = [GOTO, IF_GOTO, RETURN]
+
+
+def split_functions(lines: typing.List[str]) -> typing.Tuple[list, list]:
+    """
+    Args:
+        lines (typing.List[str]): the VM commands of a class.
+
+    Returns:
+        typing.Tuple[list, list]: the lines before the first function (such
+        as comments), and the lines of every function, each starting with
+        its "function" command.
+    """
+    prefix = []
+    functions = []
+    for line in lines:
+        if line.startswith(FUNCTION + " "):
+            functions.append([line])
+        elif functions:
+            functions[-1].append(line)
+        else:
+            prefix.append(line)
+    return prefix, functions
+
+
+def join_functions(prefix: list, functions: typing.List[list]) -> typing.List[str]:
+    """The inverse of split_functions."""
+    lines = list(prefix)
+    for function in functions:
+        lines.extend(function)
+    return lines
+
+
+def command_of(line: str) -> str:
+    """
+    Returns:
+        str: the command of a VM line, such as "push" or "label".
+    """
+    return line.split(" ", 1)[0]
+
+
+def argument_of(line: str) -> str:
+    """
+    Returns:
+        str: the first argument of a VM line, such as the label of a goto.
+    """
+    return line.split(" ")[1]
+
+
+class BasicBlock:
+    """A maximal run of VM commands that is only entered at its first command
+    and only left after its last one.
+    """
+
+    def __init__(self, index: int, commands: typing.List[str]) -> None:
+        """
+        Args:
+            index (int): the position of the block in the function.
+            commands (typing.List[str]): the commands of the block, labels
+            included.
+        """
+        self.index = index
+        self.commands = commands
+        self.successors = []
+        self.predecessors = []
+
+    def labels(self) -> typing.List[str]:
+        """
+        Returns:
+            typing.List[str]: the labels the block starts with.
+        """
+        labels = []
+        for command in self.commands:
+            if command_of(command) != LABEL:
+                break
+            labels.append(argument_of(command))
+        return labels
+
+    def last_command(self) -> str:
+        return self.commands[-1] if self.commands else ""
+
+    def falls_through(self) -> bool:
+        """
+        Returns:
+            bool: True if control can reach the next block by running past
+            the end of this one.
+        """
+        return command_of(self.last_command()) not in [GOTO, RETURN]
+
+
+class ControlFlowGraph:
+    """The basic blocks of a single VM function and the jumps between them.
+    Flow analyses and passes share it: they read and rewrite the commands of
+    the blocks, then call lines() to get the function back.
+    """
+
+    def __init__(self, function: typing.List[str]) -> None:
+        """
+        Args:
+            function (typing.List[str]): the lines of a function, starting with
+            its "function" command.
+        """
+        self.header = function[0]
+        self.blocks = []
+        current = []
+        for line in function[1:]:
+            if not line or line.startswith("//"):
+                continue
+            command = command_of(line)
+            if command == LABEL and current and \
+                    command_of(current[-1]) != LABEL:
+                self.blocks.append(BasicBlock(len(self.blocks), current))
+                current = []
+            current.append(line)
+            if command in block_enders:
+                self.blocks.append(BasicBlock(len(self.blocks), current))
+                current = []
+        if current:
+            self.blocks.append(BasicBlock(len(self.blocks), current))
+        self.link()
+
+    def link(self) -> None:
+        """Renumbers the blocks and recomputes their successors and
+        predecessors from their commands. Passes call it after changing
+        blocks.
+        """
+        label_blocks = self.label_blocks()
+        for position, block in enumerate(self.blocks):
+            block.index = position
+            block.successors = []
+            block.predecessors = []
+        for position, block in enumerate(self.blocks):
+            last = block.last_command()
+            if command_of(last) in jump_commands:
+                target = label_blocks.get(argument_of(last))
+                if target is not None:
+                    block.successors.append(target)
+            if block.falls_through() and position + 1 < len(self.blocks):
+                following = self.blocks[position + 1]
+                if following not in block.successors:
+                    block.successors.append(following)
+            for successor in block.successors:
+                successor.predecessors.append(block)
+
+    def label_blocks(self) -> typing.Dict[str, BasicBlock]:
+        """
+        Returns:
+            typing.Dict[str, BasicBlock]: the block each label starts.
+        """
+        label_blocks = {}
+        for block in self.blocks:
+            for label in block.labels():
+                label_blocks[label] = block
+        return label_blocks
+
+    def referenced_labels(self) -> typing.Set[str]:
+        """
+        Returns:
+            typing.Set[str]: the labels some jump of the function targets.
+        """
+        return set(argument_of(block.last_command()) for block in self.blocks
+                   if command_of(block.last_command()) in jump_commands)
+
+    def reachable_blocks(self) -> typing.List[BasicBlock]:
+        """
+        Returns:
+            typing.List[BasicBlock]: the blocks control can reach from the
+            start of the function, in their order in the function.
+        """
+        if not self.blocks:
+            return []
+        reached = set([self.blocks[0].index])
+        pending = [self.blocks[0]]
+        while pending:
+            for successor in pending.pop().successors:
+                if successor.index not in reached:
+                    reached.add(successor.index)
+                    pending.append(successor)
+        return [block for block in self.blocks if block.index in reached]
+
+    def merge_straight_line(self) -> int:
+        """Joins every block that starts without a label to the block before
+        it, when that block doesn't end with a jump, so it can only run into
+        it. Removing labels leaves such blocks behind.
+
+        Returns:
+            int: the number of blocks joined.
+        """
+        merged = []
+        for block in self.blocks:
+            if merged and not block.labels() and \
+                    command_of(merged[-1].last_command()) not in block_enders:
+                merged[-1].commands.extend(block.commands)
+            else:
+                merged.append(block)
+        joined = len(self.blocks) - len(merged)
+        self.blocks = merged
+        self.link()
+        return joined
+
+    def lines(self) -> typing.List[str]:
+        """
+        Returns:
+            typing.List[str]: the function, as VM lines.
+        """
+        lines = [self.header]
+        for block in self.blocks:
+            lines.extend(block.commands)
+        return lines
+
+    def backward_dataflow(self, transfer: typing.Callable) -> \
+            typing.Tuple[list, list]:
+        """Solves a backward "may" dataflow problem over sets, such as
+        liveness, by iterating to a fixed point.
+
+        Args:
+            transfer (typing.Callable): maps a block and the set live at its
+            end to the set live at its start.
+
+        Returns:
+            typing.Tuple[list, list]: the sets at the start and at the end of
+            every block, by block index.
+        """
+        block_in = [set() for _ in self.blocks]
+        block_out = [set() for _ in self.blocks]
+        changed = True
+        while changed:
+            changed = False
+            for block in reversed(self.blocks):
+                out = set()
+                for successor in block.successors:
+                    out |= block_in[successor.index]
+                new_in = transfer(block, out)
+                if new_in != block_in[block.index] or out != block_out[block.index]:
+                    block_in[block.index] = new_in
+                    block_out[block.index] = out
+                    changed = True
+        return block_in, block_out
@@ -0,0 +1,456 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+STACK_BASE = 256
+TEMP_BASE = 5
+FRAME_WORDS = 5
+
+## the registers holding the base of each segment
+segment_registers = {"local": "LCL", "argument": "ARG", "this": "THIS",
+                     "that": "THAT"}
+pointer_registers = ["THIS", "THAT"]
+
+binary_operations = {"add": "M+D", "sub": "M-D", "and": "D&M", "or": "D|M"}
+unary_operations = {"neg": "-M", "not": "!M"}
+comparison_jumps = {"eq": "JEQ", "gt": "JGT", "lt": "JLT"}
+## the jump taken when a comparison is false
+negated_jumps = {"JEQ": "JNE", "JGT": "JLE", "JLT": "JGE"}
+
+BOOTSTRAP_FUNCTIONS = ["Sys.init", "Main.main"]
+HALT_LABEL = "$$HALT"
+CALL_STUB = "$$CALL"
+RETURN_STUB = "$$RETURN"
+
+
+def split_command(line: str) -> typing.List[str]:
+    return line.split("//")[0].split()
+
+
+def instruction_count(lines: typing.List[str]) -> int:
+    """
+    Returns:
+        int: the number of Hack instructions, which is the ROM size of the
+        program once assembled.
+    """
+    return sum(1 for line in lines
+               if line and not line.startswith("(") and not line.startswith("//"))
+
+
+class VMTranslator:
+    """Translates VM code to Hack assembly one command at a time, the way
+    the book's VM translator does: every command becomes the same fixed
+    sequence, and every call and return is written out in full.
+    """
+
+    def __init__(self) -> None:
+        self.output = []
+        self.file_name = None
+        self.function_name = None
+        self.label_count = 0
+        self.defined_functions = set()
+        self.called_functions = set()
+
+    def translate(self, files: typing.List[typing.Tuple[str, typing.List[str]]]) -> \
+            typing.List[str]:
+        """
+        Args:
+            files (typing.List[typing.Tuple[str, typing.List[str]]]): the name
+            of every VM file of the program, without ".vm", and its lines.
+
+        Returns:
+            typing.List[str]: the assembly of the whole program. Functions
+            the program calls but doesn't define, such as those of the OS,
+            get a label that loops forever, and are listed by
+            external_functions.
+        """
+        self.output = []
+        for _, lines in files:
+            for line in lines:
+                parts = split_command(line)
+                if parts and parts[0] == "function":
+                    self.defined_functions.add(parts[1])
+        self.write_bootstrap()
+        for file_name, lines in files:
+            self.file_name = file_name
+            commands = [parts for parts in map(split_command, lines) if parts]
+            self.write_commands(commands)
+        self.write_support()
+        for name in self.external_functions():
+            self.output.extend(["(" + name + ")", "@" + name, "0;JMP"])
+        return self.output
+
+    def external_functions(self) -> typing.List[str]:
+        return sorted(self.called_functions - self.defined_functions)
+
+    def write(self, *instructions: str) -> None:
+        self.output.extend(instructions)
+
+    def new_label(self, kind: str) -> str:
+        self.label_count += 1
+        return str(self.function_name) + "$" + kind + "." + str(self.label_count)
+
+    def write_bootstrap(self) -> None:
+        self.write("@" + str(STACK_BASE), "D=A", "@SP", "M=D")
+        for name in BOOTSTRAP_FUNCTIONS:
+            if name in self.defined_functions:
+                self.write_call(name, 0)
+                break
+        self.write("(" + HALT_LABEL + ")", "@" + HALT_LABEL, "0;JMP")
+
+    def write_support(self) -> None:
+        """Writes the code the commands share, if they share any."""
+
+    def write_commands(self, commands: typing.List[typing.List[str]]) -> None:
+        for parts in commands:
+            self.write_command(parts)
+
+    def write_command(self, parts: typing.List[str]) -> None:
+        command = parts[0]
+        if command == "push":
+            self.write_push(parts[1], int(parts[2]))
+        elif command == "pop":
+            self.write_pop(parts[1], int(parts[2]))
+        elif command == "label":
+            self.write("(" + self.function_name + "$" + parts[1] + ")")
+        elif command == "goto":
+            self.write("@" + self.function_name + "$" + parts[1], "0;JMP")
+        elif command == "if-goto":
+            self.write_if(self.function_name + "$" + parts[1])
+        elif command == "function":
+            self.write_function(parts[1], int(parts[2]))
+        elif command == "call":
+            self.called_functions.add(parts[1])
+            self.write_call(parts[1], int(parts[2]))
+        elif command == "return":
+            self.write_return()
+        else:
+            self.write_arithmetic(command)
+
+    def address_of(self, segment: str, index: int) -> str:
+        """
+        Returns:
+            str: the symbol or number of a static, temp or pointer variable.
+        """
+        if segment == "static":
+            return self.file_name + "." + str(index)
+        if segment == "temp":
+            return str(TEMP_BASE + index)
+        return pointer_registers[index]
+
+    def write_push_d(self) -> None:
+        self.write("@SP", "A=M", "M=D", "@SP", "M=M+1")
+
+    def write_pop_d(self) -> None:
+        self.write("@SP", "M=M-1", "A=M", "D=M")
+
+    def write_push(self, segment: str, index: int) -> None:
+        if segment == "constant":
+            self.write("@" + str(index), "D=A")
+        elif segment in segment_registers:
+            self.write("@" + segment_registers[segment], "D=M",
+                       "@" + str(index), "A=D+A", "D=M")
+        elif segment == "temp":
+            self.write("@" + str(TEMP_BASE), "D=A", "@" + str(index),
+                       "A=D+A", "D=M")
+        else:
+            self.write("@" + self.address_of(segment, index), "D=M")
+        self.write_push_d()
+
+    def write_pop(self, segment: str, index: int) -> None:
+        if segment in segment_registers:
+            self.write("@" + segment_registers[segment], "D=M")
+        elif segment == "temp":
+            self.write("@" + str(TEMP_BASE), "D=A")
+        else:
+            self.write_pop_d()
+            self.write("@" + self.address_of(segment, index), "M=D")
+            return
+        self.write("@" + str(index), "D=D+A", "@R13", "M=D")
+        self.write_pop_d()
+        self.write("@R13", "A=M", "M=D")
+
+    def write_arithmetic(self, command: str) -> None:
+        if command in unary_operations:
+            self.write("@SP", "M=M-1", "A=M", "M=" + unary_operations[command],
+                       "@SP", "M=M+1")
+            return
+        self.write_pop_d()
+        self.write("@SP", "M=M-1", "A=M")
+        if command in binary_operations:
+            self.write("M=" + binary_operations[command])
+        else:
+            true_label = self.new_label("TRUE")
+            end_label = self.new_label("END")
+            self.write("D=M-D", "@" + true_label, "D;" + comparison_jumps[command],
+                       "@SP", "A=M", "M=0", "@" + end_label, "0;JMP",
+                       "(" + true_label + ")", "@SP", "A=M", "M=-1",
+                       "(" + end_label + ")")
+        self.write("@SP", "M=M+1")
+
+    def write_if(self, label: str) -> None:
+        self.write_pop_d()
+        self.write("@" + label, "D;JNE")
+
+    def write_function(self, name: str, n_locals: int) -> None:
+        self.function_name = name
+        self.write("(" + name + ")")
+        for _ in range(n_locals):
+            self.write_push("constant", 0)
+
+    def write_call(self, name: str, n_args: int) -> None:
+        return_label = self.new_label("ret")
+        self.write("@" + return_label, "D=A")
+        self.write_push_d()
+        for register in ["LCL", "ARG", "THIS", "THAT"]:
+            self.write("@" + register, "D=M")
+            self.write_push_d()
+        self.write("@SP", "D=M", "@" + str(FRAME_WORDS), "D=D-A",
+                   "@" + str(n_args), "D=D-A", "@ARG", "M=D",
+                   "@SP", "D=M", "@LCL", "M=D",
+                   "@" + name, "0;JMP", "(" + return_label + ")")
+
+    def write_return(self) -> None:
+        self.write("@LCL", "D=M", "@R13", "M=D",
+                   "@" + str(FRAME_WORDS), "A=D-A", "D=M", "@R14", "M=D")
+        self.write_pop_d()
+        self.write("@ARG", "A=M", "M=D", "@ARG", "D=M+1", "@SP", "M=D")
+        for register in ["THAT", "THIS", "ARG", "LCL"]:
+            self.write("@R13", "AM=M-1", "D=M", "@" + register, "M=D")
+        self.write("@R14", "A=M", "0;JMP")
+
+
+class HackBackend(VMTranslator):
+    """Translates VM code to compact Hack assembly:
+    - Calls and returns jump to shared stubs, one call stub per argument
+      count, instead of being written out at every call.
+    - Constants, statics, temps and pointers are pushed and popped with
+      direct addressing, and small segment offsets without arithmetic.
+    - A push followed by a pop moves the value without the stack, a
+      constant added or subtracted changes the top of the stack in place,
+      and a comparison followed by an if-goto becomes a single jump.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.call_stubs = set()
+        self.uses_return = False
+
+    def write_commands(self, commands: typing.List[typing.List[str]]) -> None:
+        position = 0
+        while position < len(commands):
+            position += self.write_fused(commands, position)
+
+    def write_fused(self, commands: typing.List[typing.List[str]],
+                    position: int) -> int:
+        """Writes the command at the position, together with the commands
+        after it when they have a shorter translation together.
+
+        Returns:
+            int: the number of commands written.
+        """
+        parts = commands[position]
+        following = commands[position + 1:position + 3]
+        names = [other[0] for other in following]
+        if parts[0] == "push" and names[:1] == ["pop"]:
+            self.write_move(parts[1], int(parts[2]), following[0][1],
+                            int(following[0][2]))
+            return 2
+        if parts[:2] == ["push", "constant"] and names[:1] in [["add"], ["sub"]]:
+            value = int(parts[2])
+            operator = "+" if names[0] == "add" else "-"
+            if value == 1:
+                self.write("@SP", "A=M-1", "M=M" + operator + "1")
+            else:
+                self.write("@" + str(value), "D=A", "@SP", "A=M-1",
+                           "M=M" + operator + "D")
+            return 2
+        if parts[0] in comparison_jumps:
+            jump = comparison_jumps[parts[0]]
+            if names[:2] == ["not", "if-goto"]:
+                self.write_compare_jump(negated_jumps[jump], following[1][1])
+                return 3
+            if names[:1] == ["if-goto"]:
+                self.write_compare_jump(jump, following[0][1])
+                return 2
+        if parts[0] == "not" and names[:1] == ["if-goto"]:
+            self.write_pop_d()
+            self.write("@" + self.function_name + "$" + following[0][1], "D;JEQ")
+            return 2
+        self.write_command(parts)
+        return 1
+
+    def write_compare_jump(self, jump: str, label: str) -> None:
+        self.write("@SP", "AM=M-1", "D=M", "@SP", "AM=M-1", "D=M-D",
+                   "@" + self.function_name + "$" + label, "D;" + jump)
+
+    def write_load_d(self, segment: str, index: int) -> None:
+        """Writes the instructions that put the value of a variable in D."""
+        if segment == "constant":
+            self.write("@" + str(index), "D=A")
+        elif segment in segment_registers:
+            register = "@" + segment_registers[segment]
+            if index == 0:
+                self.write(register, "A=M", "D=M")
+            elif index == 1:
+                self.write(register, "A=M+1", "D=M")
+            else:
+                self.write("@" + str(index), "D=A", register, "A=D+M", "D=M")
+        else:
+            self.write("@" + self.address_of(segment, index), "D=M")
+
+    def write_push_d(self) -> None:
+        self.write("@SP", "AM=M+1", "A=A-1", "M=D")
+
+    def write_pop_d(self) -> None:
+        self.write("@SP", "AM=M-1", "D=M")
+
+    def write_push(self, segment: str, index: int) -> None:
+        if segment == "constant" and index in [0, 1]:
+            self.write("@SP", "AM=M+1", "A=A-1", "M=" + str(index))
+            return
+        self.write_load_d(segment, index)
+        self.write_push_d()
+
+    def write_store_d(self, segment: str, index: int) -> bool:
+        """Writes the instructions that store D in a variable, if they need
+        no other register.
+
+        Returns:
+            bool: False if nothing was written, because the variable's
+            address must be computed before D is loaded.
+        """
+        if segment in segment_registers:
+            if index > 3:
+                return False
+            self.write("@" + segment_registers[segment], "A=M" if index == 0 else "A=M+1")
+            for _ in range(index - 1):
+                self.write("A=A+1")
+            self.write("M=D")
+        else:
+            self.write("@" + self.address_of(segment, index), "M=D")
+        return True
+
+    def write_address_r13(self, segment: str, index: int) -> None:
+        self.write("@" + str(index), "D=A", "@" + segment_registers[segment],
+                   "D=D+M", "@R13", "M=D")
+
+    def write_pop(self, segment: str, index: int) -> None:
+        if segment in segment_registers and index > 3:
+            self.write_address_r13(segment, index)
+            self.write_pop_d()
+            self.write("@R13", "A=M", "M=D")
+            return
+        self.write_pop_d()
+        self.write_store_d(segment, index)
+
+    def write_move(self, source: str, source_index: int, target: str,
+                   target_index: int) -> None:
+        """Translates a push followed by a pop."""
+        if target in segment_registers and target_index > 3:
+            self.write_address_r13(target, target_index)
+            self.write_load_d(source, source_index)
+            self.write("@R13", "A=M", "M=D")
+            return
+        self.write_load_d(source, source_index)
+        self.write_store_d(target, target_index)
+
+    def write_arithmetic(self, command: str) -> None:
+        if command in unary_operations:
+            self.write("@SP", "A=M-1", "M=" + unary_operations[command])
+        elif command in binary_operations:
+            self.write("@SP", "AM=M-1", "D=M", "A=A-1",
+                       "M=" + binary_operations[command])
+        else:
+            end_label = self.new_label("CMP")
+            self.write("@SP", "AM=M-1", "D=M", "A=A-1", "D=M-D", "M=-1",
+                       "@" + end_label, "D;" + comparison_jumps[command],
+                       "@SP", "A=M-1", "M=0", "(" + end_label + ")")
+
+    def write_if(self, label: str) -> None:
+        self.write_pop_d()
+        self.write("@" + label, "D;JNE")
+
+    def write_function(self, name: str, n_locals: int) -> None:
+        self.function_name = name
+        self.write("(" + name + ")")
+        if n_locals == 0:
+            return
+        self.write("@SP", "A=M")
+        for local in range(n_locals):
+            self.write("M=0", "A=A+1" if local + 1 < n_locals else "D=A+1")
+        self.write("@SP", "M=D")
+
+    def write_call(self, name: str, n_args: int) -> None:
+        self.call_stubs.add(n_args)
+        return_label = self.new_label("ret")
+        self.write("@" + name, "D=A", "@R13", "M=D",
+                   "@" + return_label, "D=A",
+                   "@" + CALL_STUB + str(n_args), "0;JMP",
+                   "(" + return_label + ")")
+
+    def write_return(self) -> None:
+        self.uses_return = True
+        self.write("@" + RETURN_STUB, "0;JMP")
+
+    def write_support(self) -> None:
+        """Writes the call stubs, which get the function's address in R13
+        and the return address in D, and the return stub.
+        """
+        for n_args in sorted(self.call_stubs):
+            self.write("(" + CALL_STUB + str(n_args) + ")",
+                       "@SP", "A=M", "M=D")
+            for register in ["LCL", "ARG", "THIS", "THAT"]:
+                self.write("@" + register, "D=M", "@SP", "AM=M+1", "M=D")
+            self.write("@SP", "MD=M+1", "@LCL", "M=D",
+                       "@" + str(FRAME_WORDS + n_args), "D=D-A", "@ARG", "M=D",
+                       "@R13", "A=M", "0;JMP")
+        if self.uses_return:
+            ## LCL walks down the saved frame, and is restored last
+            self.write("(" + RETURN_STUB + ")",
+                       "@LCL", "D=M", "@" + str(FRAME_WORDS), "A=D-A", "D=M",
+                       "@R14", "M=D",
+                       "@SP", "AM=M-1", "D=M", "@ARG", "A=M", "M=D",
+                       "D=A+1", "@SP", "M=D")
+            for register in ["THAT", "THIS", "ARG"]:
+                self.write("@LCL", "AM=M-1", "D=M", "@" + register, "M=D")
+            self.write("@LCL", "A=M-1", "D=M", "@LCL", "M=D",
+                       "@R14", "A=M", "0;JMP")
+
+
+def read_vm_files(paths: typing.Iterable[str]) -> \
+        typing.List[typing.Tuple[str, typing.List[str]]]:
+    """
+    Returns:
+        typing.List[typing.Tuple[str, typing.List[str]]]: the name and lines
+        of every VM file, as translate takes them.
+    """
+    import os
+    files = []
+    for path in paths:
+        with open(path, "r") as vm_file:
+            files.append((os.path.splitext(os.path.basename(path))[0],
+                          vm_file.read().splitlines()))
+    return files
+
+
+if "__main__" == __name__:
+    # Translates the VM classes framed in the standard input, as
+    # "JackCompiler --pipe" writes them, into Hack assembly on the standard
+    # output. VM code without frames is translated as a single file, Main.
+    import os
+    import sys
+    from PipeFrames import read_frames
+    files = [(os.path.splitext(name)[0] if name else "Main", lines)
+             for name, lines in read_frames(sys.stdin)]
+    backend = HackBackend()
+    sys.stdout.write("\n".join(backend.translate(files)) + "\n")
+    if backend.external_functions():
+        print("warning: functions not defined in the program, such as the OS "
+              "functions, loop forever: " + ", ".join(backend.external_functions()),
+              file=sys.stderr)
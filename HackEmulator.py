@@ -0,0 +1,251 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import collections
+import typing
+from VMEmulator import VMEmulator, EmulatorError, SP, LCL, ARG, THIS, THAT, \
+    RAM_SIZE
+from VMExpressions import word
+
+FIRST_VARIABLE = 16
+
+predefined_symbols = {"SP": 0, "LCL": 1, "ARG": 2, "THIS": 3, "THAT": 4,
+                      "SCREEN": 16384, "KBD": 24576}
+predefined_symbols.update({"R" + str(index): index for index in range(16)})
+
+## what the ALU computes, from D, A and M
+computations = {
+    "0": lambda d, a, m: 0,
+    "1": lambda d, a, m: 1,
+    "-1": lambda d, a, m: -1,
+    "D": lambda d, a, m: d,
+    "A": lambda d, a, m: a,
+    "M": lambda d, a, m: m,
+    "!D": lambda d, a, m: ~d,
+    "!A": lambda d, a, m: ~a,
+    "!M": lambda d, a, m: ~m,
+    "-D": lambda d, a, m: -d,
+    "-A": lambda d, a, m: -a,
+    "-M": lambda d, a, m: -m,
+    "D+1": lambda d, a, m: d + 1,
+    "A+1": lambda d, a, m: a + 1,
+    "M+1": lambda d, a, m: m + 1,
+    "D-1": lambda d, a, m: d - 1,
+    "A-1": lambda d, a, m: a - 1,
+    "M-1": lambda d, a, m: m - 1,
+    "D+A": lambda d, a, m: d + a,
+    "D+M": lambda d, a, m: d + m,
+    "D-A": lambda d, a, m: d - a,
+    "D-M": lambda d, a, m: d - m,
+    "A-D": lambda d, a, m: a - d,
+    "M-D": lambda d, a, m: m - d,
+    "D&A": lambda d, a, m: d & a,
+    "D&M": lambda d, a, m: d & m,
+    "D|A": lambda d, a, m: d | a,
+    "D|M": lambda d, a, m: d | m,
+}
+## the same computations with their operands swapped
+for comp, operands in [("A+D", "D+A"), ("M+D", "D+M"), ("A&D", "D&A"),
+                       ("M&D", "D&M"), ("A|D", "D|A"), ("M|D", "D|M")]:
+    computations[comp] = computations[operands]
+
+jumps = {
+    "": lambda value: False,
+    "JGT": lambda value: value > 0,
+    "JEQ": lambda value: value == 0,
+    "JGE": lambda value: value >= 0,
+    "JLT": lambda value: value < 0,
+    "JNE": lambda value: value != 0,
+    "JLE": lambda value: value <= 0,
+    "JMP": lambda value: True,
+}
+
+
+class Instruction:
+    """A decoded Hack instruction."""
+
+    def __init__(self, line: str, symbols: dict) -> None:
+        """
+        Args:
+            line (str): the instruction, without comments or whitespace.
+            symbols (dict): the address of every label and variable.
+        """
+        self.is_address = line.startswith("@")
+        if self.is_address:
+            value = line[1:]
+            self.value = int(value) if value.isdigit() else symbols[value]
+            return
+        dest, _, rest = line.rpartition("=")
+        comp, _, jump = rest.partition(";")
+        if comp not in computations or jump not in jumps:
+            raise ValueError("unknown instruction: " + line)
+        self.compute = computations[comp]
+        self.reads_memory = "M" in comp
+        self.to_a = "A" in dest
+        self.to_d = "D" in dest
+        self.to_m = "M" in dest
+        self.jump = jumps[jump]
+        self.jumps = bool(jump)
+
+
+def assemble(lines: typing.Iterable[str]) -> \
+        typing.Tuple[typing.List[Instruction], typing.Dict[str, int]]:
+    """
+    Args:
+        lines (typing.Iterable[str]): Hack assembly.
+
+    Returns:
+        typing.Tuple[typing.List[Instruction], typing.Dict[str, int]]: the
+        program, and the address of every label.
+    """
+    program = []
+    for line in lines:
+        line = line.split("//")[0].replace(" ", "").strip()
+        if line:
+            program.append(line)
+    labels = {}
+    instructions = []
+    for line in program:
+        if line.startswith("("):
+            labels[line[1:-1]] = len(instructions)
+        else:
+            instructions.append(line)
+    symbols = dict(predefined_symbols)
+    symbols.update(labels)
+    next_variable = FIRST_VARIABLE
+    for line in instructions:
+        if line.startswith("@") and not line[1:].isdigit() and \
+                line[1:] not in symbols:
+            symbols[line[1:]] = next_variable
+            next_variable += 1
+    return [Instruction(line, symbols) for line in instructions], labels
+
+
+class HackEmulator:
+    """Runs an assembled Hack program and counts the cycles it takes, one per
+    instruction. Functions the program calls without defining them are run
+    by VMEmulator's OS stubs, which take no cycles, so two translations of
+    the same VM code can be compared on the code they translated.
+    """
+
+    def __init__(self, lines: typing.Iterable[str],
+                 external_functions: typing.Iterable[str] = (),
+                 inputs: typing.Iterable[int] = (),
+                 max_cycles: int = 10 ** 8) -> None:
+        """
+        Args:
+            lines (typing.Iterable[str]): the assembly of the program.
+            external_functions (typing.Iterable[str]): the functions whose
+            labels are trapped and run in Python.
+            inputs (typing.Iterable[int]): the numbers Keyboard.readInt
+            returns, in order.
+            max_cycles (int): the run stops with an error after this many
+            cycles.
+        """
+        self.rom, self.labels = assemble(lines)
+        self.operating_system = VMEmulator([], inputs)
+        self.ram = self.operating_system.ram
+        self.traps = {self.labels[name]: name for name in external_functions}
+        self.max_cycles = max_cycles
+        self.cycles = 0
+        self.os_calls = collections.Counter()
+
+    @property
+    def output(self) -> typing.List[str]:
+        return self.operating_system.output
+
+    def call_os(self, name: str) -> int:
+        """Runs a trapped function on the frame the call made, and returns
+        the way a "return" command does.
+
+        Returns:
+            int: the address to continue at, or None if the program halts.
+        """
+        ram = self.ram
+        frame = ram[LCL]
+        n_args = frame - 5 - ram[ARG]
+        arguments = ram[ram[ARG]:ram[ARG] + n_args]
+        self.os_calls[name] += 1
+        result = self.operating_system.call_os(name, arguments)
+        if result is None:
+            return None
+        return_address = ram[frame - 5]
+        ram[ram[ARG]] = word(result)
+        ram[SP] = ram[ARG] + 1
+        ram[THAT], ram[THIS], ram[ARG], ram[LCL] = \
+            ram[frame - 1], ram[frame - 2], ram[frame - 3], ram[frame - 4]
+        return return_address
+
+    def run(self, halt_label: str = None) -> None:
+        """Runs until the program reaches the halt label, jumps to itself or
+        calls Sys.halt.
+        """
+        rom = self.rom
+        ram = self.ram
+        traps = self.traps
+        halt = self.labels.get(halt_label)
+        a = d = 0
+        pc = 0
+        cycles = 0
+        max_cycles = self.max_cycles
+        while pc != halt:
+            if pc in traps:
+                pc = self.call_os(traps[pc])
+                if pc is None:
+                    break
+                continue
+            if cycles >= max_cycles:
+                self.cycles = cycles
+                raise EmulatorError("ran for more than " + str(max_cycles) + " cycles")
+            instruction = rom[pc]
+            cycles += 1
+            if instruction.is_address:
+                a = instruction.value
+                pc += 1
+                continue
+            value = word(instruction.compute(
+                d, a, ram[a] if instruction.reads_memory else 0))
+            if instruction.to_m:
+                if a >= RAM_SIZE:
+                    raise EmulatorError("write outside of RAM: " + str(a))
+                ram[a] = value
+            jump = instruction.jumps and instruction.jump(value)
+            target = a
+            if instruction.to_a:
+                a = value
+            if instruction.to_d:
+                d = value
+            if jump:
+                if target == pc:
+                    break
+                pc = target
+            else:
+                pc += 1
+        self.cycles = cycles
+
+
+if "__main__" == __name__:
+    # Translates the VM files of a compiled program naively and with
+    # HackBackend, runs both, and compares their ROM size and cycles.
+    import glob
+    import os
+    import sys
+    from HackBackend import VMTranslator, HackBackend, read_vm_files, \
+        instruction_count, HALT_LABEL
+    if len(sys.argv) < 2:
+        sys.exit("Invalid usage, please use: HackEmulator.py <vm directory> "
+                 "[numbers for Keyboard.readInt ...]")
+    files = read_vm_files(sorted(glob.glob(os.path.join(sys.argv[1], "*.vm"))))
+    inputs = [int(number) for number in sys.argv[2:]]
+    print("%-12s %8s %10s" % ("translation", "ROM", "cycles"))
+    for translator in [VMTranslator(), HackBackend()]:
+        assembly = translator.translate(files)
+        emulator = HackEmulator(assembly, translator.external_functions(), inputs)
+        emulator.run(HALT_LABEL)
+        print("%-12s %8d %10d   %s" % (
+            type(translator).__name__, instruction_count(assembly),
+            emulator.cycles, "".join(emulator.output).replace("\n", " ")))
@@ -0,0 +1,744 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import bisect
+import io
+import re
+import typing
+from ClassIndex import ClassIndex, ClassEntry, Variable, Signature, \
+    scan_class, class_var_dec_openers, subroutine_openers, CONSTRUCTOR, FIELD
+from CompilationEngine import CompilationEngine
+from JackCompiler import compile_file
+from JackTokenizer import JackTokenizer, KEYWORD, SYMBOL, IDENTIFIER
+from PassManager import PassManager
+
+## the key the class is indexed under when the editor gives none
+EDITOR_KEY = "<editor>"
+## compiled after every chunk, standing for what follows it in the class. A
+## chunk whose members are complete stops right at the first of them
+SENTINEL_LINES = ["}", "}"]
+## finds the line of an error message, so it can follow its subroutine when
+## lines are added or removed above it
+ERROR_LINE = re.compile(r"(error: line )(\d+)")
+## returned instead of a number of chunks when the class couldn't be split
+## into them and was compiled whole
+WHOLE_CLASS = -1
+
+
+def renamed_calls(vm_code: str, old_name: str, new_name: str) -> str:
+    """
+    Args:
+        vm_code (str): VM code compiled in a class of the old name.
+
+    Returns:
+        str: the code with the functions of the class and the calls to them
+        named after the new name.
+    """
+    return re.sub(r"^(function|call) " + re.escape(old_name) + r"\.",
+                  r"\1 " + new_name + ".", vm_code,
+                  flags=re.MULTILINE)
+
+
+def tokenize(lines: typing.List[str], first_line: int) -> tuple:
+    """
+    Args:
+        lines (typing.List[str]): consecutive lines of a Jack file.
+        first_line (int): the line of the file the first of them is.
+
+    Returns:
+        tuple: the (token type, token, line) of every token on the lines, and
+        True if a /* comment is still open at the end of them.
+    """
+    if not "".join(lines).strip():
+        return [], False
+    tokenizer = JackTokenizer(io.StringIO("\n".join(lines)), first_line)
+    tokens = [(token_type, token, tokenizer.line_number())
+              for token_type, token in tokenizer.tokens()]
+    return tokens, "*" in tokenizer.line_breakers
+
+
+def split_members(tokens: typing.List[tuple]) -> typing.List[tuple]:
+    """
+    Args:
+        tokens (typing.List[tuple]): tokens of the inside of a class.
+
+    Returns:
+        typing.List[tuple]: the first and last token index of every class
+        variable declaration and subroutine, or None if the tokens hold
+        anything else or end in the middle of one.
+    """
+    members = []
+    index = 0
+    while index < len(tokens):
+        start = index
+        if tokens[index][1] in class_var_dec_openers:
+            while index < len(tokens) and tokens[index][1] != ";":
+                index += 1
+        elif tokens[index][1] in subroutine_openers:
+            depth = 0
+            while index < len(tokens):
+                token_type, token, _ = tokens[index]
+                if token_type == SYMBOL and token == "{":
+                    depth += 1
+                elif token_type == SYMBOL and token == "}":
+                    depth -= 1
+                    if depth <= 0:
+                        break
+                index += 1
+            if index < len(tokens) and depth < 0:
+                return None
+        else:
+            return None
+        if index == len(tokens):
+            return None
+        members.append((start, index))
+        index += 1
+    return members
+
+
+class Chunk:
+    """Whole lines of a class holding one or more of its members: variable
+    declarations and subroutines. Members share a chunk only when they share
+    a line, so every chunk can be tokenized and compiled on its own. Lines an
+    edit left that can't be split into members, such as a subroutine missing
+    a closing brace, make a single broken chunk, whose errors stay its own.
+    """
+
+    def __init__(self, class_name: str, tokens: typing.List[tuple],
+                 members: typing.List[tuple] = None) -> None:
+        """
+        Args:
+            class_name (str): the class the members belong to.
+            tokens (typing.List[tuple]): (token type, token, line) of the
+            members.
+            members (typing.List[tuple]): the first and last token index of
+            every member, None for a broken chunk.
+        """
+        self.first_line = tokens[0][2]
+        self.last_line = tokens[-1][2]
+        self.token_count = len(tokens)
+        self.kinds = [tokens[start][1] for start, _ in members] \
+            if members is not None else []
+        declarations = scan_class(
+            [(KEYWORD, "class"), (IDENTIFIER, class_name), (SYMBOL, "{")] +
+            [(token_type, token) for token_type, token, _ in tokens])
+        self.variables = declarations.variables
+        self.subroutines = declarations.subroutines
+        self.identifiers = set(token for token_type, token, _ in tokens
+                               if token_type == IDENTIFIER)
+        self.vm_code = ""
+        self.errors = ""
+        self.compiled_line = self.first_line
+
+    def shift(self, lines: int) -> None:
+        self.first_line += lines
+        self.last_line += lines
+
+    def diagnostics(self) -> str:
+        """
+        Returns:
+            str: the error messages of the chunk, with the lines they name
+            moved along with the chunk since it was compiled.
+        """
+        offset = self.first_line - self.compiled_line
+        if offset == 0 or not self.errors:
+            return self.errors
+        return ERROR_LINE.sub(lambda match: match.group(1) + str(
+            int(match.group(2)) + offset), self.errors)
+
+
+def group_members(class_name: str, tokens: typing.List[tuple],
+                  members: typing.List[tuple]) -> typing.List[Chunk]:
+    """
+    Returns:
+        typing.List[Chunk]: the members split into chunks, members that share
+        a line in the same one.
+    """
+    chunks = []
+    group = []
+    for start, end in members:
+        if group and tokens[start][2] > tokens[group[-1][1]][2]:
+            chunks.append(Chunk(class_name, tokens[group[0][0]:group[-1][1] + 1],
+                                [(first - group[0][0], last - group[0][0])
+                                 for first, last in group]))
+            group = []
+        group.append((start, end))
+    if group:
+        chunks.append(Chunk(class_name, tokens[group[0][0]:group[-1][1] + 1],
+                            [(first - group[0][0], last - group[0][0])
+                             for first, last in group]))
+    return chunks
+
+
+def make_chunks(class_name: str,
+                tokens: typing.List[tuple]) -> typing.List[Chunk]:
+    """
+    Returns:
+        typing.List[Chunk]: the tokens of the inside of a class split into
+        chunks, or a single broken chunk if they can't be split into members.
+    """
+    if not tokens:
+        return []
+    members = split_members(tokens)
+    if members is None:
+        return [Chunk(class_name, tokens)]
+    return group_members(class_name, tokens, members)
+
+
+def variable_positions(variables: typing.List[Variable]) -> dict:
+    """
+    Returns:
+        dict: the kind, type and index of every class variable, by name.
+    """
+    counts = {}
+    positions = {}
+    for kind, var_type, name in variables:
+        positions[name] = (kind, var_type, counts.get(kind, 0))
+        counts[kind] = counts.get(kind, 0) + 1
+    return positions
+
+
+def changed_names(old: dict, new: dict) -> typing.Set[str]:
+    """
+    Returns:
+        typing.Set[str]: the names added, removed or changed between the two.
+    """
+    return set(name for name in set(old) | set(new)
+               if old.get(name) != new.get(name))
+
+
+class IncrementalCompiler:
+    """Keeps the VM code and the error messages of a single class up to date
+    as an editor changes it. An edit is tokenized and compiled again only in
+    the lines of the members it touched and the blank lines and comments
+    around them, and in the subroutines that use a class variable or a
+    subroutine whose declaration it changed. A syntax error stays in the
+    chunk it is in, which reports it on its own while the rest of the class
+    keeps its code, so the messages of a broken class may differ from those
+    of compile_file. Renaming the class compiles only the chunks that name
+    it. Only a class that can't be split into chunks at all, such as one
+    missing its closing brace, is compiled whole, as compile_file does.
+    """
+
+    def __init__(self, text: str, class_index: ClassIndex = None,
+                 pass_manager: PassManager = None,
+                 key: str = EDITOR_KEY) -> None:
+        """
+        Args:
+            text (str): the Jack source of the class.
+            class_index (ClassIndex): signatures of the classes in the
+            project. The entry of this class is kept up to date as it is
+            edited. A new index holding only this class if None.
+            pass_manager (PassManager): the optimizations to run on the
+            output.
+            key (str): the key of the class in the index, usually its path.
+        """
+        self.class_index = class_index if class_index is not None else ClassIndex()
+        self.pass_manager = pass_manager
+        self.key = key
+        self.lines = []
+        self.class_name = None
+        ## the last line of the class header, which is the line of its "{"
+        ## unless the header is broken
+        self.header_line = 0
+        self.footer_line = 0
+        ## the error messages of a broken header, whose chunks keep the code
+        ## of the last class name
+        self.header_errors = ""
+        ## None while the class can't be split into chunks
+        self.chunks = None
+        ## the outputs of compiling the whole class while it can't be split
+        self.whole_vm_code = ""
+        self.whole_errors = ""
+        self.set_text(text)
+
+    def text(self) -> str:
+        """
+        Returns:
+            str: the current source of the class.
+        """
+        return "\n".join(self.lines)
+
+    def set_text(self, text: str) -> int:
+        """Replaces the whole source and compiles all of it.
+
+        Returns:
+            int: the number of chunks compiled, WHOLE_CLASS if the class
+            could not be split into them.
+        """
+        self.lines = text.split("\n")
+        return self.rebuild()
+
+    def edit(self, start_line: int, start_column: int, end_line: int,
+             end_column: int, text: str) -> int:
+        """Replaces a range of the source, as editors report changes, and
+        compiles what the change affects.
+
+        Args:
+            start_line (int): the line the range starts at, counted from 0.
+            start_column (int): the column the range starts at.
+            end_line (int): the line the range ends at.
+            end_column (int): the column after the end of the range.
+            text (str): the new text of the range.
+
+        Returns:
+            int: the number of chunks compiled again, WHOLE_CLASS if the class
+            could not be split into them and was compiled whole.
+        """
+        replaced = self.lines[start_line][:start_column] + text + \
+            self.lines[end_line][end_column:]
+        new_lines = replaced.split("\n")
+        self.lines[start_line:end_line + 1] = new_lines
+        shift = len(new_lines) - (end_line - start_line + 1)
+        compiled = None
+        if self.chunks is not None:
+            compiled = self.patch(start_line, end_line, shift)
+        if compiled is None:
+            return self.rebuild()
+        return compiled
+
+    def vm_code(self) -> str:
+        """
+        Returns:
+            str: the VM code of the class, as compile_file writes it while
+            the class has no errors.
+        """
+        if self.chunks is None:
+            return self.whole_vm_code
+        return "".join(chunk.vm_code for chunk in self.chunks)
+
+    def diagnostics(self) -> str:
+        """
+        Returns:
+            str: the error messages of the class, those of compile_file while
+            it has none.
+        """
+        if self.chunks is None:
+            return self.whole_errors
+        return self.header_errors + \
+            "".join(chunk.diagnostics() for chunk in self.chunks)
+
+    def rebuild(self) -> int:
+        """Splits the whole source into chunks and compiles all of them, or
+        compiles it as a single class if it can't be split.
+
+        Returns:
+            int: the number of chunks compiled, WHOLE_CLASS if the class was
+            compiled whole.
+        """
+        self.header_errors = ""
+        self.chunks = self.split()
+        if self.chunks is None:
+            self.class_index.add_source(self.key, self.text())
+            self.compile_whole()
+            return WHOLE_CLASS
+        self.update_index()
+        for index in range(len(self.chunks)):
+            self.compile_chunk(index)
+        return len(self.chunks)
+
+    def compile_whole(self) -> None:
+        """Compiles the whole class, as compile_file does."""
+        vm_file = io.StringIO()
+        error_file = io.StringIO()
+        compile_file(io.StringIO(self.text()), vm_file, self.class_index,
+                     self.pass_manager, error_file=error_file)
+        self.whole_vm_code = vm_file.getvalue()
+        self.whole_errors = error_file.getvalue()
+
+    def split(self) -> typing.List[Chunk]:
+        """
+        Returns:
+            typing.List[Chunk]: the chunks of the class, or None if it isn't
+            a complete class whose members each tokenize the same on their
+            own lines.
+        """
+        tokens, open_comment = tokenize(self.lines, 0)
+        if open_comment or len(tokens) < 4 or tokens[0][1] != "class" or \
+                tokens[1][0] != IDENTIFIER or tokens[2][1] != "{" or \
+                tokens[-1][1] != "}":
+            return None
+        members = split_members(tokens[3:-1])
+        if members is None:
+            return None
+        self.class_name = tokens[1][1]
+        self.header_line = tokens[2][2]
+        self.footer_line = tokens[-1][2]
+        chunks = group_members(self.class_name, tokens[3:-1], members)
+        if chunks and (chunks[0].first_line <= self.header_line or
+                       chunks[-1].last_line >= self.footer_line):
+            return None
+        header_tokens, open_comment = tokenize(
+            self.lines[:self.header_line + 1], 0)
+        if open_comment or header_tokens != tokens[:3]:
+            return None
+        if not self.ordered(chunks) or \
+                not self.tokenized_alone(chunks, tokens[3:-1]):
+            return None
+        return chunks
+
+    @staticmethod
+    def ordered(chunks: typing.List[Chunk]) -> bool:
+        """
+        Returns:
+            bool: True if all the class variables are declared before the
+            subroutines, as the grammar requires.
+        """
+        kinds = [kind for chunk in chunks for kind in chunk.kinds]
+        return not any(kinds[index] in class_var_dec_openers
+                       for index in range(1, len(kinds))
+                       if kinds[index - 1] in subroutine_openers)
+
+    def tokenized_alone(self, chunks: typing.List[Chunk],
+                        tokens: typing.List[tuple]) -> bool:
+        """
+        Args:
+            chunks (typing.List[Chunk]): chunks made of the given tokens.
+            tokens (typing.List[tuple]): tokens read from lines holding more
+            than the chunks.
+
+        Returns:
+            bool: True if the lines of every chunk give the same tokens on
+            their own, and leave no comment open for the lines after them.
+        """
+        position = 0
+        for chunk in chunks:
+            chunk_tokens, open_comment = tokenize(
+                self.lines[chunk.first_line:chunk.last_line + 1], chunk.first_line)
+            if open_comment or \
+                    chunk_tokens != tokens[position:position + len(chunk_tokens)]:
+                return False
+            position += len(chunk_tokens)
+        return True
+
+    def patch(self, start_line: int, end_line: int, shift: int) -> int:
+        """Tokenizes the lines an edit of the given old lines touched again,
+        from the end of the chunk before it to the start of the chunk after
+        it, and compiles the members now on them and the subroutines that
+        depend on what they declare.
+
+        Args:
+            start_line (int): the first line edited.
+            end_line (int): the last line edited, before the edit.
+            shift (int): the number of lines the edit added.
+
+        Returns:
+            int: the number of chunks compiled again, None if the whole
+            class has to be split again.
+        """
+        if start_line <= self.header_line:
+            if end_line > self.header_line:
+                return None
+            return self.patch_header(shift)
+        start = bisect.bisect_left(
+            [chunk.last_line for chunk in self.chunks], start_line)
+        end = bisect.bisect_right(
+            [chunk.first_line for chunk in self.chunks], end_line)
+        first_line = self.chunks[start - 1].last_line + 1 if start > 0 \
+            else self.header_line + 1
+        with_footer = end_line >= self.footer_line
+        if with_footer:
+            last_line = len(self.lines) - 1
+        else:
+            last_line = (self.chunks[end].first_line if end < len(self.chunks)
+                         else self.footer_line) + shift - 1
+        tokens, open_comment = tokenize(
+            self.lines[first_line:last_line + 1], first_line)
+        if open_comment:
+            return None
+        if with_footer:
+            if not tokens or tokens[-1][1] != "}":
+                return None
+            footer_line = tokens.pop()[2]
+        new_chunks = make_chunks(self.class_name, tokens)
+        if not self.ordered(self.chunks[:start] + new_chunks +
+                            self.chunks[end:]) or \
+                not self.tokenized_alone(new_chunks, tokens):
+            return None
+        old_variables = self.variables()
+        old_subroutines = self.subroutines()
+        self.chunks[start:end] = new_chunks
+        self.shift(start + len(new_chunks), shift)
+        if with_footer:
+            self.footer_line = footer_line
+        return self.compile_affected(
+            range(start, start + len(new_chunks)), old_variables, old_subroutines)
+
+    def patch_header(self, shift: int) -> int:
+        """Tokenizes the class header again after an edit inside it. A header
+        that isn't "class", a name and "{" any more is compiled on its own
+        for its error messages.
+
+        Returns:
+            int: the number of chunks compiled again, None if the whole
+            class has to be split again.
+        """
+        last_line = (self.chunks[0].first_line if self.chunks
+                     else self.footer_line) + shift - 1
+        tokens, open_comment = tokenize(self.lines[:last_line + 1], 0)
+        if open_comment or any(token in class_var_dec_openers or
+                               token in subroutine_openers or token == "}"
+                               for _, token, _ in tokens):
+            return None
+        self.shift(0, shift)
+        if len(tokens) != 3 or tokens[0][1] != "class" or \
+                tokens[1][0] != IDENTIFIER or tokens[2][1] != "{":
+            self.header_line = last_line
+            self.header_errors = self.compile_header()
+            return 0
+        self.header_line = tokens[2][2]
+        self.header_errors = ""
+        if tokens[1][1] == self.class_name:
+            return 0
+        return self.rename(tokens[1][1])
+
+    def compile_header(self) -> str:
+        """
+        Returns:
+            str: the error messages of compiling the header lines as an empty
+            class.
+        """
+        tokenizer = JackTokenizer(io.StringIO("\n".join(
+            self.lines[:self.header_line + 1] + SENTINEL_LINES[:1])))
+        error_file = io.StringIO()
+        engine = CompilationEngine(tokenizer, io.StringIO(),
+                                   error_stream=error_file)
+        tokenizer.advance()
+        engine.compile_class()
+        return error_file.getvalue()
+
+    def rename(self, class_name: str) -> int:
+        """Renames the class. Chunks that name either the old or the new name,
+        or that have errors, which may name the class, are compiled again.
+        The others only have their functions, and their calls to the
+        subroutines of the class, renamed. All chunks are compiled again if
+        a class variable has the type of either name.
+
+        Returns:
+            int: the number of chunks compiled again.
+        """
+        old_name = self.class_name
+        self.class_name = class_name
+        self.update_index()
+        names = {old_name, class_name}
+        if any(variable.type in names for variable in self.variables()):
+            to_compile = range(len(self.chunks))
+        else:
+            to_compile = [index for index, chunk in enumerate(self.chunks)
+                          if chunk.errors or chunk.identifiers & names]
+        for chunk in self.chunks:
+            chunk.vm_code = renamed_calls(chunk.vm_code, old_name, class_name)
+        for index in to_compile:
+            self.compile_chunk(index)
+        return len(to_compile)
+
+    def shift(self, index: int, lines: int) -> None:
+        """Moves the chunks from the given one on, and the end of the class,
+        by the given number of lines.
+        """
+        if lines == 0:
+            return
+        for chunk in self.chunks[index:]:
+            chunk.shift(lines)
+        self.footer_line += lines
+
+    def variables(self) -> typing.List[Variable]:
+        return [variable for chunk in self.chunks for variable in chunk.variables]
+
+    def subroutines(self) -> typing.List[Signature]:
+        return [subroutine for chunk in self.chunks
+                for subroutine in chunk.subroutines]
+
+    def update_index(self) -> None:
+        self.class_index.set_entry(
+            self.key, ClassEntry(None, self.class_name, self.variables(),
+                                 self.subroutines()))
+
+    def compile_affected(self, edited: typing.Iterable[int],
+                         old_variables: typing.List[Variable],
+                         old_subroutines: typing.List[Signature]) -> int:
+        """Compiles the edited chunks, and every chunk that uses a class
+        variable or a subroutine whose declaration changed. Constructors are
+        compiled again if the number of fields changed, since they allocate
+        the object.
+
+        Returns:
+            int: the number of chunks compiled.
+        """
+        variables = self.variables()
+        subroutines = self.subroutines()
+        changed = changed_names(variable_positions(old_variables),
+                                variable_positions(variables))
+        changed |= changed_names(
+            {subroutine.name: subroutine for subroutine in old_subroutines},
+            {subroutine.name: subroutine for subroutine in subroutines})
+        fields_changed = sum(1 for variable in old_variables if variable.kind == FIELD) \
+            != sum(1 for variable in variables if variable.kind == FIELD)
+        if variables != old_variables or subroutines != old_subroutines:
+            self.update_index()
+        to_compile = set(edited)
+        if changed or fields_changed:
+            for index, chunk in enumerate(self.chunks):
+                if chunk.identifiers & changed or \
+                        (fields_changed and CONSTRUCTOR in chunk.kinds):
+                    to_compile.add(index)
+        for index in sorted(to_compile):
+            self.compile_chunk(index)
+        return len(to_compile)
+
+    def compile_chunk(self, index: int) -> None:
+        """Compiles a chunk on its own, with the class variables declared
+        before it in scope. A chunk the engine doesn't stop right at the end
+        of, because it isn't made of whole members, reports a syntax error.
+        """
+        chunk = self.chunks[index]
+        tokenizer = JackTokenizer(io.StringIO("\n".join(
+            self.lines[chunk.first_line:chunk.last_line + 1] + SENTINEL_LINES)),
+            chunk.first_line)
+        vm_file = io.StringIO()
+        error_file = io.StringIO()
+        engine = CompilationEngine(tokenizer, vm_file, self.class_index,
+                                   self.pass_manager, error_stream=error_file)
+        engine.class_name = self.class_name
+        engine.symbol_table.define_class_scope(
+            [variable for before in self.chunks[:index]
+             for variable in before.variables])
+        if tokenizer.token_type() is None:
+            tokenizer.advance()
+        engine.compile_class_body()
+        engine.vmWriter.close()
+        if tokenizer.token_index <= chunk.token_count:
+            print("synthax error: line " + str(tokenizer.line_number()) + "\n"
+                  "expected: a class variable or subroutine\n"
+                  "actual: " + tokenizer.current_token, file=error_file)
+        elif tokenizer.token_index > chunk.token_count + 1:
+            print("synthax error: line " + str(chunk.last_line) + "\n"
+                  "expected: }", file=error_file)
+        chunk.vm_code = vm_file.getvalue()
+        chunk.errors = error_file.getvalue()
+        chunk.compiled_line = chunk.first_line
+
+
+def large_class(subroutines: int) -> str:
+    """
+    Args:
+        subroutines (int): the number of methods.
+
+    Returns:
+        str: the source of a class whose methods use its fields and call
+        each other.
+    """
+    lines = ["/** A class as large as editors meet in practice. */",
+             "class Large {",
+             "    field int count, total;",
+             "    static int instances;",
+             "",
+             "    constructor Large new() {",
+             "        let count = 0;",
+             "        let total = 0;",
+             "        let instances = instances + 1;",
+             "        return this;",
+             "    }"]
+    for index in range(subroutines):
+        lines.extend([
+            "",
+            "    /** Adds " + str(index) + " to the total a few times. */",
+            "    method int step" + str(index) + "(int times) {",
+            "        var int i;",
+            "        let i = 0;",
+            "        while (i < times) {",
+            "            let total = total + " + str(index) + ";",
+            "            let i = i + 1;",
+            "        }",
+            "        let count = count + step" + str(max(index - 1, 0)) + "(0);",
+            "        return total;",
+            "    }"])
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+if "__main__" == __name__:
+    # Applies a series of edits to a large class, as an editor would, and
+    # times each of them. After every edit that leaves the class without
+    # errors the VM code is compared with compiling the whole class, and
+    # after every other edit the class must report an error. The program
+    # exits with 1 if either fails.
+    import argparse
+    import sys
+    import time
+    from PassManager import optimization_levels
+    parser = argparse.ArgumentParser(
+        prog="IncrementalCompiler",
+        usage="IncrementalCompiler [-O{0,1,2}] [--subroutines N]")
+    parser.add_argument("-O", dest="level", type=int, default=0,
+                        choices=optimization_levels)
+    parser.add_argument("--subroutines", type=int, default=300)
+    arguments = parser.parse_args()
+    pass_manager = PassManager(arguments.level)
+    source = large_class(arguments.subroutines)
+    start = time.perf_counter()
+    compiler = IncrementalCompiler(source, pass_manager=pass_manager)
+    print("%-34s %9.1f ms  %d chunks" % (
+        "first compilation", (time.perf_counter() - start) * 1000,
+        len(compiler.chunks)))
+    lines = compiler.lines
+    middle = lines.index("    method int step%d(int times) {" % (
+        arguments.subroutines // 2))
+    constant = lines[middle + 4].rindex(" ") + 1
+    statement = lines[middle + 4].index("let")
+    fields = lines[2].index(";")
+    parameters = lines[middle].index(")")
+    class_name = lines[1].index("Large")
+    # the call of the changed method, two lines lower by the time it is fixed
+    call = lines.index("        let count = count + step%d(0);" % (
+        arguments.subroutines // 2)) + 2
+    argument = lines[call - 2].index("(0") + 2
+    edits = [
+        ("change a constant", (middle + 4, constant, middle + 4, constant + 1, "7")),
+        ("add a statement", (middle + 7, 0, middle + 7, 0,
+                             "        let total = total - 1;\n")),
+        ("type a comment between methods", (middle - 2, 0, middle - 2, 0,
+                                            "    // checked\n")),
+        ("add a field", (2, fields, 2, fields, ", spare")),
+        ("add a parameter", (middle + 1, parameters, middle + 1, parameters,
+                             ", int spare")),
+        ("pass it where the method is called", (call, argument, call, argument,
+                                                ", 0")),
+        ("break a statement", (middle + 5, statement, middle + 5, statement + 3,
+                               "lett")),
+        ("fix it again", (middle + 5, statement, middle + 5, statement + 4, "let")),
+        ("open a loop", (middle + 8, 0, middle + 8, 0,
+                         "        while (i > 0) {\n")),
+        ("close it", (middle + 9, 0, middle + 9, 0,
+                      "            let i = i - 1;\n        }\n")),
+        ("delete the class name", (1, class_name, 1, class_name + 5, "")),
+        ("rename the class", (1, class_name, 1, class_name, "Larger")),
+    ]
+    failed = False
+    for description, edit in edits:
+        start = time.perf_counter()
+        compiled = compiler.edit(*edit)
+        seconds = time.perf_counter() - start
+        vm_file = io.StringIO()
+        error_file = io.StringIO()
+        class_index = ClassIndex()
+        class_index.add_source(EDITOR_KEY, compiler.text())
+        compile_file(io.StringIO(compiler.text()), vm_file, class_index,
+                     PassManager(arguments.level), error_file=error_file)
+        if error_file.getvalue():
+            same = compiler.diagnostics() != ""
+        else:
+            same = compiler.vm_code() == vm_file.getvalue() and \
+                compiler.diagnostics() == ""
+        failed = failed or not same
+        print("%-34s %9.1f ms  %s%s%s" % (
+            description, seconds * 1000,
+            "whole class compiled" if compiled == WHOLE_CLASS
+            else "%d chunks compiled" % compiled,
+            ", reports an error" if error_file.getvalue() else "",
+            "" if same else ", DIFFERS from compiling the whole class"))
+    sys.exit(1 if failed else 0)
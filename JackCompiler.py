@@ -5,29 +5,179 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import concurrent.futures
+import contextlib
+import glob
+import io
 import os
 import sys
 import typing
+from ClassIndex import ClassIndex
 from CompilationEngine import CompilationEngine
+from HackBackend import HackBackend, read_vm_files
 from JackTokenizer import JackTokenizer
+from LL1Parser import LL1Parser
+from PassManager import PassManager, optimization_levels
+from PipeFrames import frame_header, read_frames
+from SourceMap import SourceMap, MAP_SUFFIX
 from SymbolTable import SymbolTable
 from VMWriter import VMWriter
 
+## the outputs --emit can ask for, and the suffix that replaces ".jack"
+emit_suffixes = {"tokens": "T.xml", "xml": ".xml", "vm": ".vm", "map": MAP_SUFFIX}
+## the output made for the whole program rather than for each file
+ASM = "asm"
+ASM_SUFFIX = ".asm"
+## the input path that reads framed classes from the standard input
+PIPE_PATH = "-"
 
 def compile_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
-    """Compiles a single file.
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        class_index: ClassIndex = None,
+        pass_manager: PassManager = None,
+        xml_file: typing.TextIO = None,
+        tokens_file: typing.TextIO = None,
+        map_file: typing.TextIO = None,
+        error_file: typing.TextIO = None) -> None:
+    """Compiles a single file. All the outputs are written while the file is
+    parsed once. Without VM code, the parse tree and the tokens are written
+    by the table-driven LL1Parser, which only checks the syntax. Keeps no
+    state outside of its arguments, so files may be compiled on several
+    threads at once, sharing the class index and the pass manager.
 
     Args:
         input_file (typing.TextIO): the file to compile.
-        output_file (typing.TextIO): writes all output to this file.
+        output_file (typing.TextIO): writes the VM code to this file, None
+        for no VM code.
+        class_index (ClassIndex): signatures of all the classes in the
+        project, used to check calls between them.
+        pass_manager (PassManager): the optimizations to run on the output.
+        xml_file (typing.TextIO): writes the parse tree XML to this file.
+        tokens_file (typing.TextIO): writes the tokens XML to this file.
+        map_file (typing.TextIO): writes the source map of the VM code to
+        this file. Needs output_file.
+        error_file (typing.TextIO): writes the error messages to this file,
+        the standard output if None.
     """
+    if output_file is None:
+        # Nothing needs the symbol table and the code generation of the
+        # engine.
+        parser = LL1Parser.from_stream(input_file, error_file)
+        if xml_file is not None:
+            xml_file.write("".join(line + "\n" for line in parser.parse()))
+        if tokens_file is not None:
+            tokens_file.write("".join(line + "\n" for line in parser.tokens_xml()))
+        return
+    source_map = None
+    if map_file is not None:
+        source_map = SourceMap(
+            os.path.basename(getattr(input_file, "name", "")) or None)
     tokenizer = JackTokenizer(input_file)
-    engine = CompilationEngine(tokenizer, output_file)
-    # engine.write_to_file(engine.token_flag("tokens"))
+    engine = CompilationEngine(tokenizer, output_file, class_index, pass_manager,
+                               xml_file, tokens_file, source_map, error_file)
     if tokenizer.token_type() is None:
         tokenizer.advance()
     engine.compile_class()
+    if map_file is not None:
+        map_file.write(source_map.encode())
+
+
+def compile_path(input_path: str, emit: typing.List[str],
+                 class_index: ClassIndex, pass_manager: PassManager,
+                 error_file: typing.TextIO = None) -> tuple:
+    """Compiles a Jack file into the outputs next to it.
+
+    Args:
+        input_path (str): the Jack file.
+        emit (typing.List[str]): the outputs to make.
+        class_index (ClassIndex): signatures of all the classes in the
+        project.
+        pass_manager (PassManager): the optimizations to run on the output.
+        error_file (typing.TextIO): writes the error messages to this file,
+        the standard output if None.
+
+    Returns:
+        tuple: the name and VM lines of the class, if the assembly is wanted,
+        None otherwise.
+    """
+    filename, extension = os.path.splitext(input_path)
+    with open(input_path, 'r') as input_file, \
+            contextlib.ExitStack() as output_files:
+        outputs = {
+            output_kind: output_files.enter_context(
+                open(filename + emit_suffixes[output_kind], 'w'))
+            for output_kind in emit if output_kind != ASM}
+        vm_file = io.StringIO() if ASM in emit else outputs.get("vm")
+        compile_file(input_file, vm_file, class_index,
+                     pass_manager, outputs.get("xml"), outputs.get("tokens"),
+                     outputs.get("map"), error_file)
+        if ASM not in emit:
+            return None
+        if "vm" in outputs:
+            outputs["vm"].write(vm_file.getvalue())
+        return os.path.basename(filename), vm_file.getvalue().splitlines()
+
+
+def compile_stream(input_stream: typing.TextIO, output_stream: typing.TextIO,
+                   pass_manager: PassManager = None,
+                   error_file: typing.TextIO = None) -> int:
+    """Compiles the Jack classes framed in the input stream, as PipeFrames
+    reads them, and writes the VM code of each in a frame of its own as soon
+    as it is compiled. Every class is indexed when it arrives, so calls are
+    checked against the classes that came before it and itself.
+
+    Args:
+        input_stream (typing.TextIO): the framed Jack classes.
+        output_stream (typing.TextIO): the framed VM code is written here,
+        and flushed after every class.
+        pass_manager (PassManager): the optimizations to run on the output.
+        error_file (typing.TextIO): writes the error messages to this file,
+        the standard output if None.
+
+    Returns:
+        int: the number of classes compiled.
+    """
+    class_index = ClassIndex()
+    count = 0
+    for name, lines in read_frames(input_stream):
+        text = "\n".join(lines) + "\n"
+        key = name or PIPE_PATH
+        class_index.add_source(key, text)
+        class_name = class_index.file_entries[key].class_name or \
+            os.path.splitext(name or "")[0]
+        output_stream.write(frame_header(class_name + emit_suffixes["vm"]) + "\n")
+        compile_file(io.StringIO(text), output_stream, class_index, pass_manager,
+                     error_file=error_file)
+        output_stream.flush()
+        count += 1
+    return count
+
+
+def write_assembly(output_path: str, files: typing.List[tuple],
+                   library_directory: str = None) -> None:
+    """Translates the VM code of a whole program to Hack assembly.
+
+    Args:
+        output_path (str): the assembly file to write.
+        files (typing.List[tuple]): the name and VM lines of every compiled
+        class.
+        library_directory (str): VM files found here that weren't compiled,
+        such as the OS, are linked in too.
+    """
+    if library_directory is not None:
+        compiled = set(name for name, _ in files)
+        files = files + read_vm_files(
+            path for path in sorted(glob.glob(os.path.join(library_directory, "*.vm")))
+            if os.path.splitext(os.path.basename(path))[0] not in compiled)
+    backend = HackBackend()
+    assembly = backend.translate(files)
+    with open(output_path, 'w') as output_file:
+        output_file.write("\n".join(assembly) + "\n")
+    if backend.external_functions():
+        print("warning: functions not defined in the program, such as the OS "
+              "functions, loop forever: " + ", ".join(backend.external_functions()),
+              file=sys.stderr)
 
 
 if "__main__" == __name__:
@@ -36,20 +186,104 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: JackCompiler <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        prog="JackCompiler",
+        usage="JackCompiler [-O{0,1,2}] [--enable-pass NAME] "
+              "[--disable-pass NAME] [--pass-option NAME=VALUE] [--pass-report] "
+              "[--emit=tokens,xml,vm,map,asm] [--threads N] "
+              "(<input path> | --pipe | -)")
+    parser.add_argument("path", nargs="?", default=None)
+    parser.add_argument("-O", dest="level", type=int, default=0,
+                        choices=optimization_levels)
+    parser.add_argument("--enable-pass", action="append", default=[])
+    parser.add_argument("--disable-pass", action="append", default=[])
+    parser.add_argument("--pass-option", action="append", default=[])
+    parser.add_argument("--pass-report", action="store_true")
+    parser.add_argument("--emit", default="vm")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--pipe", action="store_true")
+    arguments = parser.parse_args()
+    if arguments.pipe:
+        arguments.path = PIPE_PATH
+    if arguments.path is None:
+        parser.error("an input path, --pipe or - is required")
+    emit = arguments.emit.split(",")
+    for output_kind in emit:
+        if output_kind not in emit_suffixes and output_kind != ASM:
+            sys.exit("Unknown output: " + output_kind + ", please use any of: "
+                     + ",".join(list(emit_suffixes.keys()) + [ASM]))
+    if "map" in emit and "vm" not in emit:
+        sys.exit("A source map is only made along with the VM code, please "
+                 "use --emit=vm,map")
+    pass_options = {}
+    for pass_option in arguments.pass_option:
+        name, separator, value = pass_option.partition("=")
+        if not separator:
+            sys.exit("Invalid pass option: " + pass_option + ", please use NAME=VALUE")
+        pass_options[name] = value
+    try:
+        pass_manager = PassManager(
+            arguments.level, arguments.enable_pass, arguments.disable_pass,
+            pass_options)
+    except ValueError as error:
+        sys.exit(str(error))
+    if arguments.path == PIPE_PATH:
+        # Reads classes framed by "//# Name.jack" lines from the standard
+        # input and streams their VM code, framed the same way, to the
+        # standard output. The messages go to the standard error.
+        if emit != ["vm"]:
+            sys.exit("Only VM code is written in pipe mode, please drop --emit")
+        try:
+            compile_stream(sys.stdin, sys.stdout, pass_manager, sys.stderr)
+        except BrokenPipeError:
+            # The reader stopped early, as "head" does.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
+        if arguments.pass_report:
+            print(pass_manager.report(), file=sys.stderr)
+        sys.exit(0)
+    argument_path = os.path.abspath(arguments.path)
     if os.path.isdir(argument_path):
         files_to_assemble = [
             os.path.join(argument_path, filename)
             for filename in os.listdir(argument_path)]
+        class_index = ClassIndex.for_directory(argument_path)
     else:
         files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".jack":
-            continue
-        output_path = filename + ".vm"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            compile_file(input_file, output_file)
+        class_index = ClassIndex()
+    files_to_assemble = [
+        input_path for input_path in files_to_assemble
+        if os.path.splitext(input_path)[1].lower() == ".jack"]
+    # The signatures of every class are indexed before compiling, so each
+    # file can check its calls to the others.
+    class_index.update(files_to_assemble)
+    if arguments.threads > 1:
+        # Each thread collects the messages of its file, which are printed in
+        # the order of the files.
+        def compile_in_thread(input_path: str) -> tuple:
+            errors = io.StringIO()
+            return compile_path(input_path, emit, class_index, pass_manager,
+                                errors), errors.getvalue()
+
+        results = []
+        with concurrent.futures.ThreadPoolExecutor(arguments.threads) as executor:
+            for result, errors in executor.map(compile_in_thread,
+                                                files_to_assemble):
+                sys.stdout.write(errors)
+                results.append(result)
+    else:
+        results = [compile_path(input_path, emit, class_index, pass_manager)
+                   for input_path in files_to_assemble]
+    program = [result for result in results if result is not None]
+    if ASM in emit:
+        # The assembly is a single file for the whole program, named after
+        # the directory.
+        if os.path.isdir(argument_path):
+            write_assembly(os.path.join(
+                argument_path, os.path.basename(argument_path) + ASM_SUFFIX),
+                program, argument_path)
+        else:
+            write_assembly(os.path.splitext(argument_path)[0] + ASM_SUFFIX,
+                           program)
+    if arguments.pass_report:
+        print(pass_manager.report(), file=sys.stderr)
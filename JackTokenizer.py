@@ -24,6 +24,8 @@ keyword_list = ["class", "constructor", "function", "method", "field", "static",
 symbol_list =["{","}","(",")","[","]",".",",",";",
               "+","-","*","/","&","|","<",">","=","~"]
 
+## the comment markers a line is cut at. Every tokenizer works on its own
+## copy, which tracks whether it is inside a /* comment
 line_breakers = ["//","/*","*/"]
 
 
@@ -108,13 +110,17 @@ class JackTokenizer:
     - keywordConstant: 'true' | 'false' | 'null' | 'this'
     """
 
-    def __init__(self, input_stream: typing.TextIO) -> None:
+    def __init__(self, input_stream: typing.TextIO, first_line: int = 0) -> None:
         """Opens the input stream and gets ready to tokenize it.
 
         Args:
             input_stream (typing.TextIO): input stream.
+            first_line (int): the line of the whole file the stream starts
+            at, when it holds only a part of it.
         """
+        self.first_line = first_line
         self.last_token = None
+        self.line_breakers = list(line_breakers)
         self.input_lines = input_stream.read().splitlines()
         self.number_of_lines = len(self.input_lines)
         self.current_line_number = 0
@@ -122,18 +128,19 @@ class JackTokenizer:
         self.current_token_type = None
         self.current_line = self.handle_line_reading(self.input_lines[0])
         self.is_comment = False
+        self.token_index = 0
 
 
 
 
     def handle_line_reading(self, origionael_line:str):
         line = origionael_line.strip()
-        for breaker in line_breakers:
+        for breaker in self.line_breakers:
             if breaker in line:
                 if breaker =="/*":
-                    line_breakers.append("*")
-                if "*/" in line and "*" in line_breakers:
-                    line_breakers.remove("*")
+                    self.line_breakers.append("*")
+                if "*/" in line and "*" in self.line_breakers:
+                    self.line_breakers.remove("*")
                     line = ""
                     break
                 spliting = line.split(breaker)
@@ -162,12 +169,27 @@ class JackTokenizer:
             return not self.is_this_end_of_line()
         return True
 
+    def is_identifier_char(self, index: int) -> bool:
+        """
+        Args:
+            index (int): a position in the current line.
+
+        Returns:
+            bool: True if the character at the given position may continue an
+            identifier, so a keyword such as "do" is not split out of "double".
+        """
+        if index >= len(self.current_line):
+            return False
+        character = self.current_line[index]
+        return character.isalnum() or character == "_"
+
     def recognize_next_token(self) -> int:
         token_end = 0
         if len (self.current_line) == 0:
             return 0
         for keyword in keyword_list:
-            if self.current_line.startswith(keyword):
+            if self.current_line.startswith(keyword) and not \
+                    self.is_identifier_char(len(keyword)):
                 self.current_token = keyword
                 self.current_token_type = KEYWORD
                 token_end = len (keyword)
@@ -182,11 +204,11 @@ class JackTokenizer:
 
         if self.current_line[0].isnumeric():
             index = 1
-            while index < len(self.current_line) and self.current_line[0:index].isnumeric():
+            while index < len(self.current_line) and self.current_line[index].isnumeric():
                 index += 1
-            self.current_token= self.current_line[0:index-1]
+            self.current_token= self.current_line[0:index]
             self.current_token_type = INTCONST
-            token_end = index-1
+            token_end = index
             return token_end
 
         elif self.current_line[0] == "\"":
@@ -227,12 +249,39 @@ class JackTokenizer:
 
         self.last_token = self.current_token
         token_end = self.recognize_next_token()
+        self.token_index += 1
         if token_end < len (self.current_line):
             self.current_line = self.current_line[token_end:]
         else:
             self.current_line= ""
 
 
+    def line_number(self) -> int:
+        """
+        Returns:
+            int: the line of the current token in the whole file, counted
+            from 0.
+        """
+        return self.first_line + self.current_line_number
+
+    def tokens(self) -> typing.Iterator[typing.Tuple[str, str]]:
+        """Iterates over the remaining tokens of the input, starting with the
+        current token (the first one is read if there is no current token).
+
+        Returns:
+            typing.Iterator[typing.Tuple[str, str]]: (token type, token) pairs.
+        """
+        if self.current_token_type is None:
+            self.advance()
+        while self.current_token_type is not None:
+            yield self.current_token_type, self.current_token
+            if not self.has_more_tokens():
+                return
+            last_index = self.token_index
+            self.advance()
+            if self.token_index == last_index:
+                return
+
     def token_type(self) -> str:
         """
         Returns:
@@ -0,0 +1,208 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import collections
+import typing
+from ControlFlowGraph import ControlFlowGraph, BasicBlock, split_functions, \
+    join_functions, command_of, argument_of, jump_commands, LABEL, GOTO, IF_GOTO
+
+## the passes over a function stop once a round changes nothing, or after
+## this many rounds
+MAX_ROUNDS = 20
+
+## commands whose result is -1 or 0, so "not" exactly inverts it
+boolean_commands = ["eq", "gt", "lt"]
+
+PUSH_CONSTANT = "push constant "
+
+## what every change is called in the notes
+change_names = [
+    ("threaded", "jumps threaded"),
+    ("folded", "constant branches folded"),
+    ("inverted", "branches inverted"),
+    ("jumps", "jumps to the next block removed"),
+    ("unreachable", "unreachable blocks removed"),
+    ("moved", "blocks moved to their only predecessor"),
+    ("labels", "labels removed"),
+    ("merged", "blocks merged"),
+]
+
+
+def final_target(label: str, label_blocks: typing.Dict[str, BasicBlock]) -> str:
+    """
+    Returns:
+        str: the label a jump to the given label ends up at, following
+        blocks that hold nothing but a goto.
+    """
+    seen = set()
+    while label not in seen:
+        seen.add(label)
+        block = label_blocks.get(label)
+        if block is None:
+            return label
+        commands = [command for command in block.commands
+                    if command_of(command) != LABEL]
+        if len(commands) != 1 or command_of(commands[0]) != GOTO:
+            return label
+        label = argument_of(commands[0])
+    return label
+
+
+def thread_jumps(graph: ControlFlowGraph, counts: collections.Counter) -> None:
+    """Points every jump to a goto straight at the goto's target."""
+    label_blocks = graph.label_blocks()
+    for block in graph.blocks:
+        last = block.last_command()
+        if command_of(last) in jump_commands:
+            target = final_target(argument_of(last), label_blocks)
+            if target != argument_of(last):
+                block.commands[-1] = command_of(last) + " " + target
+                counts["threaded"] += 1
+
+
+def fold_constant_branches(graph: ControlFlowGraph,
+                           counts: collections.Counter) -> None:
+    """Turns an if-goto on a constant into a goto, or removes it."""
+    for block in graph.blocks:
+        if len(block.commands) < 2 or command_of(block.last_command()) != IF_GOTO or \
+                not block.commands[-2].startswith(PUSH_CONSTANT):
+            continue
+        label = argument_of(block.last_command())
+        if int(block.commands[-2][len(PUSH_CONSTANT):]) != 0:
+            block.commands[-2:] = [GOTO + " " + label]
+        else:
+            del block.commands[-2:]
+        counts["folded"] += 1
+    graph.link()
+
+
+def invert_branches(graph: ControlFlowGraph, counts: collections.Counter) -> None:
+    """Turns "not; if-goto A; goto B; label A", which compile_if makes for an
+    empty then branch, into "if-goto B; label A", when the condition is a
+    comparison.
+    """
+    blocks = graph.blocks
+    position = 0
+    while position + 2 < len(blocks):
+        block, following, target = blocks[position:position + 3]
+        commands = block.commands
+        if len(commands) >= 3 and command_of(commands[-1]) == IF_GOTO and \
+                commands[-2] == "not" and commands[-3] in boolean_commands and \
+                not following.labels() and len(following.commands) == 1 and \
+                command_of(following.commands[0]) == GOTO and \
+                argument_of(commands[-1]) in target.labels():
+            commands[-2:] = [IF_GOTO + " " + argument_of(following.commands[0])]
+            del blocks[position + 1]
+            counts["inverted"] += 1
+        position += 1
+    graph.link()
+
+
+def remove_jumps_to_next(graph: ControlFlowGraph,
+                         counts: collections.Counter) -> None:
+    for position, block in enumerate(graph.blocks[:-1]):
+        last = block.last_command()
+        if command_of(last) == GOTO and \
+                argument_of(last) in graph.blocks[position + 1].labels():
+            block.commands.pop()
+            counts["jumps"] += 1
+    graph.link()
+
+
+def remove_unreachable(graph: ControlFlowGraph, counts: collections.Counter) -> None:
+    reachable = graph.reachable_blocks()
+    counts["unreachable"] += len(graph.blocks) - len(reachable)
+    graph.blocks = reachable
+    graph.link()
+
+
+def move_single_entry_blocks(graph: ControlFlowGraph,
+                             counts: collections.Counter) -> None:
+    """Moves a block that only a goto enters, and that doesn't run into the
+    block after it, in place of the goto.
+    """
+    moved = True
+    while moved:
+        moved = False
+        label_blocks = graph.label_blocks()
+        for block in graph.blocks:
+            last = block.last_command()
+            if command_of(last) != GOTO:
+                continue
+            target = label_blocks.get(argument_of(last))
+            if target is None or target is block or target.index == 0 or \
+                    target.falls_through() or target.predecessors != [block]:
+                continue
+            block.commands[-1:] = target.commands
+            graph.blocks.remove(target)
+            graph.link()
+            counts["moved"] += 1
+            moved = True
+            break
+
+
+def compact_labels(graph: ControlFlowGraph, counts: collections.Counter) -> None:
+    """Keeps a single label per block, and only if some jump targets it."""
+    renamed = {}
+    for block in graph.blocks:
+        labels = block.labels()
+        for label in labels[1:]:
+            renamed[label] = labels[0]
+    for block in graph.blocks:
+        last = block.last_command()
+        if command_of(last) in jump_commands and argument_of(last) in renamed:
+            block.commands[-1] = command_of(last) + " " + renamed[argument_of(last)]
+    referenced = graph.referenced_labels()
+    for block in graph.blocks:
+        labels = block.labels()
+        kept = [LABEL + " " + label for label in labels if label in referenced]
+        counts["labels"] += len(labels) - len(kept)
+        block.commands[:len(labels)] = kept
+    graph.link()
+    counts["merged"] += graph.merge_straight_line()
+
+
+def thread_function(function: typing.List[str], notes: list) -> typing.List[str]:
+    graph = ControlFlowGraph(function)
+    counts = collections.Counter()
+    for _ in range(MAX_ROUNDS):
+        before = sum(counts.values())
+        thread_jumps(graph, counts)
+        fold_constant_branches(graph, counts)
+        invert_branches(graph, counts)
+        remove_jumps_to_next(graph, counts)
+        remove_unreachable(graph, counts)
+        move_single_entry_blocks(graph, counts)
+        compact_labels(graph, counts)
+        if sum(counts.values()) == before:
+            break
+    if not any(counts.values()):
+        return function
+    notes.append(function[0].split(" ")[1] + ": " + ", ".join(
+        str(counts[key]) + " " + name for key, name in change_names if counts[key]))
+    return graph.lines()
+
+
+def thread_jumps_and_merge_blocks(lines: typing.List[str], notes: list,
+                                  options: dict) -> typing.List[str]:
+    """Simplifies the jumps of every function over its control flow graph:
+    jumps to gotos go straight to their targets, if-gotos on constants are
+    folded, gotos to the next block and blocks that can't be reached are
+    removed, and labels no jump targets are dropped so the blocks around
+    them merge.
+
+    Args:
+        lines (typing.List[str]): the VM commands of a class.
+        notes (list): a line is added here for every function that changed.
+        options (dict): unused.
+
+    Returns:
+        typing.List[str]: the optimized commands.
+    """
+    prefix, functions = split_functions(lines)
+    return join_functions(
+        prefix, [thread_function(function, notes) for function in functions])
@@ -0,0 +1,421 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import io
+import os
+import sys
+import time
+import typing
+from xml.sax.saxutils import escape
+from JackTokenizer import JackTokenizer, keyword_list, symbol_list, \
+    KEYWORD, SYMBOL, IDENTIFIER, INTCONST, STRINGCONST
+
+## escaped in the XML along with "&", "<" and ">", as CompilationEngine does
+quote_entities = {"\"": "&quot;"}
+
+## The Jack grammar of the JackTokenizer docstring, with the repetitions and
+## options written out as right-recursive rules and the identifier prefix of
+## term and subroutineCall factored out, which makes it LL(1). Only the
+## nonterminals in tagged_nonterminals appear in the XML parse tree, under the
+## tag they are mapped to.
+grammar = {
+    "classDec": [["class", IDENTIFIER, "{", "classVarDecs", "subroutineDecs", "}"]],
+    "classVarDecs": [["classVarDec", "classVarDecs"], []],
+    "classVarDec": [["classVarKind", "type", IDENTIFIER, "varNameList", ";"]],
+    "classVarKind": [["static"], ["field"]],
+    "type": [["int"], ["char"], ["boolean"], [IDENTIFIER]],
+    "varNameList": [[",", IDENTIFIER, "varNameList"], []],
+    "subroutineDecs": [["subroutineDec", "subroutineDecs"], []],
+    "subroutineDec": [["subroutineKind", "returnType", IDENTIFIER, "(",
+                       "parameterList", ")", "subroutineBody"]],
+    "subroutineKind": [["constructor"], ["function"], ["method"]],
+    "returnType": [["void"], ["type"]],
+    "parameterList": [["type", IDENTIFIER, "parameterTail"], []],
+    "parameterTail": [[",", "type", IDENTIFIER, "parameterTail"], []],
+    "subroutineBody": [["{", "varDecs", "statements", "}"]],
+    "varDecs": [["varDec", "varDecs"], []],
+    "varDec": [["var", "type", IDENTIFIER, "varNameList", ";"]],
+    "statements": [["statementSeq"]],
+    "statementSeq": [["statement", "statementSeq"], []],
+    "statement": [["letStatement"], ["ifStatement"], ["whileStatement"],
+                  ["doStatement"], ["returnStatement"]],
+    "letStatement": [["let", IDENTIFIER, "arrayIndex", "=", "expression", ";"]],
+    "arrayIndex": [["[", "expression", "]"], []],
+    "ifStatement": [["if", "(", "expression", ")", "{", "statements", "}",
+                     "elseClause"]],
+    "elseClause": [["else", "{", "statements", "}"], []],
+    "whileStatement": [["while", "(", "expression", ")", "{", "statements", "}"]],
+    "doStatement": [["do", IDENTIFIER, "callTail", ";"]],
+    "callTail": [["(", "expressionList", ")"],
+                 [".", IDENTIFIER, "(", "expressionList", ")"]],
+    "returnStatement": [["return", "returnValue", ";"]],
+    "returnValue": [["expression"], []],
+    "expression": [["term", "opTerms"]],
+    "opTerms": [["op", "term", "opTerms"], []],
+    "op": [["+"], ["-"], ["*"], ["/"], ["&"], ["|"], ["<"], [">"], ["="]],
+    "term": [[INTCONST], [STRINGCONST], ["keywordConstant"],
+             [IDENTIFIER, "termTail"], ["(", "expression", ")"],
+             ["unaryOp", "term"]],
+    "termTail": [["[", "expression", "]"], ["callTail"], []],
+    "keywordConstant": [["true"], ["false"], ["null"], ["this"]],
+    "unaryOp": [["-"], ["~"]],
+    "expressionList": [["expression", "expressionTail"], []],
+    "expressionTail": [[",", "expression", "expressionTail"], []],
+}
+
+tagged_nonterminals = {"classDec": "class"}
+tagged_nonterminals.update((name, name) for name in [
+    "classVarDec", "subroutineDec", "parameterList", "subroutineBody",
+    "varDec", "statements", "letStatement", "ifStatement", "whileStatement",
+    "doStatement", "returnStatement", "expression", "term", "expressionList"])
+
+START = "classDec"
+END_OF_INPUT = "$"
+
+## integer codes: one per keyword and symbol, one per token class, then one
+## per nonterminal
+terminals = keyword_list + symbol_list + [IDENTIFIER, INTCONST, STRINGCONST,
+                                          END_OF_INPUT]
+terminal_codes = {terminal: code for code, terminal in enumerate(terminals)}
+nonterminals = list(grammar.keys())
+nonterminal_codes = {name: len(terminals) + code
+                     for code, name in enumerate(nonterminals)}
+token_class_codes = {IDENTIFIER: terminal_codes[IDENTIFIER],
+                     INTCONST: terminal_codes[INTCONST],
+                     STRINGCONST: terminal_codes[STRINGCONST]}
+
+
+def token_code(token_type: str, token: str) -> int:
+    """
+    Args:
+        token_type (str): the type of the token, as given by JackTokenizer.
+        token (str): the token.
+
+    Returns:
+        int: the terminal code the parse tables are indexed by.
+    """
+    if token_type == KEYWORD or token_type == SYMBOL:
+        return terminal_codes[token]
+    return token_class_codes[token_type]
+
+
+def first_of_sequence(sequence: typing.List[str], first: dict) -> set:
+    """
+    Returns:
+        set: the terminals that can start the sequence, with "" if it can be
+        empty.
+    """
+    result = set()
+    for symbol in sequence:
+        if symbol not in grammar:
+            result.add(symbol)
+            return result
+        result |= first[symbol] - {""}
+        if "" not in first[symbol]:
+            return result
+    result.add("")
+    return result
+
+
+def compute_first() -> typing.Dict[str, set]:
+    """
+    Returns:
+        typing.Dict[str, set]: the FIRST set of every nonterminal.
+    """
+    first = {name: set() for name in grammar}
+    changed = True
+    while changed:
+        changed = False
+        for name, productions in grammar.items():
+            for production in productions:
+                addition = first_of_sequence(production, first)
+                if not addition <= first[name]:
+                    first[name] |= addition
+                    changed = True
+    return first
+
+
+def compute_follow(first: dict) -> typing.Dict[str, set]:
+    """
+    Returns:
+        typing.Dict[str, set]: the FOLLOW set of every nonterminal.
+    """
+    follow = {name: set() for name in grammar}
+    follow[START].add(END_OF_INPUT)
+    changed = True
+    while changed:
+        changed = False
+        for name, productions in grammar.items():
+            for production in productions:
+                for position, symbol in enumerate(production):
+                    if symbol not in grammar:
+                        continue
+                    rest = first_of_sequence(production[position + 1:], first)
+                    addition = rest - {""}
+                    if "" in rest:
+                        addition |= follow[name]
+                    if not addition <= follow[symbol]:
+                        follow[symbol] |= addition
+                        changed = True
+    return follow
+
+
+def encode_production(name: str, production: typing.List[str]) -> tuple:
+    """
+    Returns:
+        tuple: the codes to push on the parse stack for the production, in
+        reverse so the first symbol ends up on top. A tagged nonterminal ends
+        with the closing tag of its XML element.
+    """
+    codes = [terminal_codes[symbol] if symbol not in grammar
+             else nonterminal_codes[symbol] for symbol in production]
+    if name in tagged_nonterminals:
+        codes.append("</" + tagged_nonterminals[name] + ">")
+    return tuple(reversed(codes))
+
+
+def build_table() -> typing.List[typing.List[tuple]]:
+    """Derives the LL(1) dispatch table from the FIRST and FOLLOW sets.
+
+    Returns:
+        typing.List[typing.List[tuple]]: for every nonterminal (by its code
+        minus the number of terminals) and terminal code, the encoded
+        production to expand, or None where the token is a syntax error.
+    """
+    first = compute_first()
+    follow = compute_follow(first)
+    table = [[None] * len(terminals) for _ in nonterminals]
+    for name, productions in grammar.items():
+        row = table[nonterminal_codes[name] - len(terminals)]
+        for production in productions:
+            lookahead = first_of_sequence(production, first)
+            if "" in lookahead:
+                lookahead = (lookahead - {""}) | follow[name]
+            encoded = encode_production(name, production)
+            for terminal in lookahead:
+                code = terminal_codes[terminal]
+                if row[code] is not None and row[code] != encoded:
+                    raise ValueError("grammar is not LL(1) at " + name +
+                                     ", " + terminal)
+                row[code] = encoded
+    return table
+
+
+parse_table = build_table()
+open_tags = ["<" + tagged_nonterminals[name] + ">"
+             if name in tagged_nonterminals else None for name in nonterminals]
+
+
+class LL1Parser:
+    """A table-driven parser for Jack classes. Instead of testing the current
+    token against lists of openers, it looks up the production to expand in
+    parse_table, indexed by the nonterminal and the integer code of the
+    token, and emits the same XML parse tree as CompilationEngine.
+    """
+
+    def __init__(self, tokens: typing.Sequence[tuple],
+                 error_stream: typing.TextIO = None) -> None:
+        """
+        Args:
+            tokens (typing.Sequence[tuple]): (token type, token, line) of the
+            class.
+            error_stream (typing.TextIO): receives the error messages, the
+            standard output if None.
+        """
+        self.tokens = tokens
+        self.error_stream = error_stream
+
+    @staticmethod
+    def from_stream(input_stream: typing.TextIO,
+                    error_stream: typing.TextIO = None) -> "LL1Parser":
+        """
+        Args:
+            input_stream (typing.TextIO): the Jack source of a class.
+            error_stream (typing.TextIO): receives the error messages, the
+            standard output if None.
+
+        Returns:
+            LL1Parser: a parser for the tokens of the class.
+        """
+        tokenizer = JackTokenizer(input_stream)
+        return LL1Parser([(token_type, token, tokenizer.current_line_number)
+                          for token_type, token in tokenizer.tokens()],
+                         error_stream)
+
+    def tokens_xml(self) -> typing.List[str]:
+        """
+        Returns:
+            typing.List[str]: the lines of the tokens XML of the class, as
+            CompilationEngine writes them.
+        """
+        return ["<tokens>"] + [
+            "<" + token_type + "> " + escape(token, quote_entities) +
+            " </" + token_type + ">" for token_type, token, _ in self.tokens] + \
+            ["</tokens>"]
+
+    def parse(self) -> typing.List[str]:
+        """Parses the class.
+
+        Returns:
+            typing.List[str]: the lines of the XML parse tree. Parsing stops
+            at the first syntax error, which is reported like
+            CompilationEngine reports it.
+        """
+        tokens = self.tokens
+        n_tokens = len(tokens)
+        codes = [token_code(token[0], token[1]) for token in tokens]
+        codes.append(terminal_codes[END_OF_INPUT])
+        n_terminals = len(terminals)
+        table = parse_table
+        tags = open_tags
+        output = []
+        write = output.append
+        stack = [nonterminal_codes[START]]
+        position = 0
+        while stack:
+            top = stack.pop()
+            if type(top) is str:
+                write(top)
+                continue
+            code = codes[position]
+            if top < n_terminals:
+                if top != code:
+                    self.syntax_error(position, terminals[top])
+                    break
+                token_type, token = tokens[position][0], tokens[position][1]
+                token = escape(token, quote_entities)
+                write("<" + token_type + "> " + token + " </" + token_type + ">")
+                position += 1
+                continue
+            production = table[top - n_terminals][code]
+            if production is None:
+                self.syntax_error(position, nonterminals[top - n_terminals])
+                break
+            tag = tags[top - n_terminals]
+            if tag is not None:
+                write(tag)
+            stack.extend(production)
+        if position < n_tokens and not stack:
+            self.syntax_error(position, END_OF_INPUT)
+        return output
+
+    def syntax_error(self, position: int, expected: str) -> None:
+        if position < len(self.tokens):
+            line, actual = self.tokens[position][2], self.tokens[position][0]
+        else:
+            line, actual = self.tokens[-1][2] if self.tokens else 0, END_OF_INPUT
+        print("synthax error: line " + str(line) + "\n"
+              "expected:" + expected + "\n"
+              "actual: " + actual, file=self.error_stream)
+
+
+def engine_parse(path: str) -> typing.List[str]:
+    """Parses a file with CompilationEngine, collecting the XML it writes.
+
+    Returns:
+        typing.List[str]: the lines of the XML parse tree.
+    """
+    from CompilationEngine import CompilationEngine
+    xml_stream = io.StringIO()
+    with open(path, "r") as input_file:
+        tokenizer = JackTokenizer(input_file)
+        engine = CompilationEngine(tokenizer, None, xml_stream=xml_stream)
+        tokenizer.advance()
+        engine.compile_class()
+    return [line for line in xml_stream.getvalue().split("\n") if line]
+
+
+def ll1_parse(path: str) -> typing.List[str]:
+    """
+    Returns:
+        typing.List[str]: the lines of the XML parse tree of the file.
+    """
+    with open(path, "r") as input_file:
+        return LL1Parser.from_stream(input_file).parse()
+
+
+def benchmark(paths: typing.List[str], repeat: int = 5) -> None:
+    """Checks that both parsers produce the same parse tree for every file
+    and prints the best time of each over the whole corpus. Without VM
+    output the engine generates no code, but it still defines every variable
+    in its symbol table and looks up every use of one, which the table-driven
+    parser doesn't do. That part is timed on its own too, so the parsing
+    itself can be compared.
+
+    Args:
+        paths (typing.List[str]): the Jack files of the corpus.
+        repeat (int): how many times the corpus is parsed.
+    """
+    for path in paths:
+        if engine_parse(path) != ll1_parse(path):
+            print("parse trees differ: " + path)
+    token_lists = []
+    for path in paths:
+        with open(path, "r") as input_file:
+            token_lists.append(LL1Parser.from_stream(input_file).tokens)
+    engine_best = min(timed_engine(paths) for _ in range(repeat))
+    print("%-30s %10.2f ms" % ("CompilationEngine", engine_best[0] * 1000))
+    print("%-30s %10.2f ms" % ("  of which the symbol table", engine_best[1] * 1000))
+    print("%-30s %10.2f ms" % ("  parsing alone", (engine_best[0] - engine_best[1]) * 1000))
+    best = min(timed(ll1_parse, paths) for _ in range(repeat))
+    print("%-30s %10.2f ms" % ("LL1Parser", best * 1000))
+    best = min(timed(lambda tokens: LL1Parser(tokens).parse(), token_lists)
+               for _ in range(repeat))
+    print("%-30s %10.2f ms" % ("LL1Parser (pre-tokenized)", best * 1000))
+
+
+def timed_engine(paths: typing.List[str]) -> tuple:
+    """Parses the files with CompilationEngine, timing the calls it makes to
+    its symbol table apart.
+
+    Returns:
+        tuple: the seconds taken in all, and in the symbol table.
+    """
+    from SymbolTable import SymbolTable
+    spent = [0.0]
+    originals = {}
+
+    def timed_method(method: typing.Callable) -> typing.Callable:
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                spent[0] += time.perf_counter() - start
+        return call
+
+    for name in ("start_subroutine", "define", "kind_of", "type_of", "index_of"):
+        originals[name] = getattr(SymbolTable, name)
+        setattr(SymbolTable, name, timed_method(originals[name]))
+    try:
+        seconds = timed(engine_parse, paths)
+    finally:
+        for name, method in originals.items():
+            setattr(SymbolTable, name, method)
+    return seconds, spent[0]
+
+
+def timed(parse: typing.Callable, inputs: typing.List) -> float:
+    start = time.perf_counter()
+    for item in inputs:
+        parse(item)
+    return time.perf_counter() - start
+
+
+if "__main__" == __name__:
+    # Benchmarks both parsers over the Jack files under the given paths.
+    if len(sys.argv) < 2:
+        sys.exit("Invalid usage, please use: LL1Parser.py <input path> ...")
+    corpus = []
+    for argument in sys.argv[1:]:
+        if os.path.isdir(argument):
+            corpus.extend(os.path.join(argument, filename)
+                          for filename in sorted(os.listdir(argument))
+                          if filename.endswith(".jack"))
+        else:
+            corpus.append(argument)
+    benchmark(corpus)
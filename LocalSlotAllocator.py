@@ -0,0 +1,134 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from ControlFlowGraph import ControlFlowGraph, split_functions, join_functions
+
+PUSH_LOCAL = "push local "
+POP_LOCAL = "pop local "
+
+
+def local_index(line: str) -> typing.Tuple[bool, int]:
+    """
+    Returns:
+        typing.Tuple[bool, int]: whether the line writes a local variable and
+        the variable's index (the SymbolTable index of a "var"), or None if
+        the line doesn't touch local variables.
+    """
+    if line.startswith(PUSH_LOCAL):
+        return False, int(line[len(PUSH_LOCAL):])
+    if line.startswith(POP_LOCAL):
+        return True, int(line[len(POP_LOCAL):])
+    return None
+
+
+def live_before_block(block, live: set) -> set:
+    """The liveness transfer function of a block."""
+    live = set(live)
+    for line in reversed(block.commands):
+        access = local_index(line)
+        if access is None:
+            continue
+        is_write, index = access
+        if is_write:
+            live.discard(index)
+        else:
+            live.add(index)
+    return live
+
+
+def interference(graph: ControlFlowGraph, n_locals: int) -> typing.List[set]:
+    """
+    Returns:
+        typing.List[set]: for every local, the locals whose values are live
+        at the same time, so the two can't share a slot.
+    """
+    block_in, block_out = graph.backward_dataflow(live_before_block)
+    conflicts = [set() for _ in range(n_locals)]
+    for block in graph.blocks:
+        live = set(block_out[block.index])
+        for line in reversed(block.commands):
+            access = local_index(line)
+            if access is None:
+                continue
+            is_write, index = access
+            if is_write:
+                for other in live:
+                    if other != index:
+                        conflicts[index].add(other)
+                        conflicts[other].add(index)
+                live.discard(index)
+            else:
+                live.add(index)
+    ## the VM sets every local to 0 on entry, which the locals read before
+    ## being written rely on
+    if graph.blocks:
+        entry = block_in[graph.blocks[0].index]
+        for index in entry:
+            conflicts[index] |= entry - {index}
+    return conflicts
+
+
+def allocate_slots(function: typing.List[str], notes: list) -> typing.List[str]:
+    """
+    Args:
+        function (typing.List[str]): the lines of a function.
+        notes (list): a line is added here if the frame got smaller.
+
+    Returns:
+        typing.List[str]: the function, with its locals packed into as few
+        slots as their lifetimes allow.
+    """
+    name, n_locals = function[0].split(" ")[1:3]
+    n_locals = int(n_locals)
+    if n_locals == 0:
+        return function
+    graph = ControlFlowGraph(function)
+    conflicts = interference(graph, n_locals)
+    used = set()
+    for line in function:
+        access = local_index(line)
+        if access is not None:
+            used.add(access[1])
+    slots = {}
+    for index in sorted(used):
+        taken = set(slots[other] for other in conflicts[index] if other in slots)
+        slot = 0
+        while slot in taken:
+            slot += 1
+        slots[index] = slot
+    n_slots = max(slots.values()) + 1 if slots else 0
+    if n_slots >= n_locals:
+        return function
+    notes.append(name + ": " + str(n_locals) + " -> " + str(n_slots) +
+                 " local slots")
+    packed = ["function " + name + " " + str(n_slots)]
+    for line in function[1:]:
+        access = local_index(line)
+        if access is not None:
+            prefix = POP_LOCAL if access[0] else PUSH_LOCAL
+            line = prefix + str(slots[access[1]])
+        packed.append(line)
+    return packed
+
+
+def reuse_local_slots(lines: typing.List[str], notes: list,
+                      options: dict) -> typing.List[str]:
+    """Shares local slots between variables whose lifetimes don't overlap,
+    so calls push fewer zeros for the frame.
+
+    Args:
+        lines (typing.List[str]): the VM commands of a class.
+        notes (list): a line is added here for every smaller frame.
+        options (dict): unused.
+
+    Returns:
+        typing.List[str]: the commands, with smaller frames.
+    """
+    prefix, functions = split_functions(lines)
+    return join_functions(
+        prefix, [allocate_slots(function, notes) for function in functions])
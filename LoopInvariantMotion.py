@@ -0,0 +1,144 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from ControlFlowGraph import split_functions, join_functions, command_of, \
+    argument_of, jump_commands, LABEL, GOTO, RETURN
+from VMExpressions import parse_operations, expression_start, \
+    expression_reads, written_locations, frame_size, with_frame_size
+
+## hoisting more than this many loops out of one function is a sign that the
+## function keeps changing, not converging
+MAX_HOISTED_LOOPS = 100
+
+
+def find_loops(function: typing.List[str]) -> typing.List[typing.Tuple[int, int]]:
+    """Finds the loops compile_while makes: a label, and a later goto back to
+    it, with no jumps into the loop from outside except to that label.
+
+    Returns:
+        typing.List[typing.Tuple[int, int]]: the positions of the label and
+        of the goto of every loop, innermost loops first.
+    """
+    label_positions = {}
+    for position, line in enumerate(function):
+        if command_of(line) == LABEL:
+            label_positions[argument_of(line)] = position
+    loops = []
+    for position, line in enumerate(function):
+        if command_of(line) != GOTO:
+            continue
+        head = label_positions.get(argument_of(line))
+        if head is None or head >= position:
+            continue
+        if command_of(function[head - 1]) in [GOTO, RETURN]:
+            continue
+        inner_labels = set(argument_of(function[inner])
+                           for inner in range(head + 1, position + 1)
+                           if command_of(function[inner]) == LABEL)
+        entered_from_outside = any(
+            command_of(other) in jump_commands and
+            (argument_of(other) in inner_labels or
+             argument_of(other) == argument_of(line))
+            for other in function[:head] + function[position + 1:])
+        if not entered_from_outside:
+            loops.append((head, position))
+    loops.sort(key=lambda loop: loop[1] - loop[0])
+    return loops
+
+
+def header_end(function: typing.List[str], head: int, end: int) -> int:
+    """
+    Returns:
+        int: the position of the first jump in the loop. The commands before
+        it run on every iteration, and at least once.
+    """
+    for position in range(head + 1, end):
+        if command_of(function[position]) in jump_commands:
+            return position
+    return end
+
+
+def hoist_loop(function: typing.List[str], head: int, end: int,
+               notes: list) -> typing.List[str]:
+    """Moves the invariant expressions of a single loop in front of it.
+
+    Returns:
+        typing.List[str]: the new function, or None if nothing was moved.
+    """
+    body = function[head + 1:end]
+    written = written_locations(body)
+    operations = parse_operations(body)
+    always_runs = header_end(function, head, end) - head - 1
+    hoisted = []
+    root = len(operations) - 1
+    while root >= 0:
+        start = expression_start(operations, root)
+        if start is None or start == root:
+            root -= 1
+            continue
+        trees = operations[start:root + 1]
+        invariant = not (expression_reads(operations, start, root) & written)
+        safe = all(not operation.may_fail or operation.end <= always_runs
+                   for operation in trees if operation is not None)
+        if invariant and safe:
+            hoisted.append((operations[start].start, operations[root].end))
+            root = start - 1
+        else:
+            root -= 1
+    if not hoisted:
+        return None
+    n_locals = frame_size(function)
+    slots = {}
+    preheader = []
+    new_body = list(body)
+    for first, last in hoisted:
+        expression = tuple(body[first:last])
+        if expression not in slots:
+            slots[expression] = n_locals + len(slots)
+            preheader.extend(expression)
+            preheader.append("pop local " + str(slots[expression]))
+        new_body[first:last] = ["push local " + str(slots[expression])]
+    name = function[0].split(" ")[1]
+    notes.append(name + ": hoisted " + str(len(hoisted)) + " expressions out of " +
+                 argument_of(function[head]))
+    return with_frame_size(
+        function[:head] + preheader + [function[head]] + new_body +
+        function[end:], n_locals + len(slots))
+
+
+def hoist_function(function: typing.List[str], notes: list) -> typing.List[str]:
+    for _ in range(MAX_HOISTED_LOOPS):
+        for head, end in find_loops(function):
+            hoisted = hoist_loop(function, head, end, notes)
+            if hoisted is not None:
+                function = hoisted
+                break
+        else:
+            break
+    return function
+
+
+def hoist_invariants(lines: typing.List[str], notes: list,
+                     options: dict) -> typing.List[str]:
+    """Moves side-effect-free expressions whose operands don't change in a
+    while loop in front of the loop, keeping their values in new locals.
+    Reads of fields, statics and arrays are only moved out of loops that
+    make no calls and write no memory, and divisions only out of the loop
+    condition, which runs at least once.
+
+    Args:
+        lines (typing.List[str]): the VM commands of a class.
+        notes (list): a line is added here for every loop.
+        options (dict): unused.
+
+    Returns:
+        typing.List[str]: the optimized commands.
+    """
+    prefix, functions = split_functions(lines)
+    return join_functions(
+        prefix, [hoist_function(function, notes) for function in functions])
@@ -0,0 +1,378 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from ControlFlowGraph import split_functions, join_functions, command_of, \
+    argument_of, jump_commands, LABEL, GOTO, IF_GOTO, RETURN
+from LoopInvariantMotion import find_loops, header_end
+from VMExpressions import binary_commands, word
+
+## the option that limits the commands of an unrolled loop
+BUDGET_OPTION = "unroll-budget"
+DEFAULT_BUDGET = 256
+## the most copies of the body a loop that isn't fully unrolled gets
+MAX_PARTIAL_FACTOR = 8
+## loops running more times than this are left alone
+MAX_TRIP_COUNT = 4096
+## unrolling more than this many loops of one function is a sign that the
+## function keeps changing, not converging
+MAX_UNROLLED_LOOPS = 100
+
+PUSH_CONSTANT = "push constant "
+MAX_CONSTANT = 32767
+comparisons = ["eq", "gt", "lt"]
+steps = {"add": 1, "sub": -1}
+
+
+class CountedLoop:
+    """A while loop whose counter is a local that starts at a constant, is
+    compared with a constant, and changes by a constant at the end of every
+    iteration.
+    """
+
+    def __init__(self, function: typing.List[str], head: int, end: int,
+                 slot: str, initial: int, step: int, trip_count: int,
+                 final_value: int) -> None:
+        """
+        Args:
+            function (typing.List[str]): the function holding the loop.
+            head (int): the position of the label the loop starts at.
+            end (int): the position of the goto back to it.
+            slot (str): the index of the local that counts.
+            initial (int): the value of the counter before the loop.
+            step (int): what every iteration adds to the counter.
+            trip_count (int): how many times the body runs.
+            final_value (int): the value of the counter after the loop.
+        """
+        self.head = head
+        self.end = end
+        self.slot = slot
+        self.initial = initial
+        self.step = step
+        self.trip_count = trip_count
+        self.final_value = final_value
+        self.test_end = header_end(function, head, end)
+        ## the body without the counter update, which is its last 4 commands
+        self.body = function[self.test_end + 1:end - 4]
+        self.update = function[end - 4:end]
+        self.name = argument_of(function[head])
+
+    def test_size(self) -> int:
+        """
+        Returns:
+            int: the commands the loop runs to test its condition, the
+            if-goto included.
+        """
+        return self.test_end - self.head
+
+
+def constant_commands(value: int) -> typing.List[str]:
+    """
+    Returns:
+        typing.List[str]: the commands that push the given 16-bit value.
+    """
+    if value >= 0:
+        return [PUSH_CONSTANT + str(value)]
+    if value == -MAX_CONSTANT - 1:
+        return [PUSH_CONSTANT + str(MAX_CONSTANT), "neg", PUSH_CONSTANT + "1", "sub"]
+    return [PUSH_CONSTANT + str(-value), "neg"]
+
+
+def constant_value(commands: typing.List[str]) -> int:
+    """
+    Returns:
+        int: the value the commands push, if they are a constant and
+        possibly "neg", None otherwise.
+    """
+    if len(commands) in [1, 2] and commands[0].startswith(PUSH_CONSTANT):
+        value = int(commands[0][len(PUSH_CONSTANT):])
+        if len(commands) == 1:
+            return value
+        if commands[1] == "neg":
+            return word(-value)
+    return None
+
+
+def initial_value(function: typing.List[str], head: int, slot: str) -> int:
+    """
+    Returns:
+        int: the value the local holds when the loop is first reached, if
+        the straight-line code before the loop sets it to a constant, or
+        leaves it at the 0 every local starts with. None otherwise.
+    """
+    pop = "pop local " + slot
+    for position in range(head - 1, 0, -1):
+        line = function[position]
+        if command_of(line) in [LABEL, GOTO, IF_GOTO, RETURN]:
+            return None
+        if line == pop:
+            for length in [1, 2]:
+                value = constant_value(function[position - length:position])
+                if value is not None and position - length > 0:
+                    return value
+            return None
+    return 0
+
+
+def read_test(test: typing.List[str]) -> typing.Tuple[str, typing.Callable]:
+    """Reads a loop test such as "push local 0, push constant 16, lt, not".
+
+    Returns:
+        typing.Tuple[str, typing.Callable]: the local the test reads, and
+        a function of the local's value that tells if the loop runs again.
+        None if the test has another form.
+    """
+    nots = 0
+    while test and test[-1] == "not":
+        test = test[:-1]
+        nots += 1
+    if len(test) != 3 or test[2] not in comparisons:
+        return None
+    compare = binary_commands[test[2]]
+    operands = test[:2]
+    locals_read = [line for line in operands if line.startswith("push local ")]
+    constants = [line for line in operands if line.startswith(PUSH_CONSTANT)]
+    if len(locals_read) != 1 or len(constants) != 1:
+        return None
+    slot = locals_read[0].split(" ")[2]
+    bound = int(constants[0][len(PUSH_CONSTANT):])
+    local_first = operands[0] == locals_read[0]
+    # The if-goto leaves the loop when the value is not 0, so an odd number
+    # of "not"s, compile_while's included, stays in the loop while the
+    # comparison holds.
+
+    def runs_again(value: int) -> bool:
+        result = compare(value, bound) if local_first else compare(bound, value)
+        return (result != 0) == (nots % 2 == 1)
+
+    return slot, runs_again
+
+
+def counted_loop(function: typing.List[str], head: int, end: int) -> CountedLoop:
+    """
+    Returns:
+        CountedLoop: the loop between the given positions, if it runs a
+        number of times known at compile time, None otherwise.
+    """
+    test_end = header_end(function, head, end)
+    if test_end >= end or command_of(function[test_end]) != IF_GOTO or \
+            end + 1 >= len(function) or \
+            function[end + 1] != LABEL + " " + argument_of(function[test_end]):
+        return None
+    test = read_test(function[head + 1:test_end])
+    if test is None:
+        return None
+    slot, runs_again = test
+    update = function[end - 4:end]
+    if end - 4 <= test_end or update[0] != "push local " + slot or \
+            not update[1].startswith(PUSH_CONSTANT) or update[2] not in steps or \
+            update[3] != "pop local " + slot:
+        return None
+    loop_labels = [argument_of(function[head]), argument_of(function[test_end])]
+    for line in function[test_end + 1:end - 4]:
+        if line == "pop local " + slot or \
+                (command_of(line) in jump_commands and argument_of(line) in loop_labels):
+            return None
+    initial = initial_value(function, head, slot)
+    if initial is None:
+        return None
+    step = steps[update[2]] * int(update[1][len(PUSH_CONSTANT):])
+    value = initial
+    trip_count = 0
+    while runs_again(value):
+        if trip_count == MAX_TRIP_COUNT:
+            return None
+        value = word(value + step)
+        trip_count += 1
+    return CountedLoop(function, head, end, slot, initial, step, trip_count, value)
+
+
+def body_copy(loop: CountedLoop, copy: int, value: int = None) -> typing.List[str]:
+    """
+    Args:
+        loop (CountedLoop): the loop.
+        copy (int): the number of the copy, which makes its labels unique.
+        value (int): the value of the counter during this copy, if known.
+        Its reads are then replaced by the constant.
+
+    Returns:
+        typing.List[str]: the body of the loop with its labels renamed.
+    """
+    labels = set(argument_of(line) for line in loop.body if command_of(line) == LABEL)
+    read = "push local " + loop.slot
+    commands = []
+    for line in loop.body:
+        if command_of(line) in [LABEL] + jump_commands and argument_of(line) in labels:
+            commands.append(command_of(line) + " " + argument_of(line) + "." + str(copy))
+        elif line == read and value is not None:
+            commands.extend(constant_commands(value))
+        else:
+            commands.append(line)
+    return commands
+
+
+def counter_values(loop: CountedLoop) -> typing.List[int]:
+    """
+    Returns:
+        typing.List[int]: the value of the counter in every iteration.
+    """
+    values = [loop.initial]
+    for _ in range(loop.trip_count - 1):
+        values.append(word(values[-1] + loop.step))
+    return values[:loop.trip_count]
+
+
+def fully_unrolled(loop: CountedLoop) -> typing.List[str]:
+    """
+    Returns:
+        typing.List[str]: a copy of the body for every iteration, reading
+        the counter as a constant, followed by setting the counter to its
+        value after the loop.
+    """
+    if loop.trip_count == 0:
+        return []
+    commands = []
+    for copy, value in enumerate(counter_values(loop)):
+        commands.extend(body_copy(loop, copy, value))
+    return commands + constant_commands(loop.final_value) + \
+        ["pop local " + loop.slot]
+
+
+def partially_unrolled(loop: CountedLoop, function: typing.List[str],
+                       factor: int) -> typing.List[str]:
+    """
+    Returns:
+        typing.List[str]: the loop with factor copies of its body, each with
+        its counter update, for every test.
+    """
+    commands = function[loop.head:loop.test_end + 1]
+    for copy in range(factor):
+        commands.extend(body_copy(loop, copy))
+        commands.extend(loop.update)
+    return commands + [function[loop.end], function[loop.end + 1]]
+
+
+def unroll_loop(function: typing.List[str], head: int, end: int, budget: int,
+                notes: list) -> typing.List[str]:
+    """Unrolls a single loop, fully if its copies fit in the budget, or else
+    by the largest factor that divides its trip count and fits.
+
+    Returns:
+        typing.List[str]: the new function, or None if the loop was left
+        alone.
+    """
+    loop = counted_loop(function, head, end)
+    if loop is None:
+        return None
+    original = function[head:end + 2]
+    trips = loop.trip_count
+    test_size = loop.test_size()
+    update_size = len(loop.update)
+    # The commands the loop runs besides its body: a test per iteration and
+    # the one that leaves, and the update and goto of every iteration.
+    overhead = (trips + 1) * test_size + trips * (update_size + 1)
+    unrolled = fully_unrolled(loop)
+    if len(unrolled) <= budget:
+        # Negative counter values take a "neg" more to push, which only
+        # costs if the reads run, so the saving is a lower bound.
+        reads = loop.body.count("push local " + loop.slot)
+        extra = sum(len(constant_commands(value)) - 1
+                    for value in counter_values(loop)) * reads
+        saved = overhead - (2 if trips else 0) - extra
+        how = "fully"
+    else:
+        unrolled = None
+        for factor in range(MAX_PARTIAL_FACTOR, 1, -1):
+            if trips % factor == 0:
+                candidate = partially_unrolled(loop, function, factor)
+                if len(candidate) <= budget:
+                    unrolled = candidate
+                    break
+        if unrolled is None:
+            return None
+        tests = trips // factor
+        saved = overhead - ((tests + 1) * test_size + tests + trips * update_size)
+        how = "by " + str(factor)
+    name = function[0].split(" ")[1]
+    notes.append("%s: unrolled %s %s, %d iterations, %+d commands, "
+                 "at least %d fewer commands run" % (name, loop.name, how, trips,
+                                            len(unrolled) - len(original), saved))
+    return function[:head] + unrolled + function[end + 2:]
+
+
+def unroll_function(function: typing.List[str], budget: int,
+                    notes: list) -> typing.List[str]:
+    tried = set()
+    for _ in range(MAX_UNROLLED_LOOPS):
+        for head, end in find_loops(function):
+            if argument_of(function[head]) in tried:
+                continue
+            tried.add(argument_of(function[head]))
+            unrolled = unroll_loop(function, head, end, budget, notes)
+            if unrolled is not None:
+                function = unrolled
+                break
+        else:
+            break
+    return function
+
+
+def unroll_loops(lines: typing.List[str], notes: list,
+                 options: dict) -> typing.List[str]:
+    """Unrolls the while loops whose counter is a local that starts at a
+    constant, is tested against a constant and changes by a constant at the
+    end of the body. A loop whose copies fit in the budget is fully
+    unrolled, each copy reading the counter as a constant; otherwise it is
+    unrolled by a factor of its trip count, testing once per copies.
+
+    Args:
+        lines (typing.List[str]): the VM commands of a class.
+        notes (list): a line is added here for every loop, with the commands
+        it adds and how many fewer commands run.
+        options (dict): "unroll-budget" is the most commands an unrolled
+        loop may take, 256 if not given.
+
+    Returns:
+        typing.List[str]: the optimized commands.
+    """
+    budget = int(options.get(BUDGET_OPTION, DEFAULT_BUDGET))
+    prefix, functions = split_functions(lines)
+    return join_functions(
+        prefix, [unroll_function(function, budget, notes) for function in functions])
+
+
+if "__main__" == __name__:
+    # Compiles a program with and without unrolling, runs both on the
+    # emulator and compares their size and the commands they ran.
+    import argparse
+    from CodeQuality import compile_program
+    from PassManager import PassManager, PassStatistics, optimization_levels
+    from VMEmulator import VMEmulator
+    parser = argparse.ArgumentParser(
+        prog="LoopUnroller",
+        usage="LoopUnroller [-O{0,1,2}] [--budget N] <program directory> "
+              "[numbers for Keyboard.readInt ...]")
+    parser.add_argument("directory")
+    parser.add_argument("inputs", nargs="*", type=int)
+    parser.add_argument("-O", dest="level", type=int, default=1,
+                        choices=optimization_levels)
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET)
+    arguments = parser.parse_args()
+    print("%-10s %8s %10s" % ("unrolling", "commands", "executed"))
+    for enabled in [[], ["loop-unrolling"]]:
+        pass_manager = PassManager(arguments.level, enabled,
+                                   options={BUDGET_OPTION: arguments.budget})
+        lines = compile_program(arguments.directory, arguments.level, pass_manager)
+        emulator = VMEmulator(lines, arguments.inputs)
+        emulator.run()
+        print("%-10s %8d %10d   %s" % (
+            "on" if enabled else "off", len(lines), emulator.steps,
+            "".join(emulator.output).replace("\n", " ")))
+        if enabled:
+            record = pass_manager.statistics.get("loop-unrolling", PassStatistics())
+            for note in record.notes:
+                print("    " + note)
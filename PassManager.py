@@ -0,0 +1,180 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import threading
+import time
+import typing
+import CommonSubexpressions
+import JumpThreading
+import LocalSlotAllocator
+import LoopInvariantMotion
+import LoopUnroller
+import Peephole
+
+O0 = 0
+O1 = 1
+O2 = 2
+OPT_IN = None
+
+optimization_levels = [O0, O1, O2]
+
+
+class Pass:
+    """An optional transformation of the VM commands of a class, run between
+    parsing and writing the output file.
+    """
+
+    def __init__(self, name: str, run: typing.Callable, level: int,
+                 after: typing.Sequence[str] = ()) -> None:
+        """
+        Args:
+            name (str): the name the pass is enabled and disabled by.
+            run (typing.Callable): called with (lines, notes, options) and
+            returns the transformed lines.
+            level (int): the lowest optimization level that runs the pass, or
+            OPT_IN for passes that only run when enabled by name.
+            after (typing.Sequence[str]): passes that run before this one if
+            they are enabled, without enabling them.
+        """
+        self.name = name
+        self.run = run
+        self.level = level
+        self.after = list(after)
+
+
+## every known pass, in the order they run when nothing else orders them
+passes = [
+    Pass("constant-folding", Peephole.fold_constants, O1),
+    Pass("peephole", Peephole.remove_redundant_pairs, O1,
+         after=["constant-folding"]),
+    Pass("loop-unrolling", LoopUnroller.unroll_loops, OPT_IN,
+         after=["constant-folding", "peephole"]),
+    Pass("jump-threading", JumpThreading.thread_jumps_and_merge_blocks, O1,
+         after=["constant-folding", "peephole", "loop-unrolling"]),
+    Pass("loop-invariant-motion", LoopInvariantMotion.hoist_invariants, O2,
+         after=["constant-folding", "jump-threading"]),
+    Pass("common-subexpressions",
+         CommonSubexpressions.eliminate_common_subexpressions, O2,
+         after=["constant-folding", "loop-invariant-motion"]),
+    Pass("local-slot-reuse", LocalSlotAllocator.reuse_local_slots, O2,
+         after=["peephole", "loop-invariant-motion", "common-subexpressions"]),
+]
+
+passes_by_name = {optimization.name: optimization for optimization in passes}
+
+
+def code_size(lines: typing.List[str]) -> int:
+    """
+    Args:
+        lines (typing.List[str]): VM commands.
+
+    Returns:
+        int: the number of commands, not counting empty and comment lines.
+    """
+    return sum(1 for line in lines if line and not line.startswith("//"))
+
+
+class PassStatistics:
+    """What a pass did over all the classes it ran on."""
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+        self.size_before = 0
+        self.size_after = 0
+        self.notes = []
+
+
+class PassManager:
+    """Selects the passes to run for an optimization level, runs them in
+    order and records the time and code size change of each.
+    Classes may be optimized on several threads at once.
+    """
+
+    def __init__(self, level: int = O0, enabled: typing.Iterable[str] = (),
+                 disabled: typing.Iterable[str] = (),
+                 options: dict = None) -> None:
+        """
+        Args:
+            level (int): the optimization level, O0 runs no passes.
+            enabled (typing.Iterable[str]): names of passes to run regardless
+            of the level.
+            disabled (typing.Iterable[str]): names of passes never to run.
+            options (dict): settings for individual passes.
+        """
+        self.level = level
+        self.options = {} if options is None else options
+        self.passes = self.schedule(set(enabled), set(disabled))
+        self.statistics = {}
+        self.statistics_lock = threading.Lock()
+
+    def schedule(self, enabled: set, disabled: set) -> typing.List[Pass]:
+        """
+        Returns:
+            typing.List[Pass]: the passes to run, in the order to run them.
+        """
+        for name in enabled | disabled:
+            if name not in passes_by_name:
+                raise ValueError("unknown pass: " + name)
+        selected = set(enabled)
+        for optimization in passes:
+            if optimization.level is not OPT_IN and \
+                    O0 < optimization.level <= self.level:
+                selected.add(optimization.name)
+        selected -= disabled
+        ordered = []
+        while len(ordered) < len(selected):
+            for optimization in passes:
+                if optimization.name not in selected or optimization in ordered:
+                    continue
+                if all(name not in selected or passes_by_name[name] in ordered
+                       for name in optimization.after):
+                    ordered.append(optimization)
+                    break
+            else:
+                raise ValueError("passes depend on each other in a cycle")
+        return ordered
+
+    def run(self, lines: typing.List[str]) -> typing.List[str]:
+        """Runs the scheduled passes over the VM commands of a class.
+
+        Args:
+            lines (typing.List[str]): the VM commands.
+
+        Returns:
+            typing.List[str]: the optimized VM commands.
+        """
+        for optimization in self.passes:
+            size_before = code_size(lines)
+            start = time.perf_counter()
+            notes = []
+            lines = optimization.run(lines, notes, self.options)
+            seconds = time.perf_counter() - start
+            with self.statistics_lock:
+                record = self.statistics.setdefault(
+                    optimization.name, PassStatistics())
+                record.seconds += seconds
+                record.size_before += size_before
+                record.size_after += code_size(lines)
+                record.notes.extend(notes)
+        return lines
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: a table of the total time and code size change of every pass
+            that ran, followed by the notes the passes left.
+        """
+        rows = ["pass                  time (ms)   before    after"]
+        for optimization in self.passes:
+            if optimization.name not in self.statistics:
+                continue
+            record = self.statistics[optimization.name]
+            rows.append("%-20s %10.3f %8d %8d" % (
+                optimization.name, record.seconds * 1000, record.size_before,
+                record.size_after))
+            rows.extend("    " + note for note in record.notes)
+        return "\n".join(rows)
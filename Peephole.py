@@ -0,0 +1,121 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from ControlFlowGraph import split_functions, join_functions, argument_of
+
+PUSH_CONSTANT = "push constant "
+MAX_CONSTANT = 32767
+
+folded_operations = {
+    "add": lambda x, y: x + y,
+    "sub": lambda x, y: x - y,
+    "and": lambda x, y: x & y,
+    "or": lambda x, y: x | y,
+    "call Math.multiply 2": lambda x, y: x * y,
+    "call Math.divide 2": lambda x, y: x // y if y != 0 else None,
+}
+
+## instructions that undo themselves when written twice in a row
+involutions = ["not", "neg"]
+
+
+def fold_function_constants(function: typing.List[str],
+                            notes: list) -> typing.List[str]:
+    """
+    Args:
+        function (typing.List[str]): the lines of a function.
+        notes (list): a line is added here if anything was folded.
+
+    Returns:
+        typing.List[str]: the function, with every operation on two constants
+        replaced by its result.
+    """
+    folded = []
+    count = 0
+    for line in function:
+        operation = folded_operations.get(line)
+        if operation is not None and len(folded) >= 2 and \
+                folded[-1].startswith(PUSH_CONSTANT) and \
+                folded[-2].startswith(PUSH_CONSTANT):
+            result = operation(int(folded[-2][len(PUSH_CONSTANT):]),
+                               int(folded[-1][len(PUSH_CONSTANT):]))
+            if result is not None and 0 <= result <= MAX_CONSTANT:
+                folded[-2:] = [PUSH_CONSTANT + str(result)]
+                count += 1
+                continue
+        folded.append(line)
+    if count:
+        notes.append(argument_of(function[0]) + ": folded " + str(count) +
+                     " constant operations")
+    return folded
+
+
+def fold_constants(lines: typing.List[str], notes: list,
+                   options: dict) -> typing.List[str]:
+    """Replaces an operation on two constants by its result, as long as the
+    result can itself be pushed as a constant.
+
+    Args:
+        lines (typing.List[str]): the VM commands of a class.
+        notes (list): a line is added here for every function with folds.
+        options (dict): unused.
+
+    Returns:
+        typing.List[str]: the folded commands.
+    """
+    prefix, functions = split_functions(lines)
+    return join_functions(
+        prefix, [fold_function_constants(function, notes)
+                 for function in functions])
+
+
+def remove_function_pairs(function: typing.List[str],
+                          notes: list) -> typing.List[str]:
+    """
+    Args:
+        function (typing.List[str]): the lines of a function.
+        notes (list): a line is added here if any pair was removed.
+
+    Returns:
+        typing.List[str]: the function, without pairs of adjacent commands
+        that cancel each other out.
+    """
+    kept = []
+    count = 0
+    for line in function:
+        if kept:
+            previous = kept[-1]
+            if line in involutions and previous == line or \
+                    line.startswith("pop ") and previous == "push " + line[4:]:
+                kept.pop()
+                count += 1
+                continue
+        kept.append(line)
+    if count:
+        notes.append(argument_of(function[0]) + ": removed " + str(count) +
+                     " redundant pairs")
+    return kept
+
+
+def remove_redundant_pairs(lines: typing.List[str], notes: list,
+                           options: dict) -> typing.List[str]:
+    """Removes pairs of adjacent commands that cancel each other out: a pop
+    straight back to the location just pushed, and a repeated "not"/"neg".
+
+    Args:
+        lines (typing.List[str]): the VM commands of a class.
+        notes (list): a line is added here for every function with pairs.
+        options (dict): unused.
+
+    Returns:
+        typing.List[str]: the remaining commands.
+    """
+    prefix, functions = split_functions(lines)
+    return join_functions(
+        prefix, [remove_function_pairs(function, notes)
+                 for function in functions])
@@ -0,0 +1,53 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+## starts the line that opens a file in a stream of several, such as
+## "//# Main.jack". Being a comment, a framed stream is still valid Jack or VM
+## code for tools that don't know about frames.
+FRAME_PREFIX = "//# "
+
+
+def frame_header(name: str) -> str:
+    """
+    Args:
+        name (str): the name of the file the frame holds, such as "Main.vm".
+
+    Returns:
+        str: the line that opens the frame, without the line break.
+    """
+    return FRAME_PREFIX + name
+
+
+def read_frames(stream: typing.Iterable[str]) -> \
+        typing.Iterator[typing.Tuple[str, typing.List[str]]]:
+    """Splits a stream into the files framed in it. A frame is yielded as
+    soon as the header of the next one, or the end of the stream, is read,
+    so a pipe can be worked on while it is still being written.
+
+    Args:
+        stream (typing.Iterable[str]): the lines of the stream.
+
+    Returns:
+        typing.Iterator[typing.Tuple[str, typing.List[str]]]: the name and
+        lines of every frame. Lines before the first header form a frame
+        named None, unless they are all blank.
+    """
+    name = None
+    lines = []
+    for line in stream:
+        line = line.rstrip("\r\n")
+        if line.startswith(FRAME_PREFIX):
+            if name is not None or any(text.strip() for text in lines):
+                yield name, lines
+            name = line[len(FRAME_PREFIX):].strip()
+            lines = []
+        else:
+            lines.append(line)
+    if name is not None or any(text.strip() for text in lines):
+        yield name, lines
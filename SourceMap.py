@@ -0,0 +1,316 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import bisect
+import difflib
+import os
+import typing
+
+MAP_SUFFIX = ".vm.map"
+MAP_VERSION = "1"
+HEADER = "jackmap"
+
+VLQ_DIGITS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+VLQ_VALUES = {digit: value for value, digit in enumerate(VLQ_DIGITS)}
+VLQ_SHIFT = 5
+VLQ_CONTINUE = 1 << VLQ_SHIFT
+VLQ_MASK = VLQ_CONTINUE - 1
+
+
+def encode_vlq(value: int) -> str:
+    """
+    Returns:
+        str: the number as base64 digits of 5 bits each, lowest first, with
+        the sign in the lowest bit.
+    """
+    value = (-value << 1) | 1 if value < 0 else value << 1
+    digits = ""
+    while True:
+        digit = value & VLQ_MASK
+        value >>= VLQ_SHIFT
+        if value:
+            digits += VLQ_DIGITS[digit | VLQ_CONTINUE]
+        else:
+            return digits + VLQ_DIGITS[digit]
+
+
+def decode_vlq(text: str) -> typing.List[int]:
+    """
+    Returns:
+        typing.List[int]: the numbers encode_vlq wrote into the text.
+    """
+    values = []
+    value = 0
+    shift = 0
+    for digit in text:
+        digit = VLQ_VALUES[digit]
+        value |= (digit & VLQ_MASK) << shift
+        if digit & VLQ_CONTINUE:
+            shift += VLQ_SHIFT
+            continue
+        values.append(-(value >> 1) if value & 1 else value >> 1)
+        value = 0
+        shift = 0
+    return values
+
+
+def function_ranges(commands: typing.List[str]) -> typing.List[tuple]:
+    """
+    Returns:
+        typing.List[tuple]: the name, first command and end of every
+        function of the commands, in order. Commands before the first
+        function make a range with no name.
+    """
+    ranges = []
+    name = None
+    first = 0
+    for index, command in enumerate(commands):
+        if command.startswith("function "):
+            if index > first:
+                ranges.append((name, first, index))
+            name = command.split(" ")[1]
+            first = index
+    if len(commands) > first:
+        ranges.append((name, first, len(commands)))
+    return ranges
+
+
+def align_commands(original: typing.List[str], positions: list,
+                   optimized: typing.List[str]) -> list:
+    """
+    Returns:
+        list: the position of every optimized command, taken from the
+        original command it matches, or from the ones around it.
+    """
+    if not original:
+        return [(0, None)] * len(optimized)
+    aligned = []
+    matcher = difflib.SequenceMatcher(None, original, optimized, autojunk=False)
+    for tag, first, last, new_first, new_last in matcher.get_opcodes():
+        if tag == "equal":
+            aligned.extend(positions[first:last])
+        elif tag in ["replace", "insert"]:
+            first = min(first, len(positions) - 1)
+            width = max(last - first, 1)
+            count = new_last - new_first
+            aligned.extend(positions[first + index * width // count]
+                           for index in range(count))
+    return aligned
+
+
+def realign(original: typing.List[str], positions: list,
+            optimized: typing.List[str]) -> list:
+    """Carries source positions over optimization passes, which only see the
+    commands. Commands the passes kept keep their position, and commands
+    they replaced or added take the position of the commands around them.
+
+    Args:
+        original (typing.List[str]): the commands the passes got.
+        positions (list): the (line, subroutine) of every original command.
+        optimized (typing.List[str]): the commands the passes returned.
+
+    Returns:
+        list: the (line, subroutine) of every optimized command.
+    """
+    if not original:
+        return [(0, None)] * len(optimized)
+    function_lines = {}
+    for command, position in zip(original, positions):
+        if command.startswith("function "):
+            function_lines[command.split(" ")[1]] = position[0]
+    ## the passes work within functions, so a function is matched only
+    ## against itself, which keeps the matching time to the sum of the
+    ## squares of the function lengths rather than the square of the class
+    original_ranges = function_ranges(original)
+    optimized_ranges = function_ranges(optimized)
+    if [name for name, _, _ in original_ranges] != \
+            [name for name, _, _ in optimized_ranges]:
+        original_ranges = [(None, 0, len(original))]
+        optimized_ranges = [(None, 0, len(optimized))]
+    aligned = []
+    for (_, first, last), (_, new_first, new_last) in \
+            zip(original_ranges, optimized_ranges):
+        aligned.extend(align_commands(original[first:last],
+                                      positions[first:last],
+                                      optimized[new_first:new_last]))
+    ## the subroutine of a command is the function it is in, whatever the
+    ## passes moved
+    subroutine = None
+    for index, command in enumerate(optimized):
+        if command.startswith("function "):
+            subroutine = command.split(" ")[1]
+            aligned[index] = (function_lines.get(subroutine, aligned[index][0]),
+                              subroutine)
+        else:
+            aligned[index] = (aligned[index][0], subroutine)
+    return aligned
+
+
+class SourceMap:
+    """Maps the commands of a VM file to the Jack lines and subroutines they
+    were compiled from. Commands are counted from 0, and only commands
+    count, as VMWriter writes no other lines.
+
+    A map file has a header line, then a line per subroutine: its name, a
+    colon, and a pair of numbers for every run of commands from the same
+    Jack line: the length of the run and the line's difference from the
+    line of the run before. The numbers are written as base64 VLQ, like
+    JavaScript source maps do.
+    """
+
+    def __init__(self, source_file: str = None) -> None:
+        """
+        Args:
+            source_file (str): the name of the Jack file.
+        """
+        self.source_file = source_file
+        ## the first command of every run, and the line and subroutine of it
+        self.starts = []
+        self.lines = []
+        self.subroutines = []
+        self.length = 0
+        self.function_starts = {}
+
+    def add(self, line: int, subroutine: str, count: int = 1) -> None:
+        """Maps the next commands of the file.
+
+        Args:
+            line (int): the Jack line they come from, counted from 1.
+            subroutine (str): the full name of their subroutine.
+            count (int): the number of commands.
+        """
+        if not self.starts or self.lines[-1] != line or \
+                self.subroutines[-1] != subroutine:
+            if subroutine not in self.function_starts:
+                self.function_starts[subroutine] = self.length
+            self.starts.append(self.length)
+            self.lines.append(line)
+            self.subroutines.append(subroutine)
+        self.length += count
+
+    def add_positions(self, positions: typing.Iterable[tuple]) -> None:
+        """Maps the next commands, given the (line, subroutine) of each."""
+        for line, subroutine in positions:
+            self.add(line, subroutine)
+
+    def encode(self) -> str:
+        """
+        Returns:
+            str: the contents of the map file.
+        """
+        rows = [" ".join([HEADER, MAP_VERSION, self.source_file or ""])]
+        previous_line = 0
+        for run, start in enumerate(self.starts):
+            end = self.starts[run + 1] if run + 1 < len(self.starts) else self.length
+            segment = encode_vlq(end - start) + \
+                encode_vlq(self.lines[run] - previous_line)
+            previous_line = self.lines[run]
+            if run == 0 or self.subroutines[run] != self.subroutines[run - 1]:
+                rows.append(str(self.subroutines[run]) + ":" + segment)
+            else:
+                rows[-1] += segment
+        return "\n".join(rows) + "\n"
+
+    @staticmethod
+    def decode(text: str) -> "SourceMap":
+        """
+        Args:
+            text (str): the contents of a map file.
+
+        Returns:
+            SourceMap: the map, indexed for lookups.
+        """
+        rows = text.splitlines()
+        header = rows[0].split(" ", 2) if rows else []
+        if header[:2] != [HEADER, MAP_VERSION]:
+            raise ValueError("not a version " + MAP_VERSION + " source map")
+        source_map = SourceMap(header[2] if len(header) > 2 else None)
+        line = 0
+        for row in rows[1:]:
+            subroutine, segments = row.rsplit(":", 1)
+            values = decode_vlq(segments)
+            for index in range(0, len(values), 2):
+                line += values[index + 1]
+                source_map.add(line, subroutine, values[index])
+        return source_map
+
+    @staticmethod
+    def load(path: str) -> "SourceMap":
+        with open(path, "r") as map_file:
+            return SourceMap.decode(map_file.read())
+
+    def lookup(self, command: int) -> typing.Tuple[str, int, str]:
+        """
+        Args:
+            command (int): the index of a command in the VM file.
+
+        Returns:
+            typing.Tuple[str, int, str]: the Jack file, line and subroutine
+            the command comes from, or None if it is not in the file.
+        """
+        if command < 0 or command >= self.length:
+            return None
+        run = bisect.bisect_right(self.starts, command) - 1
+        return self.source_file, self.lines[run], self.subroutines[run]
+
+    def lookup_in_function(self, function: str,
+                           offset: int) -> typing.Tuple[str, int, str]:
+        """
+        Args:
+            function (str): the full name of a function of the file.
+            offset (int): the index of a command in the function, where its
+            "function" command is 0.
+
+        Returns:
+            typing.Tuple[str, int, str]: as lookup does.
+        """
+        if function not in self.function_starts:
+            return None
+        return self.lookup(self.function_starts[function] + offset)
+
+
+def load_directory(directory: str) -> typing.Dict[str, SourceMap]:
+    """
+    Returns:
+        typing.Dict[str, SourceMap]: the map of every function that has one
+        in the directory.
+    """
+    maps = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(MAP_SUFFIX):
+            source_map = SourceMap.load(os.path.join(directory, filename))
+            for function in source_map.function_starts:
+                maps[function] = source_map
+    return maps
+
+
+def hot_spots(function_counts: typing.Dict[str, typing.List[int]],
+              maps: typing.Dict[str, SourceMap],
+              limit: int = 10) -> typing.List[typing.Tuple[int, str, int, str]]:
+    """Adds up executed command counts by the Jack line they come from.
+
+    Args:
+        function_counts (typing.Dict[str, typing.List[int]]): for every
+        function, how many times each of its commands ran, by offset.
+        maps (typing.Dict[str, SourceMap]): as load_directory returns.
+        limit (int): the number of lines to return.
+
+    Returns:
+        typing.List[typing.Tuple[int, str, int, str]]: the count, file, line
+        and subroutine of the lines that ran the most commands.
+    """
+    totals = {}
+    for function, counts in function_counts.items():
+        if function not in maps:
+            continue
+        for offset, count in enumerate(counts):
+            if count:
+                position = maps[function].lookup_in_function(function, offset)
+                if position is not None:
+                    totals[position] = totals.get(position, 0) + count
+    ranked = sorted(totals.items(), key=lambda item: -item[1])[:limit]
+    return [(count,) + position for position, count in ranked]
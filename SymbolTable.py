@@ -6,8 +6,6 @@ as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import typing
-import numpy as np
-import pandas as pd
 NAME_T = "Name"
 TYPE_T= "Type"
 KIND_T= "Kind"
@@ -22,20 +20,23 @@ VAR="var"
 class SymbolTable:
     """A symbol table that associates names with information needed for Jack
     compilation: type, kind and running index. The symbol table has two nested
-    scopes (class/subroutine).
+    scopes (class/subroutine), each a dictionary from the names to their
+    rows, so finding a name doesn't search the scope.
     """
 
     def __init__(self) -> None:
         """Creates a new empty symbol table."""
-        self.class_table = pd.DataFrame(columns= [NAME_T, TYPE_T, KIND_T, INDEX_T])
-        self.subroutine_table = pd.DataFrame(columns=[NAME_T, TYPE_T, KIND_T, INDEX_T])
+        self.class_table = {}
+        self.subroutine_table = {}
         self.value_count_dict ={ARG:0, VAR: 0 ,STATIC:0, FIELD_T:0 }
 
     def start_subroutine(self) -> None:
         """Starts a new subroutine scope (i.e., resets the subroutine's 
         symbol table).
         """
-        self.subroutine_table = pd.DataFrame(columns=[NAME_T, TYPE_T, KIND_T, INDEX_T])
+        self.subroutine_table = {}
+        self.value_count_dict[ARG] = 0
+        self.value_count_dict[VAR] = 0
 
 
 
@@ -56,12 +57,43 @@ class SymbolTable:
         else:
             table = self.subroutine_table
         var_index = self.value_count_dict[kind]
-        table= table.append({NAME_T:name,TYPE_T:type,KIND_T:kind,INDEX_T:var_index}, ignore_index=True)
+        table[name] = {NAME_T:name,TYPE_T:type,KIND_T:kind,INDEX_T:var_index}
         self.value_count_dict[kind]+=1
+
+    def define_class_scope(self, variables: typing.Iterable[tuple]) -> None:
+        """Replaces the class scope with the given variables, indexed in
+        their order, as if they were defined one by one.
+
+        Args:
+            variables (typing.Iterable[tuple]): (kind, type, name) of every
+            static and field variable.
+        """
+        self.class_table = {}
+        counts = {STATIC: 0, FIELD_T: 0}
+        for kind, type, name in variables:
+            # the engine keeps the first of two variables of the same name
+            self.class_table.setdefault(name, {NAME_T: name, TYPE_T: type,
+                                               KIND_T: kind,
+                                               INDEX_T: counts[kind]})
+            counts[kind] += 1
+        self.value_count_dict[STATIC] = counts[STATIC]
+        self.value_count_dict[FIELD_T] = counts[FIELD_T]
+
+    def is_defined(self, name: str, kind: str) -> bool:
+        """
+        Args:
+            name (str): name of an identifier.
+            kind (str): can be "STATIC", "FIELD", "ARG", "VAR".
+
+        Returns:
+            bool: True if the name is already defined in the scope that
+            identifiers of the given kind are defined in.
+        """
         if kind in [STATIC, FIELD_T]:
-            self.class_table =table
+            table = self.class_table
         else:
-            self.subroutine_table = table
+            table = self.subroutine_table
+        return name in table
 
     def var_count(self, kind: str) -> int:
         """
@@ -74,13 +106,17 @@ class SymbolTable:
         """
         return self.value_count_dict[kind]
 
+    def find_symbol(self, name: str):
+        information = self.subroutine_table.get(name)
+        if information is None:
+            information = self.class_table.get(name)
+        return information
+
     def get_a_property_from_table (self,property: str, name: str):
-        information = self.subroutine_table.loc[self.subroutine_table[NAME_T] == name]
-        if information.empty:
-            information = self.class_table[self.class_table[NAME_T] == name]
-        if information.empty:
-            print("**\n\n\n error: can't find symbol\n\n\n")
-        return information[property].item()
+        information = self.find_symbol(name)
+        if information is None:
+            return None
+        return information[property]
 
 
     def kind_of(self, name: str) -> str:
@@ -102,7 +138,8 @@ class SymbolTable:
             name (str):  name of an identifier.
 
         Returns:
-            str: the type of the named identifier in the current scope.
+            str: the type of the named identifier in the current scope, or None
+            if the identifier is unknown in the current scope.
         """
         return self.get_a_property_from_table(TYPE_T,name)
 
@@ -112,6 +149,10 @@ class SymbolTable:
             name (str):  name of an identifier.
 
         Returns:
-            int: the index assigned to the named identifier.
+            int: the index assigned to the named identifier, or None if the
+            identifier is unknown in the current scope.
         """
-        return int( self.get_a_property_from_table(INDEX_T,name))
+        index = self.get_a_property_from_table(INDEX_T,name)
+        if index is None:
+            return None
+        return int(index)
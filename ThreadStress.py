@@ -0,0 +1,154 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import concurrent.futures
+import glob
+import io
+import os
+import random
+import sys
+import time
+import typing
+from ClassIndex import ClassIndex
+from CodeQuality import SAMPLES, LEVELS
+from JackCompiler import compile_file
+from PassManager import PassManager
+
+DEFAULT_THREADS = 8
+DEFAULT_ROUNDS = 5
+## how often, in seconds, the interpreter switches between threads during
+## the test, so compilations interleave in the middle of a line
+SWITCH_INTERVAL = 1e-5
+
+## the outputs compared for every class
+OUTPUTS = ["vm", "xml", "tokens", "map", "errors"]
+## the subroutines of the generated class, which keeps the tokenizers busy
+## inside /* comments and on lines holding "*"
+STRESS_SUBROUTINES = 40
+STRESS_COMMENT_LINES = 100
+
+
+def compile_source(text: str, class_index: ClassIndex,
+                   pass_manager: PassManager) -> typing.Tuple[str, ...]:
+    """
+    Returns:
+        typing.Tuple[str, ...]: every output of compiling the source, in the
+        order of OUTPUTS.
+    """
+    files = [io.StringIO() for _ in OUTPUTS]
+    vm_file, xml_file, tokens_file, map_file, error_file = files
+    compile_file(io.StringIO(text), vm_file, class_index, pass_manager,
+                 xml_file, tokens_file, map_file, error_file)
+    return tuple(output.getvalue() for output in files)
+
+
+def comment_heavy_class() -> str:
+    """
+    Returns:
+        str: the source of a class whose subroutines all start with a long
+        /* comment and multiply, so tokenizers that shared their comment
+        state would cut each other's lines.
+    """
+    lines = ["class Stress {"]
+    for index in range(STRESS_SUBROUTINES):
+        lines.append("    /** Multiplies a and b, " + str(index) + ".")
+        lines.extend("     * line " + str(line) + " of the comment"
+                     for line in range(STRESS_COMMENT_LINES))
+        lines.append("     */")
+        lines.append("    function int multiply" + str(index) + "(int a, int b) {")
+        lines.append("        return (a * b) * " + str(index) + ";")
+        lines.append("    }")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def read_samples(root: str) -> typing.List[tuple]:
+    """
+    Returns:
+        typing.List[tuple]: (program, class index, [(file name, text)]) for
+        every sample program, and for the comment heavy class.
+    """
+    programs = []
+    for sample in SAMPLES:
+        paths = sorted(glob.glob(os.path.join(root, sample, "*.jack")))
+        class_index = ClassIndex()
+        sources = []
+        for path in paths:
+            with open(path, "r") as input_file:
+                text = input_file.read()
+            class_index.add_source(path, text)
+            sources.append((os.path.basename(path), text))
+        programs.append((sample, class_index, sources))
+    text = comment_heavy_class()
+    class_index = ClassIndex()
+    class_index.add_source("Stress.jack", text)
+    programs.append(("Stress", class_index, [("Stress.jack", text)]))
+    return programs
+
+
+def stress(programs: typing.List[tuple], threads: int, rounds: int,
+           seed: int) -> typing.Tuple[int, typing.List[str]]:
+    """Compiles every class of the programs once on this thread, then
+    compiles them all again, rounds times in shuffled order, on a pool of
+    threads sharing the class indexes and pass managers.
+
+    Returns:
+        typing.Tuple[int, typing.List[str]]: the number of concurrent
+        compilations, and a line for every output that differed from the
+        one compiled alone.
+    """
+    pass_managers = {level: PassManager(level) for level in LEVELS}
+    jobs = [(sample + "/" + file_name + " -O" + str(level), text, class_index,
+             pass_managers[level])
+            for sample, class_index, sources in programs
+            for file_name, text in sources
+            for level in LEVELS]
+    expected = {name: compile_source(text, class_index, pass_manager)
+                for name, text, class_index, pass_manager in jobs}
+    schedule = jobs * rounds
+    random.Random(seed).shuffle(schedule)
+
+    def run(job: tuple) -> tuple:
+        name, text, class_index, pass_manager = job
+        return name, compile_source(text, class_index, pass_manager)
+
+    mismatches = []
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(SWITCH_INTERVAL)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+            for name, outputs in executor.map(run, schedule):
+                for output, actual, wanted in zip(OUTPUTS, outputs, expected[name]):
+                    if actual != wanted:
+                        mismatches.append(name + ": the " + output + " output differs")
+    finally:
+        sys.setswitchinterval(switch_interval)
+    return len(schedule), mismatches
+
+
+if "__main__" == __name__:
+    # Compiles the sample programs on many threads at once and checks that
+    # every output is byte for byte the same as when compiled alone. Exits
+    # with 1 if any differs.
+    parser = argparse.ArgumentParser(
+        prog="ThreadStress",
+        usage="ThreadStress [--threads N] [--rounds N] [--seed N]")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS)
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+    start = time.perf_counter()
+    compilations, mismatches = stress(
+        read_samples(os.path.dirname(os.path.abspath(__file__))),
+        arguments.threads, arguments.rounds, arguments.seed)
+    for mismatch in sorted(set(mismatches)):
+        print(mismatch)
+    print("%d compilations on %d threads in %.2fs, %d outputs differed" % (
+        compilations, arguments.threads, time.perf_counter() - start,
+        len(mismatches)))
+    sys.exit(1 if mismatches else 0)
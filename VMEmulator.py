@@ -0,0 +1,360 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import collections
+import math
+import typing
+from VMExpressions import binary_commands, unary_commands, word
+
+SP = 0
+LCL = 1
+ARG = 2
+THIS = 3
+THAT = 4
+TEMP_BASE = 5
+STATIC_BASE = 16
+STACK_BASE = 256
+HEAP_BASE = 2048
+HEAP_END = 16384
+RAM_SIZE = 32768
+
+## opcodes of the parsed commands
+PUSH, POP, ARITHMETIC, GOTO, IF_GOTO, CALL, FUNCTION, RETURN = range(8)
+
+pointer_segments = {"local": LCL, "argument": ARG, "this": THIS, "that": THAT}
+
+
+class EmulatorError(Exception):
+    """Raised when the program does something the VM can't run, or calls
+    Sys.error.
+    """
+
+
+class VMEmulator:
+    """Runs VM code and counts the commands it executes, so optimizations
+    can be measured by dynamic instruction counts instead of code size. The
+    OS classes the program doesn't define itself are emulated in Python; a
+    call to one of them counts as a single command.
+    """
+
+    def __init__(self, lines: typing.Iterable[str], inputs: typing.Iterable[int] = (),
+                 max_steps: int = 10 ** 7) -> None:
+        """
+        Args:
+            lines (typing.Iterable[str]): the VM commands of all the classes
+            of the program.
+            inputs (typing.Iterable[int]): the numbers Keyboard.readInt
+            returns, in order.
+            max_steps (int): the run stops with an error after executing this
+            many commands, since interactive programs never end on their own.
+        """
+        self.ram = [0] * RAM_SIZE
+        self.inputs = collections.deque(inputs)
+        self.max_steps = max_steps
+        self.functions = {}
+        self.static_bases = {}
+        self.strings = {}
+        self.heap_pointer = HEAP_BASE
+        self.output = []
+        self.steps = 0
+        self.frame_words = 0
+        self.command_counts = collections.Counter()
+        self.os_calls = collections.Counter()
+        ## for every function, the file offset of each parsed command and
+        ## how many times it ran
+        self.offsets = {}
+        self.profiles = {}
+        self.load(lines)
+
+    def static_base(self, class_name: str) -> int:
+        if class_name not in self.static_bases:
+            self.static_bases[class_name] = STATIC_BASE + 16 * len(self.static_bases)
+        return self.static_bases[class_name]
+
+    def load(self, lines: typing.Iterable[str]) -> None:
+        """Parses the commands into tuples, resolving labels to positions."""
+        name = None
+        code = []
+        labels = {}
+        offsets = []
+        offset = 0
+        pending = []
+        for line in lines:
+            line = line.split("//")[0].strip()
+            if not line:
+                continue
+            parts = line.split()
+            command = parts[0]
+            if command == "function":
+                if name is not None:
+                    pending.append((name, code, labels, offsets))
+                name, code, labels, offsets = parts[1], [], {}, []
+                offset = 0
+                code.append((FUNCTION, int(parts[2]), None))
+                offsets.append(offset)
+                continue
+            offset += 1
+            if command == "label":
+                labels[parts[1]] = len(code)
+                continue
+            offsets.append(offset)
+            if command in ["push", "pop"]:
+                segment, index = parts[1], int(parts[2])
+                if segment == "static":
+                    index += self.static_base(name.split(".")[0])
+                code.append((PUSH if command == "push" else POP, segment, index))
+            elif command in ["goto", "if-goto"]:
+                code.append((GOTO if command == "goto" else IF_GOTO, parts[1], None))
+            elif command == "call":
+                code.append((CALL, parts[1], int(parts[2])))
+            elif command == "return":
+                code.append((RETURN, None, None))
+            else:
+                code.append((ARITHMETIC, command, None))
+        if name is not None:
+            pending.append((name, code, labels, offsets))
+        for name, code, labels, offsets in pending:
+            self.functions[name] = [
+                (opcode, labels[a], b) if opcode in [GOTO, IF_GOTO] else (opcode, a, b)
+                for opcode, a, b in code]
+            self.offsets[name] = offsets
+            self.profiles[name] = [0] * len(code)
+
+    def push(self, value: int) -> None:
+        self.ram[self.ram[SP]] = word(value)
+        self.ram[SP] += 1
+
+    def pop(self) -> int:
+        self.ram[SP] -= 1
+        return self.ram[self.ram[SP]]
+
+    def address(self, segment: str, index: int) -> int:
+        if segment in pointer_segments:
+            return self.ram[pointer_segments[segment]] + index
+        if segment == "pointer":
+            return THIS + index
+        if segment == "temp":
+            return TEMP_BASE + index
+        if segment == "static":
+            return index
+        raise EmulatorError("unknown segment: " + segment)
+
+    def run(self, entry: str = "Main.main") -> None:
+        """Calls the entry function and runs until it returns or the program
+        halts.
+        """
+        ram = self.ram
+        ram[SP] = STACK_BASE
+        ram[LCL] = STACK_BASE
+        ram[ARG] = STACK_BASE
+        if entry not in self.functions:
+            raise EmulatorError("unknown function: " + entry)
+        code = self.functions[entry]
+        profile = self.profiles[entry]
+        pc = 0
+        calls = []
+        counts = self.command_counts
+        while True:
+            if self.steps >= self.max_steps:
+                raise EmulatorError("ran for more than " + str(self.max_steps) + " steps")
+            opcode, a, b = code[pc]
+            profile[pc] += 1
+            pc += 1
+            self.steps += 1
+            if opcode == PUSH:
+                counts["push"] += 1
+                self.push(b if a == "constant" else ram[self.address(a, b)])
+            elif opcode == POP:
+                counts["pop"] += 1
+                value = self.pop()
+                ram[self.address(a, b)] = value
+            elif opcode == ARITHMETIC:
+                counts[a] += 1
+                if a in unary_commands:
+                    self.push(unary_commands[a](self.pop()))
+                else:
+                    y = self.pop()
+                    self.push(binary_commands[a](self.pop(), y))
+            elif opcode == GOTO:
+                counts["goto"] += 1
+                pc = a
+            elif opcode == IF_GOTO:
+                counts["if-goto"] += 1
+                if self.pop() != 0:
+                    pc = a
+            elif opcode == FUNCTION:
+                counts["function"] += 1
+                self.frame_words += a
+                for _ in range(a):
+                    self.push(0)
+            elif opcode == CALL:
+                counts["call"] += 1
+                if a not in self.functions:
+                    arguments = [self.pop() for _ in range(b)][::-1]
+                    self.os_calls[a] += 1
+                    result = self.call_os(a, arguments)
+                    if result is None:
+                        return
+                    self.push(result)
+                    continue
+                calls.append((code, pc, profile))
+                for register in [0, LCL, ARG, THIS, THAT]:
+                    self.push(ram[register])
+                ram[ARG] = ram[SP] - b - 5
+                ram[LCL] = ram[SP]
+                code, pc, profile = self.functions[a], 0, self.profiles[a]
+            elif opcode == RETURN:
+                counts["return"] += 1
+                frame = ram[LCL]
+                ram[ram[ARG]] = self.pop()
+                ram[SP] = ram[ARG] + 1
+                ram[THAT], ram[THIS], ram[ARG], ram[LCL] = \
+                    ram[frame - 1], ram[frame - 2], ram[frame - 3], ram[frame - 4]
+                if not calls:
+                    return
+                code, pc, profile = calls.pop()
+
+    def alloc(self, size: int) -> int:
+        if size < 0 or self.heap_pointer + size > HEAP_END:
+            raise EmulatorError("heap overflow")
+        address = self.heap_pointer
+        self.heap_pointer += max(size, 1)
+        return address
+
+    def call_os(self, name: str, arguments: list) -> int:
+        """Emulates an OS function.
+
+        Returns:
+            int: the value the function returns, or None if it halts.
+        """
+        ram = self.ram
+        if name == "Math.multiply":
+            return word(arguments[0] * arguments[1])
+        if name == "Math.divide":
+            if arguments[1] == 0:
+                raise EmulatorError("division by zero")
+            return int(arguments[0] / arguments[1])
+        if name == "Math.min":
+            return min(arguments)
+        if name == "Math.max":
+            return max(arguments)
+        if name == "Math.abs":
+            return abs(arguments[0])
+        if name == "Math.sqrt":
+            return math.isqrt(max(arguments[0], 0))
+        if name in ["Memory.alloc", "Array.new"]:
+            return self.alloc(arguments[0])
+        if name in ["Memory.deAlloc", "Array.dispose", "String.dispose"]:
+            return 0
+        if name == "Memory.peek":
+            return ram[arguments[0]]
+        if name == "Memory.poke":
+            ram[arguments[0]] = word(arguments[1])
+            return 0
+        if name == "String.new":
+            address = self.alloc(2)
+            self.strings[address] = []
+            return address
+        if name == "String.appendChar":
+            self.strings[arguments[0]].append(arguments[1])
+            return arguments[0]
+        if name == "String.length":
+            return len(self.strings[arguments[0]])
+        if name == "String.charAt":
+            return self.strings[arguments[0]][arguments[1]]
+        if name == "String.setCharAt":
+            self.strings[arguments[0]][arguments[1]] = arguments[2]
+            return 0
+        if name == "String.eraseLastChar":
+            self.strings[arguments[0]].pop()
+            return 0
+        if name == "String.newLine":
+            return 128
+        if name == "String.backSpace":
+            return 129
+        if name == "String.doubleQuote":
+            return 34
+        if name == "Output.printString":
+            self.output.append("".join(chr(c) for c in self.strings[arguments[0]]))
+            return 0
+        if name == "Output.printInt":
+            self.output.append(str(arguments[0]))
+            return 0
+        if name == "Output.printChar":
+            self.output.append(chr(arguments[0]))
+            return 0
+        if name == "Output.println":
+            self.output.append("\n")
+            return 0
+        if name == "Keyboard.readInt":
+            if not self.inputs:
+                raise EmulatorError("no more input")
+            return self.inputs.popleft()
+        if name == "Sys.halt":
+            return None
+        if name == "Sys.error":
+            raise EmulatorError("Sys.error " + str(arguments[0]))
+        if name.split(".")[0] in ["Output", "Screen", "Keyboard", "Sys"]:
+            return 0
+        raise EmulatorError("unknown function: " + name)
+
+    def line_counts(self) -> typing.Dict[str, typing.List[int]]:
+        """
+        Returns:
+            typing.Dict[str, typing.List[int]]: for every function, how many
+            times each of its lines ran, by offset from its "function"
+            command. Labels never run.
+        """
+        line_counts = {}
+        for name, profile in self.profiles.items():
+            offsets = self.offsets[name]
+            counts = [0] * (offsets[-1] + 1)
+            for position, count in enumerate(profile):
+                counts[offsets[position]] = count
+            line_counts[name] = counts
+        return line_counts
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: the executed command counts, by command, and the OS calls.
+        """
+        rows = ["executed commands: " + str(self.steps),
+                "zeroed frame words: " + str(self.frame_words)]
+        for command, count in self.command_counts.most_common():
+            rows.append("    %-10s %10d" % (command, count))
+        for name, count in self.os_calls.most_common():
+            rows.append("    %-24s %10d" % (name, count))
+        return "\n".join(rows)
+
+
+if "__main__" == __name__:
+    # Runs the VM files of a compiled program and prints what it executed,
+    # and the Jack lines that ran the most if it was compiled with
+    # --emit=vm,map.
+    import os
+    import sys
+    import SourceMap
+    if len(sys.argv) < 2:
+        sys.exit("Invalid usage, please use: VMEmulator.py <vm directory> "
+                 "[numbers for Keyboard.readInt ...]")
+    directory = sys.argv[1]
+    program = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".vm"):
+            with open(os.path.join(directory, filename), "r") as vm_file:
+                program.extend(vm_file.read().splitlines())
+    emulator = VMEmulator(program, [int(number) for number in sys.argv[2:]])
+    emulator.run()
+    print("".join(emulator.output))
+    print(emulator.report())
+    source_maps = SourceMap.load_directory(directory)
+    if source_maps:
+        print("hot spots:")
+        for count, source_file, line, subroutine in SourceMap.hot_spots(
+                emulator.line_counts(), source_maps):
+            print("    %10d  %s:%d  %s" % (count, source_file, line, subroutine))
@@ -0,0 +1,197 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+## locations an expression can read, besides the frame's own slots
+MEMORY = "memory"
+FRAME_SEGMENTS = ["local", "argument"]
+
+## what the arithmetic commands compute, before the result is wrapped to a
+## word
+binary_commands = {
+    "add": lambda x, y: x + y,
+    "sub": lambda x, y: x - y,
+    "and": lambda x, y: x & y,
+    "or": lambda x, y: x | y,
+    "eq": lambda x, y: -1 if x == y else 0,
+    "gt": lambda x, y: -1 if x > y else 0,
+    "lt": lambda x, y: -1 if x < y else 0,
+}
+unary_commands = {"neg": lambda x: -x, "not": lambda x: ~x}
+
+## OS functions without side effects: (arguments, whether they may fail)
+pure_calls = {
+    "Math.multiply": (2, False),
+    "Math.divide": (2, True),
+    "Math.min": (2, False),
+    "Math.max": (2, False),
+    "Math.abs": (1, False),
+}
+
+ARRAY_LOAD = ["pop pointer 1", "push that 0"]
+
+
+def word(value: int) -> int:
+    """
+    Returns:
+        int: the value wrapped to a signed 16-bit word, like the Hack ALU.
+    """
+    return ((value + 32768) & 0xFFFF) - 32768
+
+
+class Operation:
+    """A VM command, or the two commands of an array read, seen as a node of
+    an expression tree.
+    """
+
+    def __init__(self, start: int, end: int, pops: int, reads: tuple,
+                 may_fail: bool = False) -> None:
+        """
+        Args:
+            start (int): the index of the first line of the operation.
+            end (int): the index after its last line.
+            pops (int): how many values it takes off the stack. Every pure
+            operation pushes a single value.
+            reads (tuple): the locations it reads, such as ("local", 2),
+            ("this", 0) or (MEMORY,).
+            may_fail (bool): whether running it can stop the program, as
+            dividing by zero does.
+        """
+        self.start = start
+        self.end = end
+        self.pops = pops
+        self.reads = reads
+        self.may_fail = may_fail
+
+
+def parse_operations(lines: typing.List[str]) -> typing.List[Operation]:
+    """
+    Args:
+        lines (typing.List[str]): VM commands.
+
+    Returns:
+        typing.List[Operation]: one operation per command, with None for
+        the commands that have side effects or touch the stack otherwise
+        than pure expressions do. An array read takes two lines and gets a
+        single operation.
+    """
+    operations = []
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        parts = line.split(" ")
+        operation = None
+        if lines[index:index + 2] == ARRAY_LOAD:
+            operations.append(Operation(index, index + 2, 1, ((MEMORY,),)))
+            index += 2
+            continue
+        if parts[0] == "push" and len(parts) == 3:
+            segment, offset = parts[1], int(parts[2])
+            if segment == "constant":
+                operation = Operation(index, index + 1, 0, ())
+            elif segment in FRAME_SEGMENTS:
+                operation = Operation(index, index + 1, 0, ((segment, offset),))
+            elif segment == "static":
+                operation = Operation(index, index + 1, 0, ((MEMORY,),))
+            elif segment == "this":
+                operation = Operation(index, index + 1, 0,
+                                      ((MEMORY,), ("pointer", 0)))
+            elif segment == "pointer" and offset == 0:
+                operation = Operation(index, index + 1, 0, (("pointer", 0),))
+        elif parts[0] in binary_commands:
+            operation = Operation(index, index + 1, 2, ())
+        elif parts[0] in unary_commands:
+            operation = Operation(index, index + 1, 1, ())
+        elif parts[0] == "call" and parts[1] in pure_calls and \
+                int(parts[2]) == pure_calls[parts[1]][0]:
+            operation = Operation(index, index + 1, int(parts[2]), (),
+                                  pure_calls[parts[1]][1])
+        operations.append(operation)
+        index += 1
+    return operations
+
+
+def expression_start(operations: typing.List[Operation], root: int) -> int:
+    """
+    Args:
+        operations (typing.List[Operation]): as given by parse_operations.
+        root (int): the position of the operation computing the value.
+
+    Returns:
+        int: the position of the first operation of the expression tree that
+        computes the value, or None if the value depends on a command with
+        side effects.
+    """
+    needed = 1
+    position = root
+    while position >= 0:
+        operation = operations[position]
+        if operation is None:
+            return None
+        needed += operation.pops - 1
+        if needed == 0:
+            return position
+        position -= 1
+    return None
+
+
+def expression_reads(operations: typing.List[Operation], start: int,
+                     root: int) -> set:
+    """
+    Returns:
+        set: every location the expression tree reads.
+    """
+    reads = set()
+    for operation in operations[start:root + 1]:
+        reads.update(operation.reads)
+    return reads
+
+
+def written_locations(lines: typing.List[str]) -> set:
+    """
+    Args:
+        lines (typing.List[str]): VM commands.
+
+    Returns:
+        set: every location the commands may change. Calls other than the
+        pure ones, and writes through "that", "this" or "static", may change
+        any memory.
+    """
+    written = set()
+    for line in lines:
+        parts = line.split(" ")
+        if parts[0] == "pop" and len(parts) == 3:
+            segment, offset = parts[1], int(parts[2])
+            if segment in FRAME_SEGMENTS:
+                written.add((segment, offset))
+            elif segment == "pointer":
+                if offset == 0:
+                    written.add(("pointer", 0))
+            elif segment != "temp":
+                written.add((MEMORY,))
+        elif parts[0] == "call" and parts[1] not in pure_calls:
+            written.add((MEMORY,))
+    return written
+
+
+def frame_size(function: typing.List[str]) -> int:
+    """
+    Returns:
+        int: the number of locals the "function" command of the function
+        declares.
+    """
+    return int(function[0].split(" ")[2])
+
+
+def with_frame_size(function: typing.List[str], n_locals: int) -> typing.List[str]:
+    """
+    Returns:
+        typing.List[str]: the function, declaring the given number of locals.
+    """
+    name = function[0].split(" ")[1]
+    return ["function " + name + " " + str(n_locals)] + function[1:]
@@ -6,6 +6,8 @@ as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import typing
+from PassManager import PassManager
+from SourceMap import SourceMap, realign
 
 STATIC ="static"
 LOCAL = "local"
@@ -22,22 +24,68 @@ POP = "pop"
 
 
 
-arthmatic_dict = {"=": "EQ",">": "GT", "<": "LT","&" :"AND", "|": "OR","~": "NOT", "<<": "SHIFTLEFT", ">>" : "SHIFTRIGHT"}
+arthmatic_dict = {"+": "ADD", "-": "SUB", "=": "EQ",">": "GT", "<": "LT","&" :"AND", "|": "OR","~": "NOT", "<<": "SHIFTLEFT", ">>" : "SHIFTRIGHT"}
 
 class VMWriter:
     """
     Writes VM commands into a file. Encapsulates the VM command syntax.
     """
 
-    def __init__(self, output_stream: typing.TextIO) -> None:
-        """Creates a new file and prepares it for writing VM commands."""
+    def __init__(self, output_stream: typing.TextIO,
+                 pass_manager: PassManager = None,
+                 source_map: SourceMap = None) -> None:
+        """Creates a new file and prepares it for writing VM commands.
+
+        Args:
+            output_stream (typing.TextIO): the VM commands are written here.
+            pass_manager (PassManager): optimizes the commands of the class
+            before they are written. Without passes to run, commands are
+            written as soon as they are made.
+            source_map (SourceMap): if not None, the Jack position set by
+            set_position is recorded here for every command written.
+        """
         self.output_stream =output_stream
-        self.file_name = output_stream.name
+        self.pass_manager = None
+        self.commands = None
+        self.source_map = source_map
+        self.positions = []
+        self.line = 0
+        self.subroutine = None
+        if pass_manager is not None and pass_manager.passes:
+            self.pass_manager = pass_manager
+            self.commands = []
+
+    def set_position(self, line: int, subroutine: str = None) -> None:
+        """Sets the Jack line, and subroutine if given, the next commands
+        come from.
+        """
+        self.line = line
+        if subroutine is not None:
+            self.subroutine = subroutine
 
     def write_to_file(self, to_write):
-        print(to_write + "\n")
+        if self.source_map is not None:
+            self.positions.append((self.line, self.subroutine))
+        if self.commands is not None:
+            self.commands.append(to_write)
+            return
         self.output_stream.write(to_write + "\n")
 
+    def close(self) -> None:
+        """Runs the optimization passes over the commands held back for them
+        and writes the result, and finishes the source map.
+        """
+        if self.commands is not None:
+            optimized = self.pass_manager.run(self.commands)
+            if self.source_map is not None:
+                self.positions = realign(self.commands, self.positions, optimized)
+            for command in optimized:
+                self.output_stream.write(command + "\n")
+            self.commands = []
+        if self.source_map is not None:
+            self.source_map.add_positions(self.positions)
+            self.positions = []
+
     def write_push(self, segment: str, index: int) -> None:
         """Writes a VM push command.
 
@@ -64,9 +112,10 @@ class VMWriter:
 
         Args:
             command (str): the command to write, can be "ADD", "SUB", "NEG", 
-            "EQ", "GT", "LT", "AND", "OR", "NOT", "SHIFTLEFT", "SHIFTRIGHT".
+            "EQ", "GT", "LT", "AND", "OR", "NOT", "SHIFTLEFT", "SHIFTRIGHT",
+            or the Jack operator of the command, such as "+" or "~".
         """
-        self.write_to_file(arthmatic_dict[command])
+        self.write_to_file(arthmatic_dict.get(command, command).lower())
 
     def write_label(self, label: str) -> None:
         """Writes a VM label command.
@@ -74,7 +123,7 @@ class VMWriter:
         Args:
             label (str): the label to write.
         """
-        self.write_to_file("@"+label)
+        self.write_to_file("label "+label)
 
     def write_goto(self, label: str) -> None:
         """Writes a VM goto command.
@@ -105,11 +154,56 @@ class VMWriter:
         """Writes a VM function command.
 
         Args:
-            name (str): the name of the function.
+            name (str): the full name of the function, such as "Main.main".
             n_locals (int): the number of local variables the function uses.
         """
-        self.write_to_file("function "+self.file_name+"."+name+ str(n_locals))
+        self.write_to_file("function "+name+" "+str(n_locals))
 
     def write_return(self) -> None:
         """Writes a VM return command."""
         self.write_to_file("return")
+
+
+class NullVMWriter(VMWriter):
+    """Stands in for a VMWriter when no VM code is wanted, so compiling for
+    the other outputs builds no VM commands at all.
+    """
+
+    def __init__(self) -> None:
+        self.output_stream = None
+        self.pass_manager = None
+        self.commands = None
+        self.source_map = None
+        self.positions = []
+        self.line = 0
+        self.subroutine = None
+
+    def set_position(self, line: int, subroutine: str = None) -> None:
+        pass
+
+    def write_push(self, segment: str, index: int) -> None:
+        pass
+
+    def write_pop(self, segment: str, index: int) -> None:
+        pass
+
+    def write_arithmetic(self, command: str) -> None:
+        pass
+
+    def write_label(self, label: str) -> None:
+        pass
+
+    def write_goto(self, label: str) -> None:
+        pass
+
+    def write_if(self, label: str) -> None:
+        pass
+
+    def write_call(self, name: str, n_args: int) -> None:
+        pass
+
+    def write_function(self, name: str, n_locals: int) -> None:
+        pass
+
+    def write_return(self) -> None:
+        pass